@@ -1,16 +1,44 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+import time
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 import spiral_app
 import kisametintesti
 import cognitive_test
 import meander_app
 import clock_drawing_app
 import handwriting_analyzer
+import bulk_scoring
+import debug_capture
+import inference_engine
+import metrics
+import model_registry
+import result_cache
+import worker_pool
+from config import env_bool
 import logging
 
-app = FastAPI()
 logger = logging.getLogger("uvicorn.error")
 
+# Modeller tembel yüklenir; MODEL_WARMUP açıksa (varsayılan) açılışta arka planda ısıtılır
+MODEL_WARMUP = env_bool("MODEL_WARMUP", True)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if MODEL_WARMUP:
+        logger.info("Modeller arka planda yükleniyor ve ısıtılıyor...")
+        model_registry.start_background_warmup()
+        # İşçi süreçleri de ilk istekten önce başlatılır
+        asyncio.get_running_loop().run_in_executor(None, worker_pool.warm_up_all)
+    yield
+    worker_pool.shutdown_all()
+
+
+app = FastAPI(lifespan=lifespan)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -18,6 +46,48 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def route_template(request: Request) -> str:
+    """Path with parameter values put back as {name}, so each route is one metrics label."""
+    if request.scope.get("route") is None:
+        return "unmatched"
+    params = {str(value): name for name, value in request.path_params.items()}
+    if not params:
+        return request.url.path
+    return "/".join(
+        f"{{{params[segment]}}}" if segment in params else segment
+        for segment in request.url.path.split("/")
+    )
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        metrics.observe_request(route_template(request), request.method, status, time.perf_counter() - start)
+
+
+def collect_service_metrics():
+    """Model readiness and result cache counters, read at scrape time."""
+    for name, state in model_registry.status().items():
+        yield "model_ready", "gauge", "1 if the model is loaded and warmed up.", (("model", name),), \
+            1.0 if state["state"] == model_registry.READY else 0.0
+    for name, pool in worker_pool.pool_stats().items():
+        yield "worker_pool_pending", "gauge", "Jobs running or queued in the process pool.", (("pool", name),), \
+            pool["pending"]
+    cache = result_cache.stats()
+    if cache.get("enabled", True):
+        yield "result_cache_entries", "gauge", "Entries in the in-memory result cache.", (), cache["entries"]
+        yield "result_cache_bytes", "gauge", "Bytes held by the in-memory result cache.", (), cache["bytes"]
+        yield "result_cache_evictions_total", "counter", "Result cache LRU evictions.", (), cache["evictions"]
+
+
+metrics.add_collector(collect_service_metrics)
+
 app.include_router(
     spiral_app.router,
     prefix="/spiral",
@@ -54,6 +124,48 @@ app.include_router(
     tags=["handwriting"]
 )
 
+app.include_router(
+    bulk_scoring.router,
+    prefix="/drawings",
+    tags=["drawings"]
+)
+
+app.include_router(
+    debug_capture.router,
+    prefix="/debug",
+    tags=["debug"]
+)
+
 @app.get("/")
 async def root():
-    return {"message": "Neurograph API is running!", "status": "ok"}
\ No newline at end of file
+    return {"message": "Neurograph API is running!", "status": "ok"}
+
+@app.get("/ready")
+async def ready():
+    """Readiness: 200 once every registered model is loaded and warmed up, 503 otherwise."""
+    models = model_registry.status()
+    is_ready = model_registry.all_ready()
+    return JSONResponse(
+        status_code=200 if is_ready else 503,
+        content={"ready": is_ready, "models": models}
+    )
+
+@app.get("/inference/stats")
+async def inference_stats():
+    """Interpreter pool and micro-batching statistics for every drawing model."""
+    return inference_engine.pool_stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Per-stage latency histograms, request latencies and event counters (Prometheus text format)."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/workers/stats")
+async def workers_stats():
+    """Process pool size, queue depth, timeouts and rejections for CPU-bound work."""
+    return worker_pool.pool_stats()
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Result cache size, hit/miss counters and configuration."""
+    return result_cache.stats()
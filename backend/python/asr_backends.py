@@ -0,0 +1,138 @@
+"""
+Speech recognition backends for the reading test.
+
+kisametintesti.transcribe_audio talks to one AsrBackend, picked with
+ASR_BACKEND:
+
+    "whisper"         openai-whisper (PyTorch, fp32 on CPU), the original engine
+    "faster-whisper"  Whisper on CTranslate2 with int8 weights on CPU (the
+                      faster-whisper package), loaded from a local converted
+                      model directory; it is never downloaded at runtime
+
+Both return openai-whisper's result shape ({"text", "segments": [{"text",
+"avg_logprob", "compression_ratio", "no_speech_prob", "words"}]}), so the
+tiered decoding reads the same confidence statistics from either.
+
+The CTranslate2 model is converted once, on a machine with network access:
+
+    ct2-transformers-converter --model openai/whisper-tiny \\
+        --output_dir models/whisper-tiny-ct2 --quantization int8
+"""
+import logging
+import os
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from config import env_int, env_str
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ASR_BACKENDS = ("whisper", "faster-whisper")
+ASR_BACKEND = env_str("ASR_BACKEND", "whisper")
+if ASR_BACKEND not in ASR_BACKENDS:
+    logger.warning(f"Bilinmeyen ASR_BACKEND '{ASR_BACKEND}', 'whisper' kullanılıyor")
+    ASR_BACKEND = "whisper"
+
+# Model adı ya da yerel yolu; boşsa arka ucun varsayılanı (DEFAULT_MODELS)
+ASR_MODEL = env_str("ASR_MODEL", "")
+DEFAULT_MODELS = {
+    "whisper": "tiny",
+    "faster-whisper": os.path.join(os.path.dirname(__file__), "models", "whisper-tiny-ct2"),
+}
+# Yalnızca faster-whisper: ağırlık tipi ve CPU thread sayısı (0: CTranslate2 seçer)
+ASR_COMPUTE_TYPE = env_str("ASR_COMPUTE_TYPE", "int8")
+ASR_CPU_THREADS = max(0, env_int("ASR_CPU_THREADS", 0))
+
+
+class AsrBackend(ABC):
+    """
+    One speech recognition engine.
+
+    `transcribe` decodes a 16 kHz mono float32 array greedily when
+    `beam_size` is None and with beam search otherwise. `options` are
+    openai-whisper transcribe() keyword arguments (language, temperature,
+    initial_prompt, ...).
+    """
+
+    name = None
+
+    def __init__(self, model: str):
+        self.model_name = model
+        self.model = None
+
+    @abstractmethod
+    def load(self):
+        ...
+
+    @abstractmethod
+    def transcribe(self, audio: np.ndarray, beam_size: Optional[int] = None, word_timestamps: bool = False,
+                   **options) -> Dict[str, Any]:
+        ...
+
+    def info(self) -> Dict[str, Any]:
+        return {"backend": self.name, "model": self.model_name}
+
+
+class WhisperBackend(AsrBackend):
+    """openai-whisper; `model` is a model name or a local .pt checkpoint."""
+
+    name = "whisper"
+
+    def load(self):
+        import whisper
+        self.model = whisper.load_model(self.model_name)
+
+    def transcribe(self, audio: np.ndarray, beam_size: Optional[int] = None, word_timestamps: bool = False,
+                   **options) -> Dict[str, Any]:
+        if beam_size:
+            options.update(beam_size=beam_size, best_of=beam_size)
+        return self.model.transcribe(audio, word_timestamps=word_timestamps, **options)
+
+
+class FasterWhisperBackend(AsrBackend):
+    """faster-whisper (CTranslate2); `model` is a converted model directory."""
+
+    name = "faster-whisper"
+
+    def load(self):
+        from faster_whisper import WhisperModel
+        self.model = WhisperModel(self.model_name, device="cpu", compute_type=ASR_COMPUTE_TYPE,
+                                  cpu_threads=ASR_CPU_THREADS, local_files_only=True)
+
+    def transcribe(self, audio: np.ndarray, beam_size: Optional[int] = None, word_timestamps: bool = False,
+                   **options) -> Dict[str, Any]:
+        # CTranslate2 hassasiyeti compute_type ile seçilir
+        options.pop("fp16", None)
+        segments, _ = self.model.transcribe(audio, beam_size=beam_size or 1, best_of=beam_size or 1,
+                                            word_timestamps=word_timestamps, **options)
+        # Üreteç burada tüketilir; çözme asıl bu döngüde çalışır
+        converted = [{
+            "text": segment.text,
+            "start": segment.start,
+            "end": segment.end,
+            "avg_logprob": segment.avg_logprob,
+            "compression_ratio": segment.compression_ratio,
+            "no_speech_prob": segment.no_speech_prob,
+            "words": [
+                {"word": word.word, "start": word.start, "end": word.end, "probability": word.probability}
+                for word in (segment.words or [])
+            ],
+        } for segment in segments]
+        return {"text": "".join(segment["text"] for segment in converted), "segments": converted}
+
+    def info(self) -> Dict[str, Any]:
+        return {**super().info(), "compute_type": ASR_COMPUTE_TYPE, "cpu_threads": ASR_CPU_THREADS}
+
+
+_BACKEND_CLASSES = {backend.name: backend for backend in (WhisperBackend, FasterWhisperBackend)}
+
+
+def create_backend(name: Optional[str] = None, model: Optional[str] = None) -> AsrBackend:
+    """An unloaded backend; defaults come from ASR_BACKEND and ASR_MODEL."""
+    name = name or ASR_BACKEND
+    if name not in _BACKEND_CLASSES:
+        raise ValueError(f"Bilinmeyen ASR arka ucu: {name} ({', '.join(ASR_BACKENDS)})")
+    return _BACKEND_CLASSES[name](model or ASR_MODEL or DEFAULT_MODELS[name])
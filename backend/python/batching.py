@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import Counter, deque
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+import metrics
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+    Dynamic micro-batching in front of an InterpreterPool.
+
+    Requests are collected until either `max_batch_size` items are queued or
+    `window_ms` has passed since the first one arrived, then run as a single
+    batch-N invoke. A new batch is only started when an interpreter is free,
+    so batches naturally grow while the pool is saturated.
+    """
+
+    def __init__(self, pool, max_batch_size: int, window_ms: float):
+        self.pool = pool
+        self.max_batch_size = max(1, max_batch_size)
+        self.window = max(0.0, window_ms) / 1000.0
+        self._loop = None
+        self._queue = None
+        self._slots = None
+        self._worker = None
+        self._stats_lock = threading.Lock()
+        self._batch_sizes = Counter()
+        self._request_count = 0
+        self._batch_count = 0
+        self._queue_delay_total = 0.0
+        self._queue_delay_max = 0.0
+        self._recent_delays = deque(maxlen=1024)
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._worker is not None and not self._worker.done():
+            return
+        # Her event loop için kuyruk ve işçi görev yeniden oluşturulur
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.pool.pool_size)
+        self._worker = loop.create_task(self._collect_batches())
+
+    async def submit(self, image: np.ndarray) -> np.ndarray:
+        """Queue one (H, W, C) image and wait for its (batch-1 shaped) output."""
+        self._ensure_started()
+        future = self._loop.create_future()
+        await self._queue.put((image, future, time.perf_counter()))
+        return await future
+
+    async def _collect_batches(self):
+        while True:
+            await self._slots.acquire()
+            batch = [await self._queue.get()]
+            deadline = batch[0][2] + self.window
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    # Pencere doldu; yalnızca hazırda bekleyenleri al
+                    while len(batch) < self.max_batch_size and not self._queue.empty():
+                        batch.append(self._queue.get_nowait())
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            self._loop.create_task(self._dispatch(batch))
+
+    async def _dispatch(self, batch: List[Tuple[np.ndarray, asyncio.Future, float]]):
+        started = time.perf_counter()
+        self._record(len(batch), [started - enqueued for _, _, enqueued in batch])
+        try:
+            images = [image for image, _, _ in batch]
+            outputs = await self._loop.run_in_executor(
+                self.pool.executor, self.pool.predict_images, images
+            )
+        except Exception as e:
+            logger.error(f"[{self.pool.name}] Batch çıkarım hatası: {e}")
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for i, (_, future, _) in enumerate(batch):
+                if not future.done():
+                    future.set_result(outputs[i:i + 1])
+        finally:
+            self._slots.release()
+
+    def _record(self, batch_size: int, delays: List[float]):
+        with self._stats_lock:
+            self._batch_count += 1
+            self._request_count += batch_size
+            self._batch_sizes[batch_size] += 1
+            for delay in delays:
+                self._queue_delay_total += delay
+                self._queue_delay_max = max(self._queue_delay_max, delay)
+                self._recent_delays.append(delay)
+        for delay in delays:
+            metrics.observe_stage(self.pool.name, "batch_queue", delay)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            recent = np.array(self._recent_delays) * 1000.0
+            return {
+                "max_batch_size": self.max_batch_size,
+                "window_ms": round(self.window * 1000.0, 3),
+                "requests": self._request_count,
+                "batches": self._batch_count,
+                "avg_batch_size": round(self._request_count / self._batch_count, 3) if self._batch_count else 0.0,
+                "batch_size_histogram": {str(size): count for size, count in sorted(self._batch_sizes.items())},
+                "queue_delay_ms": {
+                    "avg": round(self._queue_delay_total * 1000.0 / self._request_count, 3) if self._request_count else 0.0,
+                    "max": round(self._queue_delay_max * 1000.0, 3),
+                    "p50": round(float(np.percentile(recent, 50)), 3) if recent.size else 0.0,
+                    "p95": round(float(np.percentile(recent, 95)), 3) if recent.size else 0.0,
+                },
+            }
@@ -0,0 +1,387 @@
+"""
+Offline benchmark suite for the API endpoints.
+
+Drives the FastAPI app in-process (httpx ASGI transport, no network) at a
+range of concurrency levels and reports throughput and p50/p95/p99 latency
+per endpoint. Inputs are generated: spiral/meander/clock PNGs, handwriting
+images and speech-like WAVs. Gemini is replaced by a local stub with a fixed
+latency, and Whisper is replaced by a stub when the package is not installed
+(or with --whisper stub). Endpoints whose models are missing
+(drawing .tflite files, Whisper) are reported as skipped.
+
+Usage (from backend/python):
+    python benchmarks/bench_api.py --concurrency 1,4,16 --requests 64 --json results.json
+    python benchmarks/bench_api.py --json new.json --compare results.json --threshold 0.15
+"""
+import argparse
+import asyncio
+import io
+import json
+import logging
+import math
+import os
+import platform
+import statistics
+import sys
+import time
+import types
+import wave
+from datetime import datetime
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from bench_drawing_preprocess import make_drawing_png  # noqa: E402
+
+ENDPOINTS = ["spiral", "meander", "clock", "handwriting", "text", "cognitive"]
+SAMPLE_RATE = 16000
+
+
+# ---------------------------------------------------------------------------
+# Synthetic inputs
+# ---------------------------------------------------------------------------
+
+def _encode_png(rgba: np.ndarray) -> bytes:
+    from PIL import Image
+    out = io.BytesIO()
+    Image.fromarray(rgba, mode="RGBA").save(out, format="PNG")
+    return out.getvalue()
+
+
+def _draw_polyline(rgba: np.ndarray, xs: np.ndarray, ys: np.ndarray, width: int = 2):
+    size_y, size_x = rgba.shape[:2]
+    for dx in range(-width, width + 1):
+        for dy in range(-width, width + 1):
+            rgba[np.clip(ys + dy, 0, size_y - 1).astype(int), np.clip(xs + dx, 0, size_x - 1).astype(int)] = (20, 20, 20, 255)
+
+
+def make_meander_png(size: int, seed: int) -> bytes:
+    """A square-wave meander band with a little hand tremor."""
+    rng = np.random.default_rng(seed)
+    rgba = np.zeros((size, size, 4), dtype=np.uint8)
+    t = np.linspace(0, 1, 20000)
+    period = 0.1
+    phase = (t % period) / period
+    xs = size * 0.05 + t * size * 0.9
+    ys = np.where(phase < 0.5, size * 0.4, size * 0.6) + rng.normal(0, size * 0.003, t.shape)
+    _draw_polyline(rgba, xs, ys)
+    return _encode_png(rgba)
+
+
+def make_clock_png(size: int, seed: int) -> bytes:
+    """A clock face with twelve hour ticks and two hands."""
+    rng = np.random.default_rng(seed)
+    rgba = np.zeros((size, size, 4), dtype=np.uint8)
+    center = size / 2
+    theta = np.linspace(0, 2 * np.pi, 20000)
+    radius = size * 0.42 * (1 + rng.normal(0, 0.01))
+    _draw_polyline(rgba, center + radius * np.cos(theta), center + radius * np.sin(theta))
+    for hour in range(12):
+        angle = hour / 12 * 2 * np.pi
+        r = np.linspace(radius * 0.85, radius * 0.95, 200)
+        _draw_polyline(rgba, center + r * np.cos(angle), center + r * np.sin(angle))
+    for length, angle in ((0.5, rng.uniform(0, 2 * np.pi)), (0.75, rng.uniform(0, 2 * np.pi))):
+        r = np.linspace(0, radius * length, 500)
+        _draw_polyline(rgba, center + r * np.cos(angle), center + r * np.sin(angle))
+    return _encode_png(rgba)
+
+
+def make_spiral_png(size: int, seed: int) -> bytes:
+    # make_drawing_png is deterministic; a 1px size change keeps inputs distinct
+    return make_drawing_png(size + seed % 7)
+
+
+def make_handwriting_png(seed: int, lines: int = 6) -> bytes:
+    """Black text lines on paper with slightly shrinking letters and some noise."""
+    import cv2
+    rng = np.random.default_rng(seed)
+    words = ["merhaba", "bugun", "hava", "cok", "guzel", "yazi", "deneme", "kalem", "kagit", "satir"]
+    img = np.full((200 + lines * 140, 1400, 3), 245, dtype=np.uint8)
+    scale = 1.8
+    for i in range(lines):
+        text = " ".join(rng.choice(words, size=4))
+        cv2.putText(img, text, (40, 150 + i * 140), cv2.FONT_HERSHEY_SIMPLEX, scale, (15, 15, 15), 3)
+        scale *= 0.93
+    noise = rng.normal(0, 6, img.shape)
+    img = np.clip(img + noise, 0, 255).astype(np.uint8)
+    ok, png = cv2.imencode(".png", img)
+    return png.tobytes()
+
+
+def make_speech_wav(seconds: float, seed: int) -> bytes:
+    """Voiced 'syllables' (harmonics of a wandering pitch) separated by short pauses."""
+    rng = np.random.default_rng(seed)
+    n = int(seconds * SAMPLE_RATE)
+    t = np.arange(n) / SAMPLE_RATE
+    pitch = 140 + 30 * np.sin(2 * np.pi * 0.7 * t + rng.uniform(0, np.pi))
+    phase = 2 * np.pi * np.cumsum(pitch) / SAMPLE_RATE
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 6))
+    syllables = np.clip(np.sin(2 * np.pi * 4.0 * t + rng.uniform(0, np.pi)), 0, None) ** 2
+    signal = 0.3 * voiced * syllables + 0.005 * rng.normal(size=n)
+    pcm = (np.clip(signal, -1, 1) * 32767).astype("<i2")
+    out = io.BytesIO()
+    with wave.open(out, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(pcm.tobytes())
+    return out.getvalue()
+
+
+# ---------------------------------------------------------------------------
+# Local stand-ins
+# ---------------------------------------------------------------------------
+
+class StubGeminiModel:
+    """Replaces genai.GenerativeModel; sleeps for a fixed latency like a remote call would."""
+
+    def __init__(self, latency_s: float):
+        self.latency_s = latency_s
+
+    def generate_content(self, prompt):
+        time.sleep(self.latency_s)
+        return types.SimpleNamespace(text="Genel Değerlendirme: (benchmark stub yanıtı)")
+
+
+class StubWhisperModel:
+    """Replaces whisper's model; cost scales with audio length (real-time factor)."""
+
+    def __init__(self, real_time_factor: float):
+        self.real_time_factor = real_time_factor
+
+    def transcribe(self, audio, **kwargs):
+        if isinstance(audio, str):
+            with wave.open(audio, "rb") as wav:
+                seconds = wav.getnframes() / wav.getframerate()
+        else:
+            seconds = len(audio) / SAMPLE_RATE
+        time.sleep(seconds * self.real_time_factor)
+        return {"text": "bugün hava çok güzel", "segments": []}
+
+
+def install_whisper_stub(real_time_factor: float):
+    stub = types.ModuleType("whisper")
+    stub.load_model = lambda name, **kwargs: StubWhisperModel(real_time_factor)
+    sys.modules["whisper"] = stub
+
+
+# ---------------------------------------------------------------------------
+# Load generation
+# ---------------------------------------------------------------------------
+
+def build_requests(name: str, variants: int):
+    """(method, path, request kwargs) tuples cycled through during a run."""
+    if name in ("spiral", "meander", "clock"):
+        make, path = {
+            "spiral": (make_spiral_png, "/spiral/predict_tremor"),
+            "meander": (make_meander_png, "/meander/predict_meander_tremor"),
+            "clock": (make_clock_png, "/clock/predict_clock_drawing_score"),
+        }[name]
+        return [("POST", path, {"files": {"image": ("drawing.png", make(720, i), "image/png")}})
+                for i in range(variants)]
+    if name == "handwriting":
+        return [("POST", "/handwriting/analyze_handwriting",
+                 {"files": {"image": ("handwriting.png", make_handwriting_png(i), "image/png")}})
+                for i in range(variants)]
+    if name == "text":
+        return [("POST", "/text/record_and_analyze",
+                 {"files": {"audio": ("reading.wav", make_speech_wav(6.0, i), "audio/wav")},
+                  "data": {"reference_text": "bugün hava çok güzel"}})
+                for i in range(variants)]
+    if name == "cognitive":
+        qa_list = [{"Soru": f"Soru {i}", "Cevap": f"Cevap {i}"} for i in range(10)]
+        return [("POST", "/cognitive/evaluate_answers", {"json": qa_list})]
+    raise ValueError(name)
+
+
+def skip_reason(name: str):
+    import model_registry
+    import spiral_app
+    import meander_app
+    import clock_drawing_app
+
+    model_paths = {"spiral": spiral_app.MODEL_PATH, "meander": meander_app.MODEL_PATH,
+                   "clock": clock_drawing_app.MODEL_PATH}
+    if name in model_paths:
+        if not os.path.exists(model_paths[name]):
+            return f"model not found: {model_paths[name]}"
+        if not model_registry.ensure_loaded(name):
+            return f"model failed to load: {model_registry.status()[name]['error']}"
+    if name == "text":
+        # The generated WAVs are 16 kHz mono PCM, which is decoded without ffmpeg
+        if not model_registry.ensure_loaded("whisper"):
+            return f"whisper failed to load: {model_registry.status()['whisper']['error']}"
+    return None
+
+
+async def run_level(client, requests, concurrency: int, total: int):
+    latencies = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            method, path, kwargs = requests[i % len(requests)]
+            start = time.perf_counter()
+            response = await client.request(method, path, **kwargs)
+            latencies.append((time.perf_counter() - start) * 1000.0)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": total,
+        "errors": errors,
+        "throughput_rps": round(total / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "mean_ms": round(statistics.mean(latencies), 2),
+    }
+
+
+def percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100.0
+    lo, hi = math.floor(k), math.ceil(k)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+async def run_suite(app, endpoints, levels, total, variants):
+    import httpx
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for name in endpoints:
+            reason = skip_reason(name)
+            if reason:
+                print(f"{name:<12} skipped: {reason}")
+                results[name] = {"skipped": reason}
+                continue
+            requests = build_requests(name, variants)
+            await run_level(client, requests, 1, min(len(requests), 4))  # ısınma
+            results[name] = {}
+            for level in levels:
+                row = await run_level(client, requests, level, total)
+                results[name][str(level)] = row
+                print(f"{name:<12}c={level:<4}{row['throughput_rps']:>10} rps{row['p50_ms']:>10} p50"
+                      f"{row['p95_ms']:>10} p95{row['p99_ms']:>10} p99  errors={row['errors']}")
+    return results
+
+
+# ---------------------------------------------------------------------------
+# Baseline comparison
+# ---------------------------------------------------------------------------
+
+def compare(current, baseline, threshold: float):
+    """Flag p95 latency increases and throughput drops larger than `threshold` (fraction)."""
+    regressions = []
+    for name, levels in current["results"].items():
+        base_levels = baseline.get("results", {}).get(name)
+        if "skipped" in levels or not base_levels or "skipped" in base_levels:
+            continue
+        for level, row in levels.items():
+            base = base_levels.get(level)
+            if not base:
+                continue
+            if base["p95_ms"] > 0 and row["p95_ms"] > base["p95_ms"] * (1 + threshold):
+                regressions.append(f"{name} c={level}: p95 {base['p95_ms']} -> {row['p95_ms']} ms")
+            if row["throughput_rps"] < base["throughput_rps"] * (1 - threshold):
+                regressions.append(f"{name} c={level}: throughput {base['throughput_rps']} -> {row['throughput_rps']} rps")
+            if row["errors"] > base["errors"]:
+                regressions.append(f"{name} c={level}: errors {base['errors']} -> {row['errors']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS), help="Comma separated subset of " + ",".join(ENDPOINTS))
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=64, help="Requests per endpoint and level")
+    parser.add_argument("--variants", type=int, default=8, help="Distinct generated inputs per endpoint")
+    parser.add_argument("--gemini-latency", type=float, default=0.8, help="Stub Gemini latency in seconds")
+    parser.add_argument("--whisper", choices=["auto", "real", "stub"], default="auto",
+                        help="auto: real Whisper if installed, otherwise the stub")
+    parser.add_argument("--whisper-rtf", type=float, default=0.3, help="Stub Whisper real-time factor")
+    parser.add_argument("--with-cache", action="store_true", help="Keep the result cache enabled")
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--compare", help="Baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Allowed relative regression")
+    parser.add_argument("--verbose", action="store_true", help="Keep the app's INFO logging")
+    args = parser.parse_args()
+
+    if not args.with_cache:
+        os.environ["RESULT_CACHE_ENABLED"] = "0"
+    os.environ.setdefault("DEBUG_CAPTURE_SAMPLE_RATE", "0")
+
+    whisper_mode = args.whisper
+    if whisper_mode == "auto":
+        try:
+            import whisper  # noqa: F401
+            whisper_mode = "real"
+        except ImportError:
+            whisper_mode = "stub"
+    if whisper_mode == "stub":
+        install_whisper_stub(args.whisper_rtf)
+        # The stub only exists in this process, so transcription cannot go to worker processes
+        os.environ["WHISPER_POOL_WORKERS"] = "0"
+
+    os.chdir(BACKEND_DIR)
+    import api
+    import cognitive_test
+
+    cognitive_test.model = StubGeminiModel(args.gemini_latency)
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    endpoints = [name.strip() for name in args.endpoints.split(",") if name.strip()]
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+    levels = [int(level) for level in args.concurrency.split(",")]
+
+    results = asyncio.run(run_suite(api.app, endpoints, levels, args.requests, args.variants))
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "requests_per_level": args.requests,
+            "gemini": f"stub ({args.gemini_latency}s)",
+            "whisper": whisper_mode,
+            "result_cache": args.with_cache,
+        },
+        "results": results,
+    }
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) against {args.compare}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nNo regressions against {args.compare} (threshold {args.threshold:.0%})")
+
+
+if __name__ == "__main__":
+    main()
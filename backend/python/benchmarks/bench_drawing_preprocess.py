@@ -0,0 +1,111 @@
+"""
+Micro-benchmark: legacy vs zero-copy drawing preprocessing.
+
+Compares the previous PIL paste + float32 copy + /255 + expand_dims pipeline
+with drawing_preprocessing.load_resized_rgb + write_model_input writing into a
+preallocated input buffer (standing in for the interpreter's input tensor).
+Reports per-request latency and peak Python-side allocation (tracemalloc).
+
+Usage (from backend/python):
+    python benchmarks/bench_drawing_preprocess.py --size 1080 --iterations 50
+"""
+import argparse
+import io
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from drawing_preprocessing import load_resized_rgb, write_model_input  # noqa: E402
+
+
+def legacy_preprocess(image_bytes: bytes, width: int, height: int, dtype) -> np.ndarray:
+    img_pil = Image.open(io.BytesIO(image_bytes))
+    if img_pil.mode == 'RGBA':
+        background = Image.new("RGB", img_pil.size, (255, 255, 255))
+        background.paste(img_pil, mask=img_pil.split()[3])
+        img_pil = background
+    elif img_pil.mode != 'RGB':
+        img_pil = img_pil.convert('RGB')
+    img_pil = img_pil.resize((width, height), Image.Resampling.LANCZOS)
+    img_array = np.array(img_pil, dtype=np.float32)
+    if dtype == np.float32:
+        img_array = img_array / 255.0
+    else:
+        img_array = img_array.astype(np.uint8)
+    return np.expand_dims(img_array, axis=0)
+
+
+def fast_preprocess(image_bytes: bytes, width: int, height: int, input_buffer: np.ndarray) -> np.ndarray:
+    image = load_resized_rgb(image_bytes, width, height)
+    write_model_input(image, input_buffer[0])
+    return input_buffer
+
+
+def make_drawing_png(size: int) -> bytes:
+    """A transparent canvas with a dark spiral, like the frontend's canvas export."""
+    rgba = np.zeros((size, size, 4), dtype=np.uint8)
+    theta = np.linspace(0, 8 * np.pi, 20000)
+    radius = theta / (8 * np.pi) * (size * 0.45)
+    xs = (size / 2 + radius * np.cos(theta)).astype(int)
+    ys = (size / 2 + radius * np.sin(theta)).astype(int)
+    for dx in range(-2, 3):
+        for dy in range(-2, 3):
+            rgba[np.clip(ys + dy, 0, size - 1), np.clip(xs + dx, 0, size - 1)] = (20, 20, 20, 255)
+    out = io.BytesIO()
+    Image.fromarray(rgba, mode="RGBA").save(out, format="PNG")
+    return out.getvalue()
+
+
+def measure(fn, iterations: int):
+    fn()  # ısınma
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - start) * 1000.0)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return latencies, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=1080, help="Canvas size of the synthetic PNG")
+    parser.add_argument("--model-size", type=int, default=224, help="Model input height/width")
+    parser.add_argument("--dtype", choices=["float32", "uint8"], default="float32")
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    dtype = np.float32 if args.dtype == "float32" else np.uint8
+    image_bytes = make_drawing_png(args.size)
+    width = height = args.model_size
+    input_buffer = np.empty((1, height, width, 3), dtype=dtype)
+
+    legacy = legacy_preprocess(image_bytes, width, height, dtype)
+    fast = fast_preprocess(image_bytes, width, height, input_buffer)
+    identical = bool(np.array_equal(legacy, fast))
+
+    results = {
+        "legacy": measure(lambda: legacy_preprocess(image_bytes, width, height, dtype), args.iterations),
+        "zero_copy": measure(lambda: fast_preprocess(image_bytes, width, height, input_buffer), args.iterations),
+    }
+
+    print(f"Input: {args.size}x{args.size} RGBA PNG ({len(image_bytes)} bytes) -> "
+          f"{height}x{width}x3 {args.dtype}, identical output: {identical}")
+    print(f"{'pipeline':<12}{'p50 ms':>10}{'mean ms':>10}{'peak alloc KiB':>18}")
+    for name, (latencies, peak) in results.items():
+        print(f"{name:<12}{statistics.median(latencies):>10.2f}{statistics.mean(latencies):>10.2f}{peak / 1024:>18.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark: remove_overlapping_boxes scaling, legacy O(n^2) loop vs grid index.
+
+Boxes imitate the multi-pass contour detector: glyph-sized boxes laid out in
+text lines, each found by several passes with a pixel or two of jitter, plus
+one page-sized box. Every run checks that both versions keep exactly the
+same boxes in the same order.
+
+Usage (from backend/python):
+    python benchmarks/bench_overlap_removal.py --counts 100,1000,10000,50000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from handwriting_analyzer import remove_overlapping_boxes  # noqa: E402
+
+
+def legacy_remove_overlapping_boxes(boxes, overlap_threshold: float = 0.7):
+    """The previous implementation: every candidate against every kept box."""
+    if not boxes:
+        return []
+    boxes_with_area = [(box, box[2] * box[3]) for box in boxes]
+    boxes_with_area.sort(key=lambda x: x[1], reverse=True)
+    filtered_boxes = []
+    for box, area in boxes_with_area:
+        is_overlapping = False
+        for existing_box in filtered_boxes:
+            x1 = max(box[0], existing_box[0])
+            y1 = max(box[1], existing_box[1])
+            x2 = min(box[0] + box[2], existing_box[0] + existing_box[2])
+            y2 = min(box[1] + box[3], existing_box[1] + existing_box[3])
+            if x1 < x2 and y1 < y2:
+                intersection_area = (x2 - x1) * (y2 - y1)
+                union_area = area + (existing_box[2] * existing_box[3]) - intersection_area
+                if union_area > 0 and intersection_area / union_area > overlap_threshold:
+                    is_overlapping = True
+                    break
+        if not is_overlapping:
+            filtered_boxes.append(box)
+    return filtered_boxes
+
+
+def make_boxes(count: int, seed: int = 0, passes: int = 7):
+    """`count` candidate boxes: count/passes glyphs, each detected `passes` times with jitter."""
+    rng = np.random.default_rng(seed)
+    glyphs = max(1, count // passes)
+    # Sayfa, glif sayısıyla büyür ki yoğunluk sabit kalsın
+    per_line = 60
+    lines = max(1, glyphs // per_line + 1)
+    width, line_height = per_line * 20, 40
+    boxes = [(0, 0, width, lines * line_height)]
+    for i in range(glyphs):
+        line, col = divmod(i, per_line)
+        w, h = int(rng.integers(6, 18)), int(rng.integers(10, 30))
+        x, y = col * 20, line * line_height + int(rng.integers(0, 8))
+        for _ in range(passes):
+            jx, jy, jw, jh = rng.integers(-2, 3, size=4)
+            boxes.append((int(x + jx), int(y + jy), max(1, int(w + jw)), max(1, int(h + jh))))
+    rng.shuffle(boxes)
+    return [tuple(box) for box in boxes[:count]]
+
+
+def timed(fn, boxes, repeats: int):
+    best = float("inf")
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn(boxes)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000.0, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--counts", default="100,500,1000,5000,10000,20000,50000")
+    parser.add_argument("--legacy-max", type=int, default=10000,
+                        help="Skip the legacy loop above this many boxes (it is quadratic)")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'boxes':>8}{'kept':>8}{'legacy ms':>12}{'grid ms':>10}{'speedup':>10}  identical")
+    for count in [int(c) for c in args.counts.split(",")]:
+        boxes = make_boxes(count)
+        grid_ms, kept = timed(remove_overlapping_boxes, boxes, args.repeats)
+        if count <= args.legacy_max:
+            legacy_ms, legacy_kept = timed(legacy_remove_overlapping_boxes, boxes, 1)
+            identical = legacy_kept == kept
+            print(f"{count:>8}{len(kept):>8}{legacy_ms:>12.1f}{grid_ms:>10.1f}{legacy_ms / grid_ms:>9.1f}x  {identical}")
+            if not identical:
+                sys.exit(f"Output differs from the legacy implementation at {count} boxes")
+        else:
+            print(f"{count:>8}{len(kept):>8}{'-':>12}{grid_ms:>10.1f}{'-':>10}  -")
+
+
+if __name__ == "__main__":
+    main()
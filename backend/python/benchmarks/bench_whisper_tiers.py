@@ -0,0 +1,141 @@
+"""
+Latency split of the tiered Whisper decoding over a local WAV set.
+
+Every recording is decoded with the same model in both modes of
+kisametintesti.transcribe_audio: "beam" (beam search only) and "tiered"
+(greedy first, beam search when a segment crosses the escalation
+thresholds). Reports per file the tier the tiered mode ended on, why it
+escalated, the latency of both modes and whether the texts agree. When a
+recording has a reference transcript next to it (reading.wav ->
+reading.txt), the similarity score of both modes is reported too.
+
+Runs on the configured ASR backend (ASR_BACKEND, or --backend); needs
+that backend's package (and ffmpeg for non 16 kHz mono WAVs).
+
+Usage (from backend/python):
+    python benchmarks/bench_whisper_tiers.py --wavs path/to/recordings --json tiers.json
+    WHISPER_ESCALATE_LOGPROB=-0.8 python benchmarks/bench_whisper_tiers.py --wavs path/to/recordings
+"""
+import argparse
+import glob
+import json
+import os
+import statistics
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The model stays in this process; the worker pool is not started
+os.environ["WHISPER_POOL_WORKERS"] = "0"
+
+import asr_backends  # noqa: E402
+import kisametintesti as kt  # noqa: E402
+
+MODES = ("beam", "tiered")
+
+
+def percentile(values, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def run_mode(mode: str, audio, word_timestamps: bool):
+    kt.WHISPER_DECODING = mode
+    start = time.perf_counter()
+    transcription = kt.transcribe_audio(audio, word_timestamps)
+    return transcription, (time.perf_counter() - start) * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--wavs", required=True, help="Directory of WAV recordings (optional .txt references)")
+    parser.add_argument("--backend", default=asr_backends.ASR_BACKEND, choices=list(asr_backends.ASR_BACKENDS))
+    parser.add_argument("--model", help="Model name or local path (default: the backend's default)")
+    parser.add_argument("--word-timestamps", action="store_true", help="Also align word timestamps")
+    parser.add_argument("--json", help="Write per-file results to this file")
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.wavs, "*.wav")))
+    if not paths:
+        sys.exit(f"No WAV files in {args.wavs}")
+    kt.asr = asr_backends.create_backend(args.backend, args.model)
+    try:
+        kt.load_whisper_model()
+    except ImportError as e:
+        sys.exit(f"The {args.backend} backend is not installed: {e}")
+    kt.warm_up_whisper_model()
+
+    rows = []
+    print(f"{'file':<28}{'sec':>6}{'beam ms':>10}{'tiered ms':>11}{'tier':>8}  {'same':<6}reasons")
+    for path in paths:
+        with open(path, "rb") as f:
+            audio = kt.decode_audio(f.read())
+        row = {"file": os.path.basename(path), "seconds": round(len(audio) / kt.SAMPLE_RATE, 2)}
+        for mode in MODES:
+            transcription, latency_ms = run_mode(mode, audio, args.word_timestamps)
+            row[mode] = {
+                "ms": round(latency_ms, 1),
+                "tier": transcription["tier"],
+                "escalation_reasons": transcription["escalation_reasons"],
+                "text": transcription["text"],
+            }
+        reference_path = os.path.splitext(path)[0] + ".txt"
+        if os.path.exists(reference_path):
+            with open(reference_path, "r", encoding="utf-8") as f:
+                reference = f.read().strip()
+            for mode in MODES:
+                row[mode]["similarity"] = kt.calculate_similarity(row[mode]["text"], reference)
+        row["same_text"] = row["beam"]["text"] == row["tiered"]["text"]
+        rows.append(row)
+        tiered = row["tiered"]
+        print(f"{row['file'][:27]:<28}{row['seconds']:>6}{row['beam']['ms']:>10.0f}{tiered['ms']:>11.0f}"
+              f"{tiered['tier']:>8}  {str(row['same_text']):<6}{','.join(tiered['escalation_reasons'])}")
+
+    escalated = [row for row in rows if row["tiered"]["tier"] == "beam"]
+    summary = {
+        "files": len(rows),
+        "escalated": len(escalated),
+        "escalation_reasons": dict(Counter(reason for row in escalated
+                                           for reason in row["tiered"]["escalation_reasons"])),
+        "same_text": sum(row["same_text"] for row in rows),
+        "thresholds": {
+            "avg_logprob": kt.WHISPER_ESCALATE_LOGPROB,
+            "compression_ratio": kt.WHISPER_ESCALATE_COMPRESSION,
+            "no_speech_prob": kt.WHISPER_ESCALATE_NO_SPEECH,
+        },
+    }
+    for mode in MODES:
+        latencies = [row[mode]["ms"] for row in rows]
+        summary[mode] = {
+            "total_ms": round(sum(latencies), 1),
+            "p50_ms": round(statistics.median(latencies), 1),
+            "p95_ms": round(percentile(latencies, 0.95), 1),
+        }
+        if all("similarity" in row[mode] for row in rows):
+            summary[mode]["mean_similarity"] = round(statistics.mean(row[mode]["similarity"] for row in rows), 2)
+    greedy_only = [row["tiered"]["ms"] for row in rows if row["tiered"]["tier"] == "greedy"]
+    summary["tiered"]["greedy_only_p50_ms"] = round(statistics.median(greedy_only), 1) if greedy_only else None
+    summary["tiered"]["escalated_p50_ms"] = (round(statistics.median(row["tiered"]["ms"] for row in escalated), 1)
+                                             if escalated else None)
+
+    print(f"\nEscalated {summary['escalated']}/{summary['files']} "
+          f"({', '.join(f'{k}: {v}' for k, v in summary['escalation_reasons'].items()) or 'none'}), "
+          f"same text on {summary['same_text']}/{summary['files']}")
+    for mode in MODES:
+        stats = summary[mode]
+        line = f"{mode:<7} total {stats['total_ms']:.0f} ms, p50 {stats['p50_ms']:.0f} ms, p95 {stats['p95_ms']:.0f} ms"
+        if "mean_similarity" in stats:
+            line += f", mean similarity {stats['mean_similarity']}"
+        print(line)
+    print(f"tiered  greedy-only p50 {summary['tiered']['greedy_only_p50_ms']} ms, "
+          f"escalated p50 {summary['tiered']['escalated_p50_ms']} ms")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"asr": kt.asr.info(), "summary": summary, "files": rows}, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
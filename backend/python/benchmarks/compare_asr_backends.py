@@ -0,0 +1,197 @@
+"""
+Side-by-side comparison of the ASR backends on local recordings.
+
+Every backend runs in its own child process, so the memory figures are
+not mixed up: the process's peak RSS before loading, after loading the
+model and after transcribing every recording. Each recording goes through
+kisametintesti.transcribe_audio with the configured decoding mode
+(WHISPER_DECODING), exactly as /text/record_and_analyze would run it.
+
+Reports per backend the load time, memory footprint and real-time factor
+(decode time / audio duration; below 1 is faster than real time). Per
+recording, it also reports how well the backends agree: the similarity
+score between their transcripts and, when a reference transcript sits
+next to the WAV (reading.wav -> reading.txt), each backend's similarity
+score against it and whether they reach the same pass/fail verdict.
+
+Usage (from backend/python):
+    python benchmarks/compare_asr_backends.py --wavs path/to/recordings --json asr.json
+    python benchmarks/compare_asr_backends.py --wavs path/to/recordings \\
+        --backends whisper,faster-whisper --model faster-whisper=models/whisper-base-ct2
+"""
+import argparse
+import glob
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BACKEND_DIR)
+
+# Passing score of /text/record_and_analyze ("Başarılı")
+PASS_SIMILARITY = 80
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB (None when it cannot be read)."""
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+            return round(psutil.Process().memory_info().peak_wset / 2 ** 20, 1)
+        except (ImportError, AttributeError):
+            return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return round(peak / (2 ** 20 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_worker(backend: str, model, wavs: str):
+    """Child process: load one backend, transcribe every WAV and print the results as JSON."""
+    os.environ["ASR_BACKEND"] = backend
+    os.environ["WHISPER_POOL_WORKERS"] = "0"
+    import logging
+    logging.disable(logging.INFO)
+
+    import asr_backends
+    import kisametintesti as kt
+
+    rss_start = peak_rss_mb()
+    kt.asr = asr_backends.create_backend(backend, model)
+    start = time.perf_counter()
+    try:
+        kt.load_whisper_model()
+    except Exception as e:
+        print(json.dumps({"backend": backend, "error": f"{type(e).__name__}: {e}"}))
+        return
+    load_s = time.perf_counter() - start
+    kt.warm_up_whisper_model()
+    rss_loaded = peak_rss_mb()
+
+    files = []
+    for path in sorted(glob.glob(os.path.join(wavs, "*.wav"))):
+        with open(path, "rb") as f:
+            audio = kt.decode_audio(f.read())
+        seconds = len(audio) / kt.SAMPLE_RATE
+        start = time.perf_counter()
+        transcription = kt.transcribe_audio(audio)
+        elapsed = time.perf_counter() - start
+        files.append({
+            "file": os.path.basename(path),
+            "seconds": round(seconds, 2),
+            "decode_s": round(elapsed, 3),
+            "rtf": round(elapsed / seconds, 3) if seconds else None,
+            "tier": transcription["tier"],
+            "text": transcription["text"],
+        })
+
+    print(json.dumps({
+        "backend": backend,
+        "asr": kt.asr.info(),
+        "decoding": kt.WHISPER_DECODING,
+        "load_s": round(load_s, 2),
+        "rss_mb": {"start": rss_start, "loaded": rss_loaded, "peak": peak_rss_mb()},
+        "files": files,
+    }, ensure_ascii=False))
+
+
+def run_backend(backend: str, model, wavs: str):
+    command = [sys.executable, os.path.abspath(__file__), "--worker", backend, "--wavs", wavs]
+    if model:
+        command += ["--model", f"{backend}={model}"]
+    completed = subprocess.run(command, cwd=BACKEND_DIR, capture_output=True, text=True, encoding="utf-8")
+    lines = [line for line in completed.stdout.splitlines() if line.startswith("{")]
+    if completed.returncode != 0 or not lines:
+        return {"backend": backend, "error": (completed.stderr.strip().splitlines() or ["no output"])[-1]}
+    return json.loads(lines[-1])
+
+
+def parse_models(values):
+    models = {}
+    for value in values or []:
+        backend, _, model = value.partition("=")
+        models[backend] = model
+    return models
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--wavs", required=True, help="Directory of WAV recordings (optional .txt references)")
+    parser.add_argument("--backends", default="whisper,faster-whisper", help="Comma separated backends to compare")
+    parser.add_argument("--model", action="append", help="backend=model name or path (repeatable)")
+    parser.add_argument("--json", help="Write per-backend and per-file results to this file")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    models = parse_models(args.model)
+    if args.worker:
+        run_worker(args.worker, models.get(args.worker), args.wavs)
+        return
+
+    if not glob.glob(os.path.join(args.wavs, "*.wav")):
+        sys.exit(f"No WAV files in {args.wavs}")
+    from kisametintesti import calculate_similarity
+    import logging
+    logging.disable(logging.INFO)
+
+    backends = [name.strip() for name in args.backends.split(",") if name.strip()]
+    results = {}
+    print(f"{'backend':<16}{'load s':>8}{'rss MB start/loaded/peak':>28}{'rtf p50':>9}{'rtf p95':>9}{'greedy':>8}")
+    for backend in backends:
+        result = run_backend(backend, models.get(backend), args.wavs)
+        results[backend] = result
+        if "error" in result:
+            print(f"{backend:<16}skipped: {result['error']}")
+            continue
+        rtfs = sorted(f["rtf"] for f in result["files"] if f["rtf"] is not None)
+        rss = result["rss_mb"]
+        result["rtf_p50"] = statistics.median(rtfs) if rtfs else None
+        result["rtf_p95"] = rtfs[min(len(rtfs) - 1, int(round(0.95 * (len(rtfs) - 1))))] if rtfs else None
+        greedy = sum(f["tier"] == "greedy" for f in result["files"])
+        print(f"{backend:<16}{result['load_s']:>8}{str(rss['start']):>12}/{str(rss['loaded'])}/{str(rss['peak']):<8}"
+              f"{result['rtf_p50'] or 0:>9.3f}{result['rtf_p95'] or 0:>9.3f}{greedy:>5}/{len(result['files'])}")
+
+    done = [backend for backend in backends if "error" not in results[backend]]
+    comparison = []
+    if done:
+        print(f"\n{'file':<28}" + "".join(f"{name[:14]:>16}" for name in done) + f"{'agreement':>11}")
+    for index, entry in enumerate(results[done[0]]["files"] if done else []):
+        row = {"file": entry["file"], "texts": {b: results[b]["files"][index]["text"] for b in done}}
+        reference_path = os.path.join(args.wavs, os.path.splitext(entry["file"])[0] + ".txt")
+        if os.path.exists(reference_path):
+            with open(reference_path, "r", encoding="utf-8") as f:
+                reference = f.read().strip()
+            row["similarity"] = {b: calculate_similarity(row["texts"][b], reference) for b in done}
+            row["same_verdict"] = len({score >= PASS_SIMILARITY for score in row["similarity"].values()}) == 1
+        if len(done) > 1:
+            row["text_agreement"] = calculate_similarity(row["texts"][done[0]], row["texts"][done[1]])
+        comparison.append(row)
+        scores = row.get("similarity", {})
+        print(f"{entry['file'][:27]:<28}" + "".join(f"{str(scores.get(b, '-')):>16}" for b in done)
+              + f"{str(row.get('text_agreement', '-')):>11}")
+
+    summary = {}
+    if len(done) > 1 and comparison:
+        summary["mean_text_agreement"] = round(statistics.mean(row["text_agreement"] for row in comparison), 2)
+    scored = [row for row in comparison if "similarity" in row]
+    if scored:
+        summary["mean_similarity"] = {b: round(statistics.mean(row["similarity"][b] for row in scored), 2)
+                                      for b in done}
+        summary["same_verdict"] = f"{sum(row['same_verdict'] for row in scored)}/{len(scored)}"
+    if summary:
+        print()
+        for key, value in summary.items():
+            print(f"{key}: {value}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"backends": results, "files": comparison, "summary": summary}, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Side-by-side comparison of the handwriting text detection engines.
+
+For every image the shared preprocess_image output is fed to each engine
+("contours": multi-pass findContours + deduplication, "components": one
+connectedComponentsWithStats pass), followed by the same line grouping and
+line analysis as /handwriting/analyze_handwriting. Reports box and line
+counts, the overall scores and detection latency per engine, and how far the
+component scores are from the contour scores.
+
+Usage (from backend/python):
+    python benchmarks/compare_handwriting_engines.py --images path/to/handwriting --json engines.json
+    python benchmarks/compare_handwriting_engines.py            # synthetic pages
+"""
+import argparse
+import glob
+import json
+import os
+import statistics
+import sys
+import time
+
+import cv2
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import handwriting_analyzer as hw  # noqa: E402
+
+SCORE_KEYS = ("micrography_score", "overall_quality_score", "size_consistency_score",
+              "alignment_quality_score", "spacing_regularity_score", "baseline_stability_score")
+
+
+def load_corpus(images_dir, synthetic: int):
+    if images_dir:
+        paths = []
+        for pattern in ("*.png", "*.jpg", "*.jpeg"):
+            paths.extend(glob.glob(os.path.join(images_dir, pattern)))
+        for path in sorted(paths):
+            img = cv2.imread(path, cv2.IMREAD_COLOR)
+            if img is not None:
+                yield os.path.basename(path), img
+        return
+    from bench_api import make_handwriting_png
+    for seed in range(synthetic):
+        png = make_handwriting_png(seed, lines=3 + seed % 8)
+        yield f"synthetic_{seed}.png", cv2.imdecode(np.frombuffer(png, np.uint8), cv2.IMREAD_COLOR)
+
+
+def run_engine(processed: np.ndarray, engine: str, contour_profile: str, repeats: int):
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        boxes = hw.detect_text_boxes(processed, engine, contour_profile)
+        latencies.append((time.perf_counter() - start) * 1000.0)
+
+    lines = hw.group_boxes_into_lines_enhanced(boxes)
+    results, averages = hw.analyze_line_boxes(hw.lines_to_box_array(lines))
+    return {
+        "boxes": len(boxes),
+        "lines": len(results),
+        "detect_ms": round(min(latencies), 2),
+        "micrography_score": round(averages["micrography_score"], 3),
+        "overall_quality_score": round(averages["overall_quality_score"], 3),
+        "size_consistency_score": round(averages["size_consistency"], 3),
+        "alignment_quality_score": round(averages["alignment_quality"], 3),
+        "spacing_regularity_score": round(averages["spacing_regularity"], 3),
+        "baseline_stability_score": round(averages["baseline_stability"], 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", help="Directory of PNG/JPG handwriting images (synthetic pages if omitted)")
+    parser.add_argument("--synthetic", type=int, default=12, help="Number of synthetic pages")
+    parser.add_argument("--contour-profile", default=hw.HANDWRITING_CONTOUR_PROFILE, choices=list(hw.CONTOUR_PROFILES))
+    parser.add_argument("--repeats", type=int, default=3, help="Timed detections per image (best is kept)")
+    parser.add_argument("--json", help="Write per-image results to this file")
+    args = parser.parse_args()
+
+    rows = []
+    print(f"{'image':<24}{'boxes c/cc':>14}{'lines c/cc':>12}{'ms c/cc':>16}{'quality c/cc':>16}{'micro c/cc':>14}")
+    for name, img in load_corpus(args.images, args.synthetic):
+        processed = hw.preprocess_image(img)
+        row = {
+            "image": name,
+            "contours": run_engine(processed, "contours", args.contour_profile, args.repeats),
+            "components": run_engine(processed, "components", args.contour_profile, args.repeats),
+        }
+        rows.append(row)
+        c, cc = row["contours"], row["components"]
+        print(f"{name[:23]:<24}{c['boxes']:>7}/{cc['boxes']:<6}{c['lines']:>6}/{cc['lines']:<5}"
+              f"{c['detect_ms']:>8.1f}/{cc['detect_ms']:<7.1f}{c['overall_quality_score']:>8}/{cc['overall_quality_score']:<7}"
+              f"{c['micrography_score']:>7}/{cc['micrography_score']:<6}")
+
+    if not rows:
+        sys.exit("No images found")
+
+    summary = {
+        "images": len(rows),
+        "median_detect_ms": {
+            engine: statistics.median(row[engine]["detect_ms"] for row in rows)
+            for engine in ("contours", "components")
+        },
+        "mean_abs_score_diff": {
+            key: round(statistics.mean(abs(row["contours"][key] - row["components"][key]) for row in rows), 4)
+            for key in SCORE_KEYS
+        },
+        "same_line_count": sum(row["contours"]["lines"] == row["components"]["lines"] for row in rows),
+    }
+    print(f"\nMedian detection ms: contours {summary['median_detect_ms']['contours']:.1f}, "
+          f"components {summary['median_detect_ms']['components']:.1f}")
+    print(f"Same line count on {summary['same_line_count']}/{summary['images']} images")
+    for key, diff in summary["mean_abs_score_diff"].items():
+        print(f"  mean |diff| {key:<26}{diff}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"contour_profile": args.contour_profile, "summary": summary, "images": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
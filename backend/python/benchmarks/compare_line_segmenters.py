@@ -0,0 +1,193 @@
+"""
+Side-by-side comparison of the handwriting line segmenters.
+
+For every page the shared preprocess_image output goes through the selected
+detection engine once, and the boxes are grouped into lines by each
+segmenter: "boxes" (group_boxes_into_lines_enhanced, a running reference
+box) and "projection" (line bands from the horizontal ink profile,
+find_line_bands + group_boxes_by_bands). Reports the line count, grouping
+latency (the projection time includes computing the profile) and, on the
+synthetic pages where the true line of every glyph is known, line purity:
+the share of boxes whose line is made up mostly of boxes from their own
+true line.
+
+The synthetic pages are dense: line pitch close to the letter height,
+descenders, some short lines, words drifting up and down along a line
+and a slight slant.
+
+Usage (from backend/python):
+    python benchmarks/compare_line_segmenters.py --json segmenters.json
+    python benchmarks/compare_line_segmenters.py --images path/to/handwriting --engine components
+"""
+import argparse
+import glob
+import json
+import os
+import statistics
+import sys
+import time
+from collections import Counter
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import handwriting_analyzer as hw  # noqa: E402
+
+SEGMENTERS = ("boxes", "projection")
+WORDS = ["gelecek", "yaprak", "kagit", "defter", "bugun", "guzel", "pazar", "yolculuk", "agac", "kalem", "oyun"]
+
+
+def make_dense_page(seed: int, lines: int):
+    """A dense synthetic page and a label image (0 = paper, i + 1 = ink of line i)."""
+    rng = np.random.default_rng(seed)
+    scale = rng.uniform(1.0, 1.4)
+    (_, text_height), _ = cv2.getTextSize("Hg", cv2.FONT_HERSHEY_SIMPLEX, scale, 2)
+    pitch = int(text_height * rng.uniform(1.6, 2.1))
+    height, width = 120 + lines * pitch, 1400
+    labels = np.zeros((height, width), dtype=np.int32)
+    for i in range(lines):
+        x = 40 + int(rng.integers(0, 30))
+        baseline = 60 + text_height + i * pitch
+        slant = rng.uniform(-0.02, 0.02)
+        # Some lines are a word or two long
+        right = width - 40 if rng.random() > 0.25 else 400
+        while True:
+            word = str(rng.choice(WORDS))
+            word_scale = scale * rng.uniform(0.85, 1.1)
+            (word_width, _), _ = cv2.getTextSize(word, cv2.FONT_HERSHEY_SIMPLEX, word_scale, 2)
+            if x + word_width > right:
+                break
+            y = int(baseline + slant * x + rng.normal(0, text_height * 0.12))
+            mask = np.zeros((height, width), dtype=np.uint8)
+            cv2.putText(mask, word, (x, y), cv2.FONT_HERSHEY_SIMPLEX, word_scale, 255, 2, cv2.LINE_AA)
+            labels[(mask > 127) & (labels == 0)] = i + 1
+            x += word_width + int(rng.integers(18, 40))
+
+    img = np.full((height, width, 3), 245, dtype=np.float64)
+    img[labels > 0] = 20
+    img += rng.normal(0, 6, img.shape)
+    return np.clip(img, 0, 255).astype(np.uint8), labels
+
+
+def load_corpus(images_dir, synthetic: int):
+    if images_dir:
+        paths = []
+        for pattern in ("*.png", "*.jpg", "*.jpeg"):
+            paths.extend(glob.glob(os.path.join(images_dir, pattern)))
+        for path in sorted(paths):
+            img = cv2.imread(path, cv2.IMREAD_COLOR)
+            if img is not None:
+                yield os.path.basename(path), img, None
+        return
+    for seed in range(synthetic):
+        lines = 8 + seed % 10
+        img, labels = make_dense_page(seed, lines)
+        yield f"dense_{seed}_{lines}l.png", img, labels
+
+
+def true_lines(boxes, labels: np.ndarray, scale: float):
+    """Majority ink label inside each box (0 when it holds no glyph ink)."""
+    if scale != 1.0:
+        labels = cv2.resize(labels.astype(np.float32), (int(labels.shape[1] * scale), int(labels.shape[0] * scale)),
+                            interpolation=cv2.INTER_NEAREST).astype(np.int32)
+    truth = {}
+    for x, y, w, h in boxes:
+        inside = labels[y:y + h, x:x + w]
+        inside = inside[inside > 0]
+        truth[(x, y, w, h)] = int(np.bincount(inside).argmax()) if len(inside) else 0
+    return truth
+
+
+def purity(lines, truth) -> float:
+    total = matched = 0
+    for line_boxes in lines.values():
+        labels = [truth[box] for box in line_boxes if truth[box]]
+        if not labels:
+            continue
+        majority = Counter(labels).most_common(1)[0][1]
+        matched += majority
+        total += len(labels)
+    return matched / total if total else 0.0
+
+
+def group(segmenter: str, boxes, processed: np.ndarray):
+    if segmenter == "projection":
+        return hw.group_boxes_by_bands(boxes, hw.find_line_bands(hw.ink_profile(processed)))
+    return hw.group_boxes_into_lines_enhanced(boxes)
+
+
+def run_segmenter(segmenter: str, boxes, processed: np.ndarray, truth, repeats: int):
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        lines = group(segmenter, boxes, processed)
+        latencies.append((time.perf_counter() - start) * 1000.0)
+
+    row = {"lines": len(lines), "group_ms": round(min(latencies), 3)}
+    if truth is not None:
+        row["purity"] = round(purity(lines, truth), 4)
+    if lines:
+        _, averages = hw.analyze_line_boxes(hw.lines_to_box_array(lines))
+        row["overall_quality_score"] = round(averages["overall_quality_score"], 3)
+        row["micrography_score"] = round(averages["micrography_score"], 3)
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", help="Directory of PNG/JPG handwriting images (synthetic pages if omitted)")
+    parser.add_argument("--synthetic", type=int, default=12, help="Number of synthetic pages")
+    parser.add_argument("--engine", default="components", choices=list(hw.HANDWRITING_ENGINES))
+    parser.add_argument("--contour-profile", default=hw.HANDWRITING_CONTOUR_PROFILE, choices=list(hw.CONTOUR_PROFILES))
+    parser.add_argument("--repeats", type=int, default=5, help="Timed groupings per page (best is kept)")
+    parser.add_argument("--json", help="Write per-page results to this file")
+    args = parser.parse_args()
+
+    rows = []
+    print(f"{'page':<24}{'true':>6}{'lines b/p':>12}{'purity b/p':>18}{'ms b/p':>16}")
+    for name, img, labels in load_corpus(args.images, args.synthetic):
+        processed = hw.preprocess_image(img)
+        boxes = hw.detect_text_boxes(processed, args.engine, args.contour_profile)
+        truth = None
+        if labels is not None:
+            truth = true_lines(boxes, labels, hw.analysis_scale(*labels.shape))
+        row = {
+            "page": name,
+            "box_count": len(boxes),
+            "true_lines": int(labels.max()) if labels is not None else None,
+        }
+        for segmenter in SEGMENTERS:
+            row[segmenter] = run_segmenter(segmenter, boxes, processed, truth, args.repeats)
+        rows.append(row)
+        b, p = row["boxes"], row["projection"]  # per-segmenter results
+        print(f"{name[:23]:<24}{row['true_lines'] or '-':>6}{b['lines']:>6}/{p['lines']:<5}"
+              f"{b.get('purity', '-'):>9}/{p.get('purity', '-'):<8}{b['group_ms']:>8.2f}/{p['group_ms']:<7.2f}")
+
+    if not rows:
+        sys.exit("No images found")
+
+    summary = {"pages": len(rows)}
+    for segmenter in SEGMENTERS:
+        summary[segmenter] = {
+            "median_group_ms": statistics.median(row[segmenter]["group_ms"] for row in rows),
+        }
+        if rows[0]["true_lines"] is not None:
+            summary[segmenter]["mean_purity"] = round(statistics.mean(row[segmenter]["purity"] for row in rows), 4)
+            summary[segmenter]["exact_line_count"] = sum(row[segmenter]["lines"] == row["true_lines"] for row in rows)
+    print()
+    for segmenter in SEGMENTERS:
+        stats = summary[segmenter]
+        line = f"{segmenter:<11} median {stats['median_group_ms']:.2f} ms"
+        if "mean_purity" in stats:
+            line += f", mean purity {stats['mean_purity']}, exact line count on {stats['exact_line_count']}/{len(rows)}"
+        print(line)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"engine": args.engine, "summary": summary, "pages": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
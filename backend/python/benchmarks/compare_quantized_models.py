@@ -0,0 +1,147 @@
+"""
+Compare a float32 drawing model with a quantized (float16 / int8) variant.
+
+Runs both models over a local image set with the same preprocessing the API
+uses and reports top-1 agreement, score drift, p50/p99 latency, model file
+size and peak resident memory. Each model runs in its own process so the
+memory numbers are not mixed.
+
+Usage (from backend/python):
+    python benchmarks/compare_quantized_models.py \\
+        --reference models/spiral_test_model_densenet121.tflite \\
+        --candidate models/spiral_test_model_densenet121_int8.tflite \\
+        --images path/to/spiral_pngs --json results.json
+"""
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux KiB, macOS byte döndürür
+    return round(peak / 1024.0 / (1024.0 if sys.platform == "darwin" else 1.0), 1)
+
+
+def run_model(model_path: str, image_paths, num_threads: int, repeats: int):
+    """Load one model in this process and score every image; returns outputs, latencies and memory."""
+    from drawing_preprocessing import load_resized_rgb
+    from inference_engine import InterpreterPool
+
+    pool = InterpreterPool("compare", model_path, pool_size=1, num_threads=num_threads)
+    pool.load()
+    pool.warm_up()
+    _, height, width, _ = [int(d) for d in pool.input_details[0]["shape"]]
+
+    outputs = []
+    latencies = []
+    for path in image_paths:
+        image = load_resized_rgb(read_image(path), width, height)
+        for _ in range(repeats):
+            start = time.perf_counter()
+            output = pool.predict_images([image])[0]
+            latencies.append((time.perf_counter() - start) * 1000.0)
+        outputs.append(np.asarray(output, dtype=np.float32).tolist())
+
+    return {
+        "model_path": model_path,
+        "file_size_mb": round(os.path.getsize(model_path) / 1024.0 / 1024.0, 2),
+        "input_dtype": str(np.dtype(pool.input_details[0]["dtype"])),
+        "outputs": outputs,
+        "latencies_ms": latencies,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def read_image(path: str) -> bytes:
+    if path.startswith("synthetic:"):
+        from bench_drawing_preprocess import make_drawing_png
+        return make_drawing_png(int(path.split(":")[1]))
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _worker(args):
+    return run_model(*args)
+
+
+def summarize(result):
+    latencies = np.array(result["latencies_ms"])
+    return {
+        "model_path": result["model_path"],
+        "file_size_mb": result["file_size_mb"],
+        "input_dtype": result["input_dtype"],
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+        "peak_rss_mb": result["peak_rss_mb"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reference", required=True, help="float32 .tflite model")
+    parser.add_argument("--candidate", required=True, help="Quantized .tflite model")
+    parser.add_argument("--images", help="Directory of PNG images (synthetic spirals if omitted)")
+    parser.add_argument("--threads", type=int, default=1, help="Interpreter num_threads")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed invokes per image")
+    parser.add_argument("--json", help="Write the full report to this file")
+    args = parser.parse_args()
+
+    if args.images:
+        image_paths = sorted(glob.glob(os.path.join(args.images, "*.png")))
+    else:
+        image_paths = [f"synthetic:{size}" for size in (400, 720, 1080)]
+    if not image_paths:
+        parser.error(f"No PNG images found in {args.images}")
+
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(1) as pool:
+        reference = pool.apply(_worker, ((args.reference, image_paths, args.threads, args.repeats),))
+    with ctx.Pool(1) as pool:
+        candidate = pool.apply(_worker, ((args.candidate, image_paths, args.threads, args.repeats),))
+
+    ref_out = np.array(reference["outputs"])
+    cand_out = np.array(candidate["outputs"])
+    top1_agreement = float(np.mean(ref_out.argmax(axis=1) == cand_out.argmax(axis=1)))
+    abs_diff = np.abs(ref_out - cand_out)
+
+    report = {
+        "images": len(image_paths),
+        "top1_agreement": round(top1_agreement, 4),
+        "max_abs_score_diff": round(float(abs_diff.max()), 4),
+        "mean_abs_score_diff": round(float(abs_diff.mean()), 4),
+        "reference": summarize(reference),
+        "candidate": summarize(candidate),
+    }
+
+    print(f"Images: {report['images']}")
+    print(f"Top-1 agreement: {report['top1_agreement'] * 100:.2f}%  "
+          f"score diff mean/max: {report['mean_abs_score_diff']}/{report['max_abs_score_diff']}")
+    print(f"{'model':<10}{'dtype':>9}{'size MB':>10}{'p50 ms':>10}{'p99 ms':>10}{'peak RSS MB':>14}")
+    for label in ("reference", "candidate"):
+        row = report[label]
+        print(f"{label:<10}{row['input_dtype']:>9}{row['file_size_mb']:>10}{row['p50_ms']:>10}"
+              f"{row['p99_ms']:>10}{str(row['peak_rss_mb']):>14}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+import asyncio
+import json
+import logging
+import zipfile
+from typing import List, Optional, Callable, Awaitable, Tuple
+
+from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+
+import spiral_app
+import meander_app
+import clock_drawing_app
+import model_registry
+from config import env_int
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Test adı -> çizim modülü (preprocess_image_for_model, build_prediction_result, engine)
+DRAWING_TESTS = {
+    "spiral": spiral_app,
+    "meander": meander_app,
+    "clock": clock_drawing_app,
+}
+
+BULK_BATCH_SIZE = env_int("BULK_BATCH_SIZE", 16)
+BULK_MAX_IN_FLIGHT = env_int("BULK_MAX_IN_FLIGHT", 64)
+BULK_MAX_IMAGES = env_int("BULK_MAX_IMAGES", 10000)
+BULK_MAX_IMAGE_BYTES = env_int("BULK_MAX_IMAGE_BYTES", 20 * 1024 * 1024)
+
+ImageSource = Tuple[str, Callable[[], Awaitable[bytes]]]
+
+
+def _upload_sources(images: List[UploadFile]) -> List[ImageSource]:
+    sources = []
+    for upload in images:
+        async def read(upload=upload) -> bytes:
+            return await upload.read()
+        sources.append((upload.filename, read))
+    return sources
+
+
+def _zip_sources(archive: UploadFile) -> List[ImageSource]:
+    """List PNG entries of a zip archive; entries are read lazily, one at a time."""
+    try:
+        zf = zipfile.ZipFile(archive.file)
+    except zipfile.BadZipFile:
+        raise HTTPException(400, detail="Geçersiz zip arşivi")
+
+    # ZipFile tek bir dosya nesnesi paylaştığı için okumalar sıraya alınır
+    read_lock = asyncio.Lock()
+    sources = []
+    for info in zf.infolist():
+        name = info.filename
+        if info.is_dir() or name.startswith("__MACOSX/") or not name.lower().endswith(".png"):
+            continue
+
+        async def read(info=info) -> bytes:
+            if info.file_size > BULK_MAX_IMAGE_BYTES:
+                raise ValueError(f"Dosya çok büyük: {info.file_size} bytes")
+            async with read_lock:
+                return await run_in_threadpool(zf.read, info)
+        sources.append((name, read))
+    return sources
+
+
+def _ndjson(payload: dict) -> bytes:
+    return (json.dumps(payload, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+async def _score_stream(module, sources: List[ImageSource]):
+    """
+    Preprocess images in parallel, run them through the model in batches and
+    yield one NDJSON line per image as soon as its batch finishes.
+
+    At most BULK_MAX_IN_FLIGHT images are held in memory at any time.
+    """
+    tasks = set()
+    batch = []
+    next_index = 0
+    preprocess_pending = 0
+    in_flight = 0
+    succeeded = 0
+    failed = 0
+
+    async def preprocess(index: int, filename: str, read):
+        try:
+            image_bytes = await read()
+            image = await run_in_threadpool(module.preprocess_image_for_model, image_bytes)
+            return "preprocessed", (index, filename, image, None)
+        except HTTPException as e:
+            return "preprocessed", (index, filename, None, e.detail)
+        except Exception as e:
+            return "preprocessed", (index, filename, None, str(e))
+
+    async def infer(items):
+        try:
+            outputs = await module.engine.predict_images_async([image for _, _, image in items])
+            results = []
+            for (index, filename, _), output in zip(items, outputs):
+                try:
+                    results.append((index, filename, module.build_prediction_result(output), None))
+                except HTTPException as e:
+                    results.append((index, filename, None, e.detail))
+            return "inferred", results
+        except Exception as e:
+            return "inferred", [(index, filename, None, str(e)) for index, filename, _ in items]
+
+    try:
+        while next_index < len(sources) or tasks or batch:
+            while next_index < len(sources) and in_flight < BULK_MAX_IN_FLIGHT:
+                filename, read = sources[next_index]
+                tasks.add(asyncio.ensure_future(preprocess(next_index, filename, read)))
+                next_index += 1
+                preprocess_pending += 1
+                in_flight += 1
+
+            # Batch doldu ya da bekleyen ön işleme kalmadıysa çıkarımı başlat
+            if batch and (len(batch) >= BULK_BATCH_SIZE or preprocess_pending == 0):
+                tasks.add(asyncio.ensure_future(infer(batch[:BULK_BATCH_SIZE])))
+                batch = batch[BULK_BATCH_SIZE:]
+                continue
+
+            done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                kind, payload = task.result()
+                if kind == "preprocessed":
+                    index, filename, image, error = payload
+                    preprocess_pending -= 1
+                    if error is not None:
+                        in_flight -= 1
+                        failed += 1
+                        yield _ndjson({"index": index, "filename": filename, "status": "error", "detail": error})
+                    else:
+                        batch.append((index, filename, image))
+                else:
+                    for index, filename, result, error in payload:
+                        in_flight -= 1
+                        if error is not None:
+                            failed += 1
+                            yield _ndjson({"index": index, "filename": filename, "status": "error", "detail": error})
+                        else:
+                            succeeded += 1
+                            yield _ndjson({"index": index, "filename": filename, "status": "success", **result})
+    finally:
+        # İstemci koptuysa üreteç bir yield'da kapanır: kalan ön işleme ve çıkarım işleri
+        # kimse için çalışmasın, interpreter havuzunu meşgul etmesin
+        for task in tasks:
+            task.cancel()
+        batch.clear()
+
+    yield _ndjson({"status": "done", "total": len(sources), "succeeded": succeeded, "failed": failed})
+
+
+@router.post("/bulk_score/{test_name}")
+async def bulk_score(
+    test_name: str,
+    images: Optional[List[UploadFile]] = File(None),
+    archive: Optional[UploadFile] = File(None)
+):
+    """
+    Score many spiral / meander / clock drawings in one request.
+
+    Accepts several PNG files in the `images` field and/or a zip archive of
+    PNGs in the `archive` field. Results are streamed back as NDJSON, one line
+    per image in completion order, followed by a summary line.
+    """
+    module = DRAWING_TESTS.get(test_name)
+    if module is None:
+        raise HTTPException(404, detail=f"Bilinmeyen test: {test_name}. Geçerli testler: {', '.join(DRAWING_TESTS)}")
+    if not await model_registry.ensure_loaded_async(test_name):
+        raise HTTPException(500, detail="ML modeli yüklenemedi - model dosyası bulunamadı veya yüklenemedi")
+
+    sources = []
+    if images:
+        for upload in images:
+            if not upload.filename.lower().endswith(".png"):
+                raise HTTPException(400, detail=f"Sadece PNG dosyaları kabul edilir: {upload.filename}")
+        sources.extend(_upload_sources(images))
+    if archive is not None:
+        sources.extend(_zip_sources(archive))
+
+    if not sources:
+        raise HTTPException(400, detail="En az bir PNG dosyası veya PNG içeren bir zip arşivi gönderilmelidir")
+    if len(sources) > BULK_MAX_IMAGES:
+        raise HTTPException(413, detail=f"Bir istekte en fazla {BULK_MAX_IMAGES} görüntü işlenebilir")
+
+    logger.info(f"Toplu puanlama başlıyor: test={test_name}, görüntü sayısı={len(sources)}")
+    return StreamingResponse(_score_stream(module, sources), media_type="application/x-ndjson")
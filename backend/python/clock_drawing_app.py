@@ -1,14 +1,16 @@
 import os
-os.environ['TF_ENABLE_ONEDNN_OPTS'] = '0'
 
 from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
 import numpy as np
-from PIL import Image
-import tensorflow as tf
-import io
 import logging
-import datetime
+
+import debug_capture
+import inference_engine
+import model_registry
+import result_cache
+from drawing_preprocessing import load_resized_rgb
 
 router = APIRouter()
 
@@ -18,24 +20,27 @@ logger = logging.getLogger(__name__)
 
 # Saat çizim modeli için yol
 # Modeli 'models' klasöründe 'clock_test_model_densenet121.tflite' olarak bekliyoruz.
-MODEL_PATH = os.path.join(
+# DRAWING_MODEL_VARIANT / CLOCK_MODEL_VARIANT ile float16 veya int8 varyantı seçilebilir
+MODEL_PATH = inference_engine.variant_model_path("clock", os.path.join(
     os.path.dirname(__file__),
     "models",
     "clock_test_model_densenet121.tflite"
-)
+))
 
 print(f"Looking for model at: {MODEL_PATH}")
 print(f"Model exists: {os.path.exists(MODEL_PATH)}")
 
+# Interpreter havuzu (paylaşılan çıkarım motoru)
+engine = inference_engine.register_model("clock", MODEL_PATH)
+
 # Global değişkenler
-interpreter = None
 input_details = None
 output_details = None
 MODEL_INPUT_HEIGHT, MODEL_INPUT_WIDTH, MODEL_INPUT_CHANNELS, MODEL_INPUT_DTYPE = None, None, None, None
 
 
 def load_model():
-    global interpreter, input_details, output_details, \
+    global input_details, output_details, \
            MODEL_INPUT_HEIGHT, MODEL_INPUT_WIDTH, MODEL_INPUT_CHANNELS, MODEL_INPUT_DTYPE
 
     try:
@@ -45,12 +50,14 @@ def load_model():
             logger.error(f"Files in current directory: {os.listdir('.')}")
             raise FileNotFoundError(f"Model dosyası bulunamadı: {MODEL_PATH}")
 
-        interpreter = tf.lite.Interpreter(model_path=MODEL_PATH)
-        interpreter.allocate_tensors()
-        logger.info("TFLite modeli başarıyla yüklendi ve tensorler ayrıldı.")
+        engine.load()
+        logger.info(
+            f"TFLite modeli başarıyla yüklendi ve tensorler ayrıldı "
+            f"({engine.pool_size} interpreter, interpreter başına {engine.num_threads} thread)."
+        )
 
-        input_details = interpreter.get_input_details()
-        output_details = interpreter.get_output_details()
+        input_details = engine.input_details
+        output_details = engine.output_details
         logger.info(f"Model giriş detayları: {input_details}")
         logger.info(f"Model çıkış detayları: {output_details}")
 
@@ -66,62 +73,34 @@ def load_model():
 
     except Exception as e:
         logger.error(f"TFLite modeli yüklenirken hata oluştu: {e}")
-        interpreter = None
+        raise
 
-load_model()
+# Model ilk istekte ya da uygulama açılışındaki arka plan ısınmasında yüklenir
+model_registry.register("clock", load_model, warmup=engine.warm_up)
 
 def preprocess_image_for_model(image_bytes: bytes) -> np.ndarray:
-    if interpreter is None:
+    """
+    Görüntüyü model çözünürlüğünde (H, W, 3) uint8 diziye dönüştür.
+
+    Normalizasyon, çıkarım sırasında doğrudan interpreter'ın giriş tamponuna
+    yapılır (bkz. inference_engine.InterpreterPool.predict_images).
+    """
+    if not engine.is_loaded:
         raise ValueError("ML modeli yüklenmediği için ön işleme yapılamıyor.")
     if None in (MODEL_INPUT_HEIGHT, MODEL_INPUT_WIDTH, MODEL_INPUT_CHANNELS, MODEL_INPUT_DTYPE):
         raise ValueError("Model detayları alınamadığı için ön işleme yapılamıyor.")
+    if MODEL_INPUT_DTYPE not in (np.float32, np.uint8, np.int8):
+        raise ValueError(f"Bilinmeyen dtype: {MODEL_INPUT_DTYPE}")
 
     try:
-        # 1. Baytları Image nesnesine çevir
-        img_pil = Image.open(io.BytesIO(image_bytes))
-        logger.info(f"Yüklenen görüntünün orijinal modu: {img_pil.mode}")
-
-        # RGBA -> RGB dönüştür
-        if img_pil.mode == 'RGBA':
-            background = Image.new("RGB", img_pil.size, (255, 255, 255))
-            background.paste(img_pil, mask=img_pil.split()[3])
-            img_pil = background
-        elif img_pil.mode != 'RGB':
-            img_pil = img_pil.convert('RGB')
-
-        # 2. Yeniden boyutlandır
-        img_pil = img_pil.resize(
-            (MODEL_INPUT_WIDTH, MODEL_INPUT_HEIGHT),
-            Image.Resampling.LANCZOS
-        )
-
-        # Debug için kaydet
-        debug_dir = "debug_preprocessed_images"
-        os.makedirs(debug_dir, exist_ok=True)
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-        debug_path = os.path.join(debug_dir, f"preprocessed_clock_{timestamp}.png")
-        img_pil.save(debug_path)
-        logger.info(f"Ön işlenmiş görüntü kaydedildi: {debug_path}")
-
-        # 3. NumPy array'e çevir
-        img_array = np.array(img_pil, dtype=np.float32)
+        # Çöz, RGBA ise beyaz zemine birleştir ve model boyutuna getir
+        img_array = load_resized_rgb(image_bytes, MODEL_INPUT_WIDTH, MODEL_INPUT_HEIGHT, router="clock")
 
-        # 4. dtype'e göre normalize et
-        if MODEL_INPUT_DTYPE == np.float32:
-            img_array = img_array / 255.0
-        elif MODEL_INPUT_DTYPE == np.uint8:
-            img_array = img_array.astype(np.uint8)
-        else:
-            raise ValueError(f"Bilinmeyen dtype: {MODEL_INPUT_DTYPE}")
-
-        # 5. Batch boyutu ekle
-        img_array = np.expand_dims(img_array, axis=0)
-
-        logger.info(
-            f"Input tensor -> shape: {img_array.shape}, dtype: {img_array.dtype}, "
-            f"min: {img_array.min():.4f}, max: {img_array.max():.4f}"
-        )
+        # Debug için örnekle (varsayılan kapalı; PNG yazımı arka planda yapılır)
+        if debug_capture.should_capture():
+            debug_capture.capture("clock", img_array)
 
+        logger.info(f"Ön işlenmiş görüntü -> shape: {img_array.shape}, model dtype: {MODEL_INPUT_DTYPE}")
         return img_array
 
     except Exception as e:
@@ -129,10 +108,42 @@ def preprocess_image_for_model(image_bytes: bytes) -> np.ndarray:
         raise HTTPException(400, f"Görüntü işleme hatası: {str(e)}")
 
 
+def build_prediction_result(output_data: np.ndarray) -> dict:
+    """Model çıktısını Shulman puanı yanıtına dönüştür"""
+    # Shulman puanlama sistemine göre yorumlama (0'dan 5'e kadar kategoriler)
+    # Modelin çıktısının 6 elemanlı bir olasılık dizisi olduğunu varsayıyoruz (0-5 puanları için)
+    if len(output_data) != 6:
+        logger.error(f"Beklenmeyen model çıktı boyutu: {len(output_data)}. 6 bekleniyordu (0-5 Shulman puanları).")
+        raise HTTPException(500, detail="Model çıktısı Shulman puanlama formatına uymuyor.")
+
+    # En yüksek olasılığa sahip Shulman puanını bul
+    shulman_score = int(np.argmax(output_data))
+    confidence = float(output_data[shulman_score]) # Tahmin edilen puanın güven seviyesi
+
+    # Shulman puanına göre özet metni oluştur
+    shulman_descriptions = {
+        0: "0 - Saat çizimi yok veya tanınamaz.",
+        1: "1 - Ağır görsel-uzamsal bozukluk (şekil bozukluğu, sayıların yanlış yerleşimi, sayıların eksikliği).",
+        2: "2 - Orta derecede görsel-uzamsal bozukluk (ellerin yanlış yerleşimi, sayıların eksikliği).",
+        3: "3 - Hafif görsel-uzamsal bozukluk (ellerin yanlış yerleşimi, hafif sayı hataları).",
+        4: "4 - Çok hafif görsel-uzamsal bozukluk (küçük hatalar, örneğin sayıların hafif kayması).",
+        5: "5 - Mükemmel çizim, tüm öğeler doğru ve oranlı."
+    }
+    
+    prediction_summary = f"Shulman Puanı: {shulman_score} - {shulman_descriptions.get(shulman_score, 'Bilinmeyen Puan')}"
+    prediction_summary += f" (Güven: {confidence:.2f})"
+
+    return {
+        "shulman_score": shulman_score,
+        "confidence": confidence,
+        "prediction_text_summary": prediction_summary
+    }
+
+
 @router.post("/predict_clock_drawing_score") # Endpoint adını güncelledik
 async def predict_clock_drawing_score(image: UploadFile = File(...)):
     """Saati çizim testi puanlama endpoint'i""" # Açıklamayı güncelledik
-    if interpreter is None:
+    if not await model_registry.ensure_loaded_async("clock"):
         raise HTTPException(500, detail="ML modeli yüklenemedi - model dosyası bulunamadı veya yüklenemedi")
 
     if not image.filename.lower().endswith(".png"):
@@ -142,44 +153,24 @@ async def predict_clock_drawing_score(image: UploadFile = File(...)):
         image_bytes = await image.read()
         logger.info(f"Received image for clock drawing test: {len(image_bytes)} bytes, filename: {image.filename}")
 
+        # Aynı görüntü ve model sürümü için önceki sonucu kullan
+        cache_key = result_cache.make_key("clock", engine.model_version, image_bytes)
+        cached = await result_cache.get_async(cache_key)
+        if cached is not None:
+            logger.info("Sonuç önbellekten döndürüldü")
+            return JSONResponse(content=cached)
+
         # Görüntüyü hazırla
-        processed_tensor = preprocess_image_for_model(image_bytes)
+        processed_image = await run_in_threadpool(preprocess_image_for_model, image_bytes)
 
-        # Model tahmini
-        interpreter.set_tensor(input_details[0]["index"], processed_tensor)
-        interpreter.invoke()
-        output_data = interpreter.get_tensor(output_details[0]["index"])[0]
+        # Model tahmini (interpreter havuzunda, event loop dışında)
+        output_data = (await engine.predict_image_async(processed_image))[0]
 
         logger.info(f"Raw model output for clock drawing test: {output_data}, shape: {output_data.shape}")
 
-        # Shulman puanlama sistemine göre yorumlama (0'dan 5'e kadar kategoriler)
-        # Modelin çıktısının 6 elemanlı bir olasılık dizisi olduğunu varsayıyoruz (0-5 puanları için)
-        if len(output_data) != 6:
-            logger.error(f"Beklenmeyen model çıktı boyutu: {len(output_data)}. 6 bekleniyordu (0-5 Shulman puanları).")
-            raise HTTPException(500, detail="Model çıktısı Shulman puanlama formatına uymuyor.")
-
-        # En yüksek olasılığa sahip Shulman puanını bul
-        shulman_score = int(np.argmax(output_data))
-        confidence = float(output_data[shulman_score]) # Tahmin edilen puanın güven seviyesi
-
-        # Shulman puanına göre özet metni oluştur
-        shulman_descriptions = {
-            0: "0 - Saat çizimi yok veya tanınamaz.",
-            1: "1 - Ağır görsel-uzamsal bozukluk (şekil bozukluğu, sayıların yanlış yerleşimi, sayıların eksikliği).",
-            2: "2 - Orta derecede görsel-uzamsal bozukluk (ellerin yanlış yerleşimi, sayıların eksikliği).",
-            3: "3 - Hafif görsel-uzamsal bozukluk (ellerin yanlış yerleşimi, hafif sayı hataları).",
-            4: "4 - Çok hafif görsel-uzamsal bozukluk (küçük hatalar, örneğin sayıların hafif kayması).",
-            5: "5 - Mükemmel çizim, tüm öğeler doğru ve oranlı."
-        }
-        
-        prediction_summary = f"Shulman Puanı: {shulman_score} - {shulman_descriptions.get(shulman_score, 'Bilinmeyen Puan')}"
-        prediction_summary += f" (Güven: {confidence:.2f})"
-
-        return JSONResponse(content={
-            "shulman_score": shulman_score,
-            "confidence": confidence,
-            "prediction_text_summary": prediction_summary
-        })
+        result = build_prediction_result(output_data)
+        result_cache.put(cache_key, result)
+        return JSONResponse(content=result)
 
     except Exception as e:
         logger.error(f"Saati çizim testi tahmin hatası: {str(e)}")
@@ -191,8 +182,10 @@ async def predict_clock_drawing_score(image: UploadFile = File(...)):
 async def health_check_clock_drawing():
     """Saati çizim testi backend ve model durumunu kontrol et""" # Açıklamayı güncelledik
     return JSONResponse(content={
-        "status": "healthy" if interpreter is not None else "model_not_loaded",
-        "model_loaded": interpreter is not None,
+        "status": "healthy" if engine.is_loaded else "model_not_loaded",
+        "model_loaded": engine.is_loaded,
         "model_path": MODEL_PATH,
-        "model_exists": os.path.exists(MODEL_PATH)
+        "model_exists": os.path.exists(MODEL_PATH),
+        "load_state": model_registry.status()["clock"],
+        "interpreter_pool": engine.stats()
     })
@@ -8,6 +8,8 @@ from typing import Optional, List, Dict, Any
 from dotenv import load_dotenv
 import os
 
+import metrics
+
 load_dotenv()
 router = APIRouter()
 
@@ -31,7 +33,8 @@ def load_questions():
     Soruları Excel dosyasından yükler ve doğrular.
     """
     try:
-        df_sorular = pd.read_excel('Sorular.xlsx')
+        with metrics.stage("cognitive", "load_questions"):
+            df_sorular = pd.read_excel('Sorular.xlsx')
         if 'Soru' not in df_sorular.columns or 'Index' not in df_sorular.columns:
             raise HTTPException(status_code=400, detail="'Sorular.xlsx' dosyasında 'Index' ve 'Soru' kolonları bulunmalıdır.")
         if len(df_sorular) < 10:
@@ -85,7 +88,8 @@ def get_gemini_feedback(qa_list):
     Lütfen yukarıdaki verilere dayanarak ayrıntılı geri bildirim raporunu oluştur. 
     """
     try:
-        response = model.generate_content(prompt)
+        with metrics.stage("cognitive", "gemini"):
+            response = model.generate_content(prompt)
         logger.info("Analiz raporu başarıyla oluşturuldu.")
         if not response.text:
             logger.warning("Gemini'den boş yanıt alındı.")
@@ -94,6 +98,7 @@ def get_gemini_feedback(qa_list):
         return response.text
     except Exception as e:
         logger.error(f"HATA: Gemini'den analiz alınırken bir sorun oluştu: {e}")
+        metrics.count("cognitive", "gemini_error")
         return f"Gemini'den yanıt alınamadı. Hata: {str(e)}"
 
 # FIXED: Combined endpoint that handles both getting questions and evaluating answers
@@ -0,0 +1,186 @@
+import base64
+import datetime
+import glob
+import io
+import logging
+import os
+import queue
+import random
+import threading
+from collections import defaultdict, deque
+from typing import Any, Dict, List
+
+import numpy as np
+from fastapi import APIRouter, HTTPException, Query
+from PIL import Image
+
+from config import env_bool, env_float, env_int, env_str
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Örnekleme oranı: 0 = kapalı (varsayılan), 1 = her istek
+DEBUG_CAPTURE_SAMPLE_RATE = env_float("DEBUG_CAPTURE_SAMPLE_RATE", 0.0)
+# Router başına bellekte tutulan son görüntü sayısı
+DEBUG_CAPTURE_BUFFER_SIZE = env_int("DEBUG_CAPTURE_BUFFER_SIZE", 16)
+DEBUG_CAPTURE_WRITE_TO_DISK = env_bool("DEBUG_CAPTURE_WRITE_TO_DISK", True)
+DEBUG_CAPTURE_DIR = env_str("DEBUG_CAPTURE_DIR", "debug_preprocessed_images")
+# Diskte tutulacak en fazla dosya sayısı (en eskiler silinir)
+DEBUG_CAPTURE_MAX_FILES = env_int("DEBUG_CAPTURE_MAX_FILES", 200)
+
+
+class DebugCaptureBuffer:
+    """
+    Sampled capture of preprocessed model inputs.
+
+    Captures live in a bounded per-router ring buffer; PNG encoding and disk
+    writes happen on a background thread, and the on-disk directory is
+    trimmed to the newest `max_files` images.
+    """
+
+    def __init__(self, sample_rate: float, buffer_size: int, write_to_disk: bool,
+                 directory: str, max_files: int):
+        self.sample_rate = max(0.0, min(1.0, sample_rate))
+        self.buffer_size = max(1, buffer_size)
+        self.write_to_disk = write_to_disk
+        self.directory = directory
+        self.max_files = max(0, max_files)
+        self._buffers = defaultdict(lambda: deque(maxlen=self.buffer_size))
+        self._lock = threading.Lock()
+        self._write_queue = queue.Queue(maxsize=self.buffer_size * 4)
+        self._written = deque()
+        self._writer = None
+        self._dropped = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0.0
+
+    def should_capture(self) -> bool:
+        return self.enabled and random.random() < self.sample_rate
+
+    def capture(self, router_name: str, image: np.ndarray):
+        """Store a copy of a preprocessed (H, W, C) uint8 image for `router_name`."""
+        entry = {
+            "router": router_name,
+            "timestamp": datetime.datetime.now(),
+            "image": np.array(image, dtype=np.uint8, copy=True),
+        }
+        with self._lock:
+            self._buffers[router_name].append(entry)
+
+        if self.write_to_disk and self.max_files > 0:
+            self._ensure_writer()
+            try:
+                self._write_queue.put_nowait(entry)
+            except queue.Full:
+                # Yazıcı yetişemiyorsa istek yolunu bekletme, kaydı atla
+                self._dropped += 1
+
+    def recent(self, router_name: str, n: int) -> List[Dict[str, Any]]:
+        with self._lock:
+            entries = list(self._buffers.get(router_name, ()))
+        return entries[-n:][::-1] if n > 0 else []
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            buffered = {name: len(entries) for name, entries in self._buffers.items()}
+        return {
+            "enabled": self.enabled,
+            "sample_rate": self.sample_rate,
+            "buffer_size": self.buffer_size,
+            "buffered": buffered,
+            "write_to_disk": self.write_to_disk,
+            "directory": self.directory,
+            "max_files": self.max_files,
+            "files_on_disk": len(self._written),
+            "dropped_writes": self._dropped,
+        }
+
+    def _ensure_writer(self):
+        with self._lock:
+            if self._writer is not None and self._writer.is_alive():
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            # Önceki çalıştırmalardan kalan dosyaları da saklama limitine dahil et
+            existing = sorted(glob.glob(os.path.join(self.directory, "preprocessed_*.png")), key=os.path.getmtime)
+            self._written = deque(existing)
+            self._writer = threading.Thread(target=self._write_loop, name="debug-capture-writer", daemon=True)
+            self._writer.start()
+
+    def _write_loop(self):
+        while True:
+            entry = self._write_queue.get()
+            try:
+                timestamp = entry["timestamp"].strftime("%Y%m%d_%H%M%S_%f")
+                path = os.path.join(self.directory, f"preprocessed_{entry['router']}_{timestamp}.png")
+                Image.fromarray(entry["image"]).save(path)
+                self._written.append(path)
+                while len(self._written) > self.max_files:
+                    old_path = self._written.popleft()
+                    try:
+                        os.remove(old_path)
+                    except FileNotFoundError:
+                        pass
+            except Exception as e:
+                logger.error(f"Debug görüntüsü yazılamadı: {e}")
+
+
+_buffer = DebugCaptureBuffer(
+    sample_rate=DEBUG_CAPTURE_SAMPLE_RATE,
+    buffer_size=DEBUG_CAPTURE_BUFFER_SIZE,
+    write_to_disk=DEBUG_CAPTURE_WRITE_TO_DISK,
+    directory=DEBUG_CAPTURE_DIR,
+    max_files=DEBUG_CAPTURE_MAX_FILES,
+)
+
+
+def should_capture() -> bool:
+    return _buffer.should_capture()
+
+
+def capture(router_name: str, image: np.ndarray):
+    _buffer.capture(router_name, image)
+
+
+def _encode(entry: Dict[str, Any], encoding: str) -> Dict[str, Any]:
+    image = entry["image"]
+    if encoding == "png":
+        out = io.BytesIO()
+        Image.fromarray(image).save(out, format="PNG")
+        data = out.getvalue()
+    else:
+        data = image.tobytes()
+    return {
+        "router": entry["router"],
+        "timestamp": entry["timestamp"].isoformat(),
+        "shape": list(image.shape),
+        "dtype": str(image.dtype),
+        "encoding": f"{encoding}_base64",
+        "data": base64.b64encode(data).decode("ascii"),
+    }
+
+
+@router.get("/captures/{router_name}")
+async def get_captures(
+    router_name: str,
+    n: int = Query(5, ge=1, le=256),
+    encoding: str = Query("png", pattern="^(png|raw)$")
+):
+    """Return the last N captured preprocessed inputs for a router, newest first."""
+    entries = _buffer.recent(router_name, n)
+    if not entries and not _buffer.enabled:
+        raise HTTPException(404, detail="Debug yakalama kapalı (DEBUG_CAPTURE_SAMPLE_RATE=0)")
+    return {
+        "router": router_name,
+        "count": len(entries),
+        "captures": [_encode(entry, encoding) for entry in entries],
+    }
+
+
+@router.get("/captures")
+async def get_capture_stats():
+    """Debug capture configuration and buffer occupancy."""
+    return _buffer.stats()
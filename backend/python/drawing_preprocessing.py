@@ -0,0 +1,77 @@
+import io
+from functools import lru_cache
+
+import numpy as np
+from PIL import Image
+
+import metrics
+
+
+def load_resized_rgb(image_bytes: bytes, width: int, height: int, router: str = "drawing") -> np.ndarray:
+    """
+    Decode an uploaded image and return it as an (height, width, 3) uint8 array.
+
+    RGBA inputs are composited onto white (the RGBA image itself is used as
+    the paste mask, so no per-band copies are made), other modes are
+    converted to RGB, and the result is resized with LANCZOS to the model
+    resolution. The returned array is read-only. Decode and resize times are
+    recorded as metrics stages of `router`.
+    """
+    with metrics.stage(router, "decode"):
+        img_pil = Image.open(io.BytesIO(image_bytes))
+        if img_pil.mode == 'RGBA':
+            background = Image.new("RGB", img_pil.size, (255, 255, 255))
+            background.paste(img_pil, mask=img_pil)
+            img_pil = background
+        elif img_pil.mode != 'RGB':
+            img_pil = img_pil.convert('RGB')
+        else:
+            img_pil.load()
+
+    with metrics.stage(router, "resize"):
+        if img_pil.size != (width, height):
+            img_pil = img_pil.resize((width, height), Image.Resampling.LANCZOS)
+        return np.asarray(img_pil)
+
+
+@lru_cache(maxsize=16)
+def _quantization_table(dtype_name: str, scale: float, zero_point: int) -> np.ndarray:
+    """Pixel value (0-255) -> quantized model input, for every possible pixel value."""
+    dtype = np.dtype(dtype_name)
+    info = np.iinfo(dtype)
+    values = np.arange(256, dtype=np.float64) / 255.0
+    quantized = np.round(values / scale + zero_point)
+    return np.clip(quantized, info.min, info.max).astype(dtype)
+
+
+def write_model_input(image: np.ndarray, out: np.ndarray, quantization=(0.0, 0)):
+    """
+    Normalize an (H, W, C) uint8 image straight into a model input buffer.
+
+    `out` is usually a view of the interpreter's own input tensor, so no
+    intermediate float copy is allocated. For quantized (int8/uint8) inputs
+    the [0, 1] pixel values are mapped with the tensor's (scale, zero_point)
+    through a 256-entry lookup table; uint8 inputs without quantization
+    parameters receive raw pixel values.
+    """
+    scale, zero_point = quantization
+    if out.dtype == np.float32:
+        np.divide(image, np.float32(255.0), out=out)
+    elif out.dtype in (np.uint8, np.int8):
+        if scale > 0:
+            table = _quantization_table(out.dtype.name, float(scale), int(zero_point))
+            np.take(table, image, out=out)
+        elif out.dtype == np.uint8:
+            np.copyto(out, image)
+        else:
+            raise ValueError("int8 giriş için quantization parametreleri gerekli")
+    else:
+        raise ValueError(f"Bilinmeyen dtype: {out.dtype}")
+
+
+def dequantize_output(output: np.ndarray, quantization=(0.0, 0)) -> np.ndarray:
+    """Convert a quantized (int8/uint8) model output back to float32 scores."""
+    scale, zero_point = quantization
+    if output.dtype in (np.uint8, np.int8) and scale > 0:
+        return (output.astype(np.float32) - np.float32(zero_point)) * np.float32(scale)
+    return output
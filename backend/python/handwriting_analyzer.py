@@ -1,20 +1,138 @@
 import cv2
 import numpy as np
-import pytesseract
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
 import logging
-from typing import List, Tuple, Dict, Any
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Tuple, Dict, Any, Iterator, Optional
 import io
 from PIL import Image
 import math
 
+import metrics
+import ocr_engine
+import result_cache
+import strokes
+import worker_pool
+from config import env_bool, env_float, env_int, env_str
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+# Bump whenever detection or scoring changes so cached results are not reused
+ALGORITHM_VERSION = "2"
+
+# Named preprocessing passes for get_text_contours_enhanced, in their original order
+CONTOUR_PASSES = {
+    "original": lambda x: x,
+    "inverted": lambda x: cv2.bitwise_not(x),
+    "gaussian_blur": lambda x: cv2.GaussianBlur(x, (3, 3), 0),
+    "median_blur": lambda x: cv2.medianBlur(x, 3),
+    "bilateral": lambda x: cv2.bilateralFilter(x, 9, 75, 75),
+    "adaptive_gaussian": lambda x: cv2.adaptiveThreshold(x, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2),
+    "adaptive_mean": lambda x: cv2.adaptiveThreshold(x, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY, 15, 3),
+}
+
+# "thorough" runs every pass (the original behaviour), "balanced" runs them in the
+# same order but stops once passes stop adding boxes, "fast" keeps only the passes
+# that find text on the binarized image produced by preprocess_image.
+CONTOUR_PROFILES = {
+    "thorough": {"passes": tuple(CONTOUR_PASSES), "early_exit": False},
+    "balanced": {"passes": tuple(CONTOUR_PASSES), "early_exit": True},
+    "fast": {"passes": ("original", "inverted"), "early_exit": True},
+}
+
+# Text detection engine: "contours" (multi-pass findContours + deduplication) or
+# "components" (one connectedComponentsWithStats pass)
+HANDWRITING_ENGINES = ("contours", "components")
+HANDWRITING_ENGINE = env_str("HANDWRITING_ENGINE", "contours")
+if HANDWRITING_ENGINE not in HANDWRITING_ENGINES:
+    logger.warning(f"Unknown HANDWRITING_ENGINE '{HANDWRITING_ENGINE}', using 'contours'")
+    HANDWRITING_ENGINE = "contours"
+
+HANDWRITING_CONTOUR_PROFILE = env_str("HANDWRITING_CONTOUR_PROFILE", "thorough")
+if HANDWRITING_CONTOUR_PROFILE not in CONTOUR_PROFILES:
+    logger.warning(f"Unknown HANDWRITING_CONTOUR_PROFILE '{HANDWRITING_CONTOUR_PROFILE}', using 'thorough'")
+    HANDWRITING_CONTOUR_PROFILE = "thorough"
+# OpenCV releases the GIL, so passes run concurrently on threads
+HANDWRITING_CONTOUR_WORKERS = max(1, env_int("HANDWRITING_CONTOUR_WORKERS", min(4, os.cpu_count() or 1)))
+# Early exit: stop after PATIENCE consecutive passes that each add at most
+# MIN_NEW_RATIO * (boxes found so far) new boxes
+CONTOUR_EARLY_EXIT_MIN_NEW_RATIO = env_float("HANDWRITING_CONTOUR_MIN_NEW_RATIO", 0.02)
+CONTOUR_EARLY_EXIT_PATIENCE = max(1, env_int("HANDWRITING_CONTOUR_PATIENCE", 2))
+# Boxes within this many pixels of each other count as the same box for early exit
+CONTOUR_NOVELTY_GRID = 3
+
+# Line segmentation: "boxes" (running reference box, group_boxes_into_lines_enhanced) or
+# "projection" (text bands from the horizontal ink profile of the binarized page)
+HANDWRITING_LINE_SEGMENTERS = ("boxes", "projection")
+HANDWRITING_LINE_SEGMENTER = env_str("HANDWRITING_LINE_SEGMENTER", "boxes")
+if HANDWRITING_LINE_SEGMENTER not in HANDWRITING_LINE_SEGMENTERS:
+    logger.warning(f"Unknown HANDWRITING_LINE_SEGMENTER '{HANDWRITING_LINE_SEGMENTER}', using 'boxes'")
+    HANDWRITING_LINE_SEGMENTER = "boxes"
+# Rows with at least this share of a typical text row's ink are text; inside each such
+# region, rows with CORE_RATIO of the region's busiest row form the line cores
+LINE_BAND_INK_RATIO = env_float("HANDWRITING_LINE_BAND_INK_RATIO", 0.1)
+LINE_BAND_CORE_RATIO = env_float("HANDWRITING_LINE_BAND_CORE_RATIO", 0.5)
+# Gaps shorter than this share of the median band height are closed (dots, accents)
+LINE_BAND_MIN_GAP_RATIO = 0.3
+
+# Ink cropping (opt-in): the expensive filters and contour passes run only on padded
+# crops around the ink found on a 1/INK_CROP_SCALE thumbnail. Output is close to, but
+# not bit-identical with, full-page processing because CLAHE tiles follow the crop.
+HANDWRITING_INK_CROP = env_bool("HANDWRITING_INK_CROP", False)
+INK_CROP_SCALE = 4
+# Thumbnail pixels this much darker than the median (paper) count as ink
+INK_CROP_DARKNESS = env_int("HANDWRITING_INK_CROP_DARKNESS", 30)
+# Context kept around the ink, in full-resolution pixels (covers the 15 px threshold block)
+INK_CROP_MARGIN = env_int("HANDWRITING_INK_CROP_MARGIN", 24)
+# Above this share of the page, cropping saves little and the full page is processed
+INK_CROP_MAX_COVERAGE = env_float("HANDWRITING_INK_CROP_MAX_COVERAGE", 0.6)
+
+# Tiled mode: each tile (plus overlap) is binarized and searched on its own, so the
+# filter buffers scale with the tile rather than the page. "auto" tiles pages above
+# HANDWRITING_TILED_MIN_PIXELS after analysis scaling (the largest is 2400x1600).
+HANDWRITING_TILED_MODES = ("auto", "always", "never")
+HANDWRITING_TILED = env_str("HANDWRITING_TILED", "auto")
+if HANDWRITING_TILED not in HANDWRITING_TILED_MODES:
+    logger.warning(f"Unknown HANDWRITING_TILED '{HANDWRITING_TILED}', using 'auto'")
+    HANDWRITING_TILED = "auto"
+HANDWRITING_TILE_SIZE = max(256, env_int("HANDWRITING_TILE_SIZE", 1024))
+HANDWRITING_TILE_OVERLAP = max(16, env_int("HANDWRITING_TILE_OVERLAP", 64))
+HANDWRITING_TILED_MIN_PIXELS = env_int("HANDWRITING_TILED_MIN_PIXELS", 2 * 1200 * 800)
+
+# Multi-page input (TIFF, and PDF when pypdfium2 is installed)
+HANDWRITING_MAX_PAGES = max(1, env_int("HANDWRITING_MAX_PAGES", 20))
+HANDWRITING_PDF_DPI = env_int("HANDWRITING_PDF_DPI", 150)
+HANDWRITING_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.tif', '.tiff', '.pdf')
+
+# analyze_image runs in a process pool (HANDWRITING_POOL_WORKERS=0 runs it on a thread).
+# Jobs beyond workers + queue get a 503; a job over the timeout gets a 504.
+HANDWRITING_POOL_WORKERS = max(0, env_int("HANDWRITING_POOL_WORKERS", min(4, max(1, (os.cpu_count() or 1) // 2))))
+HANDWRITING_POOL_QUEUE = max(0, env_int("HANDWRITING_POOL_QUEUE", 8))
+HANDWRITING_JOB_TIMEOUT_S = env_float("HANDWRITING_JOB_TIMEOUT_S", 60.0)
+
+def init_analysis_worker():
+    """Worker start-up: load the OCR fallback once, so its state is known before the first request."""
+    ocr_engine.ensure_loaded()
+
+
+# Each worker ships its OCR engine status back with every result (analysis_pool.worker_status)
+analysis_pool = worker_pool.register_pool(
+    "handwriting", HANDWRITING_POOL_WORKERS, HANDWRITING_POOL_QUEUE, HANDWRITING_JOB_TIMEOUT_S,
+    initializer=init_analysis_worker, status_fn=ocr_engine.status
+) if HANDWRITING_POOL_WORKERS > 0 else None
+
+_CLEANUP_KERNEL = np.ones((2, 2), np.uint8)
+_contour_executor = None
+_contour_executor_lock = threading.Lock()
 
 
 def preprocess_image(img: np.ndarray) -> np.ndarray:
@@ -22,14 +140,11 @@ def preprocess_image(img: np.ndarray) -> np.ndarray:
     Enhanced preprocessing for handwriting analysis.
     Applies multiple techniques for better text detection.
     """
-    # Convert to grayscale if needed
-    if len(img.shape) == 3:
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    else:
-        gray = img.copy()
-    
-    # Enhanced resizing for better handwriting analysis
-    height, width = gray.shape
+    return binarize_gray(to_analysis_gray(img))
+
+
+def analysis_scale(height: int, width: int) -> float:
+    """Scale applied to a page before analysis (1.0 when it is left as is)."""
     target_height = 800  # Optimal height for analysis
     target_width = 1200  # Optimal width for analysis
     
@@ -42,6 +157,24 @@ def preprocess_image(img: np.ndarray) -> np.ndarray:
     
     # Only resize if the image is significantly different from target size
     if scale_factor < 0.5 or scale_factor > 2.0:
+        return scale_factor
+    return 1.0
+
+
+def to_analysis_gray(img: np.ndarray) -> np.ndarray:
+    """Grayscale copy of the image, resized towards the 1200x800 analysis canvas."""
+    # Convert to grayscale if needed
+    if len(img.shape) == 3:
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    else:
+        gray = img.copy()
+    
+    # Enhanced resizing for better handwriting analysis
+    height, width = gray.shape
+    scale_factor = analysis_scale(height, width)
+    
+    # Only resize if the image is significantly different from target size
+    if scale_factor != 1.0:
         new_height = int(height * scale_factor)
         new_width = int(width * scale_factor)
         
@@ -52,7 +185,12 @@ def preprocess_image(img: np.ndarray) -> np.ndarray:
         else:
             # Downscaling - use area interpolation to avoid artifacts
             gray = cv2.resize(gray, (new_width, new_height), interpolation=cv2.INTER_AREA)
-    
+
+    return gray
+
+
+def binarize_gray(gray: np.ndarray) -> np.ndarray:
+    """Denoise, enhance contrast and threshold; text comes out black on white."""
     # Apply bilateral filter to reduce noise while preserving edges
     denoised = cv2.bilateralFilter(gray, 9, 75, 75)
     
@@ -73,61 +211,443 @@ def preprocess_image(img: np.ndarray) -> np.ndarray:
     return cleaned
 
 
-def get_text_contours_enhanced(img: np.ndarray) -> List[Tuple[int, int, int, int]]:
+def find_ink_regions(gray: np.ndarray) -> Optional[List[Tuple[int, int, int, int]]]:
     """
-    Enhanced text detection using multiple methods for better handwriting recognition.
+    Padded (x0, y0, x1, y1) regions around the ink of an analysis-size gray image.
+
+    Works on a 1/INK_CROP_SCALE thumbnail: pixels clearly darker than the
+    paper are dilated so that neighbouring strokes join, and every blob becomes
+    a region. Overlapping regions are merged. Returns None when the ink covers
+    so much of the page that cropping would not save work.
     """
+    height, width = gray.shape
+    scale = INK_CROP_SCALE
+    small = cv2.resize(gray, (max(1, width // scale), max(1, height // scale)), interpolation=cv2.INTER_AREA)
+    ink = (small < np.median(small) - INK_CROP_DARKNESS).astype(np.uint8)
+    if not ink.any():
+        return []
+
+    ink = cv2.dilate(ink, np.ones((5, 5), np.uint8))
+    _, _, stats, _ = cv2.connectedComponentsWithStats(ink, connectivity=8)
+    regions = []
+    for x, y, w, h, _ in stats[1:].tolist():
+        regions.append((
+            max(0, x * scale - INK_CROP_MARGIN), max(0, y * scale - INK_CROP_MARGIN),
+            min(width, (x + w) * scale + INK_CROP_MARGIN), min(height, (y + h) * scale + INK_CROP_MARGIN),
+        ))
+
+    # Merge until no two regions overlap (there are only a handful per page)
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(regions)):
+            for j in range(i + 1, len(regions)):
+                a, b = regions[i], regions[j]
+                if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                    regions[i] = (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+                    del regions[j]
+                    merged = True
+                    break
+            if merged:
+                break
+
+    covered = sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in regions)
+    if covered > INK_CROP_MAX_COVERAGE * width * height:
+        return None
+    return sorted(regions, key=lambda r: (r[1], r[0]))
+
+
+def preprocess_image_cropped(img: np.ndarray) -> Tuple[np.ndarray, Optional[List[Tuple[int, int, int, int]]]]:
+    """
+    preprocess_image that filters only the ink regions.
+
+    Returns the full-size binary canvas (white outside the regions, so box
+    coordinates stay in the same space as preprocess_image) and the regions,
+    or None for the regions when the whole page was processed.
+    """
+    gray = to_analysis_gray(img)
+    regions = find_ink_regions(gray)
+    if regions is None:
+        return binarize_gray(gray), None
+    canvas = np.full_like(gray, 255)
+    for x0, y0, x1, y1 in regions:
+        canvas[y0:y1, x0:x1] = binarize_gray(gray[y0:y1, x0:x1])
+    return canvas, regions
+
+
+def _get_contour_executor() -> ThreadPoolExecutor:
+    global _contour_executor
+    if _contour_executor is None:
+        with _contour_executor_lock:
+            if _contour_executor is None:
+                _contour_executor = ThreadPoolExecutor(
+                    max_workers=HANDWRITING_CONTOUR_WORKERS,
+                    thread_name_prefix="contour-pass"
+                )
+    return _contour_executor
+
+
+def run_contour_pass(img: np.ndarray, pass_name: str,
+                     regions: Optional[List[Tuple[int, int, int, int]]] = None) -> List[Tuple[int, int, int, int]]:
+    """
+    Run one preprocessing pass and return the candidate text boxes it finds.
+
+    With `regions` (see find_ink_regions) the pass runs on each crop and the
+    boxes are shifted back to page coordinates. A contour filling a whole crop
+    is the paper around it; on the full page that contour is the page box, so
+    it is reported as the page box (once).
+    """
+    if regions is None:
+        return _contour_pass_boxes(img, pass_name)
+    height, width = img.shape[:2]
     boxes = []
-    
-    # Method 1: Advanced contour detection with better preprocessing
-    preprocessing_methods = [
-        lambda x: x,  # Original
-        lambda x: cv2.bitwise_not(x),  # Inverted
-        lambda x: cv2.GaussianBlur(x, (3, 3), 0),  # Blurred
-        lambda x: cv2.medianBlur(x, 3),  # Median blur
-        lambda x: cv2.bilateralFilter(x, 9, 75, 75),  # Bilateral filter
-        lambda x: cv2.adaptiveThreshold(x, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2),  # Adaptive threshold
-        lambda x: cv2.adaptiveThreshold(x, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY, 15, 3),  # Mean threshold
-    ]
-    
-    for i, preprocess_func in enumerate(preprocessing_methods):
-        processed = preprocess_func(img)
-        
-        # Apply morphological operations for cleanup
-        kernel = np.ones((2, 2), np.uint8)
-        processed = cv2.morphologyEx(processed, cv2.MORPH_CLOSE, kernel)
-        processed = cv2.morphologyEx(processed, cv2.MORPH_OPEN, kernel)
-        
-        # Find contours
-        contours, _ = cv2.findContours(processed, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        
-        for contour in contours:
-            area = cv2.contourArea(contour)
-            if area < 5:  # Even lower minimum area for handwriting
+    page_box = (0, 0, width, height)
+    for x0, y0, x1, y1 in regions:
+        for x, y, w, h in _contour_pass_boxes(img[y0:y1, x0:x1], pass_name):
+            if (x, y, w, h) == (0, 0, x1 - x0, y1 - y0):
+                if page_box is not None:
+                    boxes.append(page_box)
+                    page_box = None
                 continue
-                
-            x, y, w, h = cv2.boundingRect(contour)
-            
-            # More flexible filtering for handwriting
-            aspect_ratio = w / h if h > 0 else 0
-            
-            # Very flexible criteria for handwriting detection
-            if (0.01 <= aspect_ratio <= 100 and  # Extremely flexible aspect ratio
-                h >= 1 and w >= 1 and           # Very low minimum dimensions
-                area >= 3):                     # Very low minimum area
-                boxes.append((x, y, w, h))
-    
+            boxes.append((x + x0, y + y0, w, h))
+    return boxes
+
+
+def _contour_pass_boxes(img: np.ndarray, pass_name: str) -> List[Tuple[int, int, int, int]]:
+    processed = CONTOUR_PASSES[pass_name](img)
+
+    # Apply morphological operations for cleanup
+    processed = cv2.morphologyEx(processed, cv2.MORPH_CLOSE, _CLEANUP_KERNEL)
+    processed = cv2.morphologyEx(processed, cv2.MORPH_OPEN, _CLEANUP_KERNEL)
+
+    # Find contours
+    contours, _ = cv2.findContours(processed, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    boxes = []
+    for contour in contours:
+        area = cv2.contourArea(contour)
+        if area < 5:  # Even lower minimum area for handwriting
+            continue
+
+        x, y, w, h = cv2.boundingRect(contour)
+
+        # More flexible filtering for handwriting
+        aspect_ratio = w / h if h > 0 else 0
+
+        # Very flexible criteria for handwriting detection
+        if (0.01 <= aspect_ratio <= 100 and  # Extremely flexible aspect ratio
+            h >= 1 and w >= 1 and           # Very low minimum dimensions
+            area >= 3):                     # Very low minimum area
+            boxes.append((x, y, w, h))
+    return boxes
+
+
+def get_text_contours_enhanced(img: np.ndarray, profile: Optional[str] = None,
+                               regions: Optional[List[Tuple[int, int, int, int]]] = None) -> List[Tuple[int, int, int, int]]:
+    """
+    Enhanced text detection using multiple methods for better handwriting recognition.
+
+    The passes of the selected profile (see CONTOUR_PROFILES) run concurrently,
+    at most HANDWRITING_CONTOUR_WORKERS at a time, and their boxes are merged
+    in pass order so the result does not depend on scheduling. With early
+    exit enabled, passes that have not started yet are skipped once the
+    last few passes stopped contributing new boxes. With `regions` every pass
+    only looks at the ink crops (see run_contour_pass).
+    """
+    settings = CONTOUR_PROFILES[profile or HANDWRITING_CONTOUR_PROFILE]
+    passes = iter(settings["passes"])
+    early_exit = settings["early_exit"]
+
+    boxes = []
+    seen = set()
+    stale_passes = 0
+    passes_run = 0
+    pending = deque()
+
+    def submit_next():
+        pass_name = next(passes, None)
+        if pass_name is None:
+            return
+        if HANDWRITING_CONTOUR_WORKERS == 1:
+            pending.append((pass_name, None))
+        else:
+            pending.append((pass_name, _get_contour_executor().submit(run_contour_pass, img, pass_name, regions)))
+
+    for _ in range(HANDWRITING_CONTOUR_WORKERS):
+        submit_next()
+
+    while pending:
+        pass_name, future = pending.popleft()
+        pass_boxes = future.result() if future is not None else run_contour_pass(img, pass_name, regions)
+        boxes.extend(pass_boxes)
+        passes_run += 1
+
+        if early_exit:
+            grid = CONTOUR_NOVELTY_GRID
+            keys = {(x // grid, y // grid, w // grid, h // grid) for x, y, w, h in pass_boxes}
+            new_boxes = len(keys - seen)
+            seen |= keys
+            if passes_run > 1 and new_boxes <= CONTOUR_EARLY_EXIT_MIN_NEW_RATIO * len(seen):
+                stale_passes += 1
+            else:
+                stale_passes = 0
+            if stale_passes >= CONTOUR_EARLY_EXIT_PATIENCE:
+                for _, queued in pending:
+                    if queued is not None:
+                        queued.cancel()
+                skipped = len(pending) + sum(1 for _ in passes)
+                if skipped:
+                    metrics.count("handwriting", "contour_early_exit")
+                    logger.info(f"Contour detection stopped early after {passes_run} passes ({skipped} skipped)")
+                break
+
+        submit_next()
+
     # Remove duplicate boxes
     if boxes:
         boxes = remove_overlapping_boxes(boxes)
-    
+
     return boxes
 
 
+def get_text_components(img: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Single-pass text detection on the output of preprocess_image.
+
+    The ink (dark pixels) is cleaned with the same 2x2 close/open as the
+    contour passes and labelled once with connectedComponentsWithStats.
+    Components are disjoint, so no deduplication is needed. Returns an
+    (N, 4) int64 array of x, y, w, h boxes and the pixel area of each
+    component, in label (raster) order.
+    """
+    ink = cv2.bitwise_not(img)
+    ink = cv2.morphologyEx(ink, cv2.MORPH_CLOSE, _CLEANUP_KERNEL)
+    ink = cv2.morphologyEx(ink, cv2.MORPH_OPEN, _CLEANUP_KERNEL)
+
+    _, _, stats, _ = cv2.connectedComponentsWithStats(ink, connectivity=8)
+    stats = stats[1:].astype(np.int64)  # label 0 is the background
+    widths = stats[:, cv2.CC_STAT_WIDTH]
+    heights = stats[:, cv2.CC_STAT_HEIGHT]
+    areas = stats[:, cv2.CC_STAT_AREA]
+
+    # Same size and aspect-ratio limits as the contour passes
+    aspect_ratio = widths / np.maximum(heights, 1)
+    keep = (areas >= 5) & (aspect_ratio >= 0.01) & (aspect_ratio <= 100)
+    return stats[keep, :4], areas[keep]
+
+
+def detect_text_boxes(img: np.ndarray, engine: str, contour_profile: Optional[str] = None,
+                      regions: Optional[List[Tuple[int, int, int, int]]] = None) -> List[Tuple[int, int, int, int]]:
+    """
+    Candidate text boxes from the selected engine (see HANDWRITING_ENGINES).
+
+    `regions` limits the contour passes to the ink crops. The components
+    engine is a single cheap pass and always labels the whole canvas, which
+    is blank outside the crops anyway.
+    """
+    if engine == "components":
+        boxes, _ = get_text_components(img)
+        return [tuple(box) for box in boxes.tolist()]
+    return get_text_contours_enhanced(img, contour_profile, regions)
+
+
+def tile_windows(height: int, width: int, tile: int, overlap: int) -> List[Tuple[Tuple[int, int, int, int], Tuple[int, int, int, int]]]:
+    """
+    Split a page into (core, window) pairs of (x0, y0, x1, y1) rectangles.
+
+    Cores tile the page without gaps or overlap; each window is its core
+    grown by `overlap` on every side (clipped to the page).
+    """
+    cols = max(1, math.ceil(width / tile))
+    rows = max(1, math.ceil(height / tile))
+    xs = [round(i * width / cols) for i in range(cols + 1)]
+    ys = [round(i * height / rows) for i in range(rows + 1)]
+    tiles = []
+    for r in range(rows):
+        for c in range(cols):
+            core = (xs[c], ys[r], xs[c + 1], ys[r + 1])
+            window = (max(0, core[0] - overlap), max(0, core[1] - overlap),
+                      min(width, core[2] + overlap), min(height, core[3] + overlap))
+            tiles.append((core, window))
+    return tiles
+
+
+def detect_text_boxes_tiled(gray: np.ndarray, engine: str, contour_profile: Optional[str] = None,
+                            tile: Optional[int] = None, overlap: Optional[int] = None,
+                            profile: Optional[np.ndarray] = None) -> Tuple[List[Tuple[int, int, int, int]], int]:
+    """
+    detect_text_boxes over an analysis-size gray page, one tile at a time.
+
+    Every window is binarized and searched on its own and then released, so
+    only one tile's filter buffers are alive at once. Boxes are stitched
+    across seams:
+      * a box that does not touch an inner window edge belongs to the tile
+        whose core contains its centre (this drops the copies seen in the
+        overlap of neighbouring tiles);
+      * a box touching an inner edge may be cut off, so it is merged with
+        every overlapping box from the other tiles into one box;
+      * a box filling a whole window is the paper background, reported once
+        as the page box like the full-page contour pass does.
+    Returns the boxes and the number of tiles. When `profile` (one entry per
+    page row) is given, the ink_profile of every tile core is added to it.
+    """
+    tile = tile or HANDWRITING_TILE_SIZE
+    overlap = overlap or HANDWRITING_TILE_OVERLAP
+    height, width = gray.shape[:2]
+    windows = tile_windows(height, width, tile, overlap)
+
+    kept, loose, clipped = [], [], []
+    page_box = None
+    for (cx0, cy0, cx1, cy1), (wx0, wy0, wx1, wy1) in windows:
+        binary = binarize_gray(gray[wy0:wy1, wx0:wx1])
+        tile_boxes = detect_text_boxes(binary, engine, contour_profile)
+        if profile is not None:
+            profile[cy0:cy1] += ink_profile(binary[cy0 - wy0:cy1 - wy0, cx0 - wx0:cx1 - wx0])
+        del binary
+        for x, y, w, h in tile_boxes:
+            if (x, y, w, h) == (0, 0, wx1 - wx0, wy1 - wy0):
+                page_box = (0, 0, width, height)
+                continue
+            touches_seam = ((x <= 0 < wx0) or (y <= 0 < wy0) or
+                            (x + w >= wx1 - wx0 and wx1 < width) or (y + h >= wy1 - wy0 and wy1 < height))
+            box = (x + wx0, y + wy0, w, h)
+            if touches_seam:
+                clipped.append(box)
+            elif cx0 <= box[0] + w / 2 < cx1 and cy0 <= box[1] + h / 2 < cy1:
+                kept.append(box)
+            else:
+                loose.append(box)
+
+    # Cut boxes grow into everything they overlap (kept boxes are replaced by the union)
+    candidates = np.array(kept + loose + clipped, dtype=np.int64).reshape(-1, 4)
+    n_kept, n_loose = len(kept), len(loose)
+    parent = list(range(len(candidates)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    if clipped:
+        x0, y0 = candidates[:, 0], candidates[:, 1]
+        x1, y1 = x0 + candidates[:, 2], y0 + candidates[:, 3]
+        for i in range(n_kept + n_loose, len(candidates)):
+            touching = np.nonzero((x0 <= x1[i]) & (x0[i] <= x1) & (y0 <= y1[i]) & (y0[i] <= y1))[0]
+            for j in touching.tolist():
+                root_i, root_j = find(i), find(j)
+                if root_i != root_j:
+                    parent[max(root_i, root_j)] = min(root_i, root_j)
+
+    groups = {}
+    for i in range(len(candidates)):
+        groups.setdefault(find(i), []).append(i)
+    boxes = [page_box] if page_box is not None else []
+    for members in groups.values():
+        # A loose copy alone is already reported by the tile that owns it
+        if all(n_kept <= i < n_kept + n_loose for i in members):
+            continue
+        if len(members) == 1:
+            boxes.append(tuple(int(v) for v in candidates[members[0]]))
+            continue
+        group = candidates[members]
+        gx0, gy0 = group[:, 0].min(), group[:, 1].min()
+        gx1, gy1 = (group[:, 0] + group[:, 2]).max(), (group[:, 1] + group[:, 3]).max()
+        boxes.append((int(gx0), int(gy0), int(gx1 - gx0), int(gy1 - gy0)))
+
+    # Neighbouring tiles threshold the overlap slightly differently; drop near-duplicates
+    return remove_overlapping_boxes(boxes) if boxes else boxes, len(windows)
+
+
+def ink_profile(binary: np.ndarray) -> np.ndarray:
+    """Ink pixels per row of a black-on-white (0/255) binary image."""
+    white = cv2.reduce(binary, 1, cv2.REDUCE_SUM, dtype=cv2.CV_32S).ravel() // 255
+    return binary.shape[1] - white
+
+
+def _row_runs(rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Starts and ends of the runs of True in a boolean row mask."""
+    edges = np.diff(rows.astype(np.int8), prepend=0, append=0)
+    return np.nonzero(edges == 1)[0], np.nonzero(edges == -1)[0]
+
+
+def find_line_bands(profile: np.ndarray) -> np.ndarray:
+    """
+    Text line bands of a page as an (n, 2) array of [start, end) rows.
+
+    The (lightly smoothed) profile is first split into text regions: rows
+    with at least LINE_BAND_INK_RATIO of a typical text row's ink (the 90th
+    percentile of the inked rows). Ascenders and descenders of dense writing
+    join neighbouring lines into one region, so each region is split again
+    at LINE_BAND_CORE_RATIO of its own busiest row, which keeps the x-height
+    cores. A short line only competes with itself, so it is not lost next
+    to full ones. Gaps shorter than LINE_BAND_MIN_GAP_RATIO of the median
+    core height are closed. Linear in the page height.
+    """
+    profile = np.convolve(profile.astype(np.float32), np.full(3, 1 / 3, np.float32), mode="same")
+    inked = profile[profile > 0]
+    if not len(inked):
+        return np.zeros((0, 2), dtype=np.int64)
+    region_starts, region_ends = _row_runs(profile >= max(1.0, LINE_BAND_INK_RATIO * np.percentile(inked, 90)))
+
+    starts, ends = [], []
+    for region_start, region_end in zip(region_starts.tolist(), region_ends.tolist()):
+        region = profile[region_start:region_end]
+        core_starts, core_ends = _row_runs(region >= LINE_BAND_CORE_RATIO * region.max())
+        starts.append(core_starts + region_start)
+        ends.append(core_ends + region_start)
+    starts, ends = np.concatenate(starts), np.concatenate(ends)
+
+    if len(starts) > 1:
+        min_gap = max(2, LINE_BAND_MIN_GAP_RATIO * np.median(ends - starts))
+        split = starts[1:] - ends[:-1] >= min_gap
+        starts, ends = starts[np.r_[True, split]], ends[np.r_[split, True]]
+    return np.stack([starts, ends], axis=1).astype(np.int64)
+
+
+def group_boxes_by_bands(boxes: List[Tuple[int, int, int, int]],
+                         bands: np.ndarray) -> Dict[int, List[Tuple[int, int, int, int]]]:
+    """
+    Assign boxes to the line bands from find_line_bands.
+
+    Each band owns the rows down to the middle of the gap below it, so a
+    box goes to the band around its vertical centre (one binary search per
+    box, independent of box order). Boxes spanning two or more whole bands
+    (page frame, margin rules) belong to no line and are left out. Lines are
+    numbered top to bottom, skipping empty bands, with boxes left to right.
+    """
+    if not boxes or not len(bands):
+        return {}
+    arr = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+    top, bottom = arr[:, 1], arr[:, 1] + arr[:, 3]
+    first_inside = np.searchsorted(bands[:, 0], top, side="left")
+    last_inside = np.searchsorted(bands[:, 1], bottom, side="right") - 1
+    glyphs = last_inside - first_inside < 1
+
+    cuts = (bands[:-1, 1] + bands[1:, 0]) / 2
+    band_of = np.searchsorted(cuts, arr[:, 1] + arr[:, 3] // 2, side="right")
+    order = np.lexsort((arr[:, 0], band_of))
+    order = order[glyphs[order]]
+
+    lines = {}
+    previous = None
+    for i, band in zip(order.tolist(), band_of[order].tolist()):
+        if band != previous:
+            previous = band
+            lines[len(lines)] = []
+        lines[len(lines) - 1].append(tuple(boxes[i]))
+    return lines
+
+
 def remove_overlapping_boxes(boxes: List[Tuple[int, int, int, int]], 
                            overlap_threshold: float = 0.7) -> List[Tuple[int, int, int, int]]:
     """
     Remove overlapping bounding boxes, keeping the one with larger area.
+
+    Boxes are visited largest first and dropped when their IoU with an
+    already kept box exceeds `overlap_threshold`. Kept boxes are indexed in
+    a uniform grid, so each candidate is only compared with kept boxes that
+    share a grid cell with it (boxes in no common cell cannot intersect).
     """
     if not boxes:
         return []
@@ -135,29 +655,54 @@ def remove_overlapping_boxes(boxes: List[Tuple[int, int, int, int]],
     # Sort by area (largest first)
     boxes_with_area = [(box, box[2] * box[3]) for box in boxes]
     boxes_with_area.sort(key=lambda x: x[1], reverse=True)
-    
+
+    # Cell size ~ typical box side, so a box touches only a few cells
+    sides = sorted(max(box[2], box[3]) for box in boxes)
+    cell = min(256, max(8, sides[len(sides) // 2]))
+
     filtered_boxes = []
+    grid = {}
     
     for box, area in boxes_with_area:
+        bx, by, bw, bh = box
+        bx2 = bx + bw
+        by2 = by + bh
+        cells = [
+            (cx, cy)
+            for cx in range(bx // cell, (bx2 - 1) // cell + 1)
+            for cy in range(by // cell, (by2 - 1) // cell + 1)
+        ]
+
         is_overlapping = False
-        
-        for existing_box in filtered_boxes:
-            # Calculate intersection
-            x1 = max(box[0], existing_box[0])
-            y1 = max(box[1], existing_box[1])
-            x2 = min(box[0] + box[2], existing_box[0] + existing_box[2])
-            y2 = min(box[1] + box[3], existing_box[1] + existing_box[3])
-            
-            if x1 < x2 and y1 < y2:
-                intersection_area = (x2 - x1) * (y2 - y1)
-                union_area = area + (existing_box[2] * existing_box[3]) - intersection_area
-                
-                if union_area > 0 and intersection_area / union_area > overlap_threshold:
-                    is_overlapping = True
-                    break
+        checked = set()
+        for key in cells:
+            for index in grid.get(key, ()):
+                if index in checked:
+                    continue
+                checked.add(index)
+                existing_box = filtered_boxes[index]
+
+                # Calculate intersection
+                x1 = max(bx, existing_box[0])
+                y1 = max(by, existing_box[1])
+                x2 = min(bx2, existing_box[0] + existing_box[2])
+                y2 = min(by2, existing_box[1] + existing_box[3])
+
+                if x1 < x2 and y1 < y2:
+                    intersection_area = (x2 - x1) * (y2 - y1)
+                    union_area = area + (existing_box[2] * existing_box[3]) - intersection_area
+
+                    if union_area > 0 and intersection_area / union_area > overlap_threshold:
+                        is_overlapping = True
+                        break
+            if is_overlapping:
+                break
         
         if not is_overlapping:
+            index = len(filtered_boxes)
             filtered_boxes.append(box)
+            for key in cells:
+                grid.setdefault(key, []).append(index)
     
     return filtered_boxes
 
@@ -395,31 +940,205 @@ def analyze_handwriting_characteristics(boxes: List[Tuple[int, int, int, int]])
     }
 
 
-@router.post("/analyze_handwriting")
-async def analyze_handwriting(image: UploadFile = File(...)):
+# One row per detected box; `line` is the line number from line grouping
+BOX_DTYPE = np.dtype([("x", np.int64), ("y", np.int64), ("w", np.int64), ("h", np.int64), ("line", np.int64)])
+
+# Per-line scores averaged into the overall report
+LINE_SCORE_KEYS = (
+    "micrography_score", "overall_quality_score", "size_consistency",
+    "alignment_quality", "spacing_regularity", "baseline_stability",
+)
+
+# Values closer than this (relative) to a score threshold or a rounding tie are
+# recomputed with analyze_handwriting_characteristics, whose np.var/np.std
+# summation order the grouped reductions do not reproduce bit for bit
+_DECISION_EPSILON = 1e-9
+
+
+def lines_to_box_array(lines: Dict[int, List[Tuple[int, int, int, int]]]) -> np.ndarray:
     """
-    Enhanced handwriting analysis with comprehensive reporting.
+    Flatten grouped lines into a BOX_DTYPE array.
+
+    Lines are stored in ascending line-number order and boxes keep their
+    order within the line (spacing is measured between neighbours).
     """
-    # Validate file type
-    if not image.filename.lower().endswith(('.png', '.jpg', '.jpeg')):
-        raise HTTPException(
-            status_code=400, 
-            detail="Only PNG, JPG, and JPEG files are accepted"
+    rows = [
+        (x, y, w, h, line_num)
+        for line_num in sorted(lines)
+        for (x, y, w, h) in lines[line_num]
+    ]
+    return np.array(rows, dtype=BOX_DTYPE)
+
+
+def _grouped_mean_var(values: np.ndarray, starts: np.ndarray, counts: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Per-segment mean and population variance of consecutive segments."""
+    means = np.add.reduceat(values, starts) / counts
+    deviations = values - np.repeat(means, counts)
+    return means, np.add.reduceat(deviations * deviations, starts) / counts
+
+
+def _step_scores(values: np.ndarray, thresholds: Tuple[float, ...], scores: Tuple[float, ...]) -> np.ndarray:
+    """scores[i] for the first thresholds[i] that values is below, scores[-1] otherwise."""
+    return np.select([values < t for t in thresholds], scores[:-1], default=scores[-1])
+
+
+def _near_threshold(values: np.ndarray, thresholds: Tuple[float, ...]) -> np.ndarray:
+    near = np.zeros(values.shape, dtype=bool)
+    for t in thresholds:
+        near |= np.abs(values - t) <= _DECISION_EPSILON * max(1.0, abs(t))
+    return near
+
+
+def _near_rounding_tie(values: np.ndarray, digits: int) -> np.ndarray:
+    scaled = values * (10 ** digits)
+    return np.abs(scaled - np.floor(scaled) - 0.5) <= _DECISION_EPSILON * np.maximum(1.0, np.abs(scaled))
+
+
+def analyze_line_boxes(box_array: np.ndarray) -> Tuple[List[Dict[str, Any]], Dict[str, float]]:
+    """
+    analyze_handwriting_characteristics for every line at once.
+
+    Takes a BOX_DTYPE array (see lines_to_box_array) and computes all per-line
+    statistics with grouped reductions over the whole array. Returns the
+    per-line result dicts (sorted by line number, same fields and values as
+    analyze_handwriting_characteristics plus "line_number") and the mean of
+    each LINE_SCORE_KEYS score across lines.
+    """
+    if len(box_array) == 0:
+        return [], {key: 0.0 for key in LINE_SCORE_KEYS}
+
+    line_ids, starts, counts = np.unique(box_array["line"], return_index=True, return_counts=True)
+    line_index = np.repeat(np.arange(len(line_ids)), counts)
+    x = box_array["x"].astype(np.float64)
+    y = box_array["y"].astype(np.float64)
+    w = box_array["w"].astype(np.float64)
+    h = box_array["h"].astype(np.float64)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Basic statistics
+        mean_height, height_var = _grouped_mean_var(h, starts, counts)
+        mean_width, width_var = _grouped_mean_var(w, starts, counts)
+        height_std = np.sqrt(height_var)
+        width_std = np.sqrt(width_var)
+
+        # Micrography: share of characters deviating >40% from the line's median height
+        sorted_heights = h[np.lexsort((h, line_index))]
+        median_height = (sorted_heights[starts + (counts - 1) // 2] + sorted_heights[starts + counts // 2]) / 2
+        median_per_box = np.repeat(median_height, counts)
+        anomalous = np.add.reduceat(np.abs(h - median_per_box) > median_per_box * 0.4, starts)
+        anomaly_ratio = anomalous / counts
+        micro_score = np.select(
+            [anomaly_ratio < 0.1, anomaly_ratio < 0.3, anomaly_ratio < 0.5],
+            [0.0, anomaly_ratio * 0.5, anomaly_ratio * 0.7],
+            default=np.minimum(anomaly_ratio, 1.0)
         )
+        max_height = np.maximum.reduceat(h, starts)
+        micro_score = np.where((counts < 3) | (max_height <= 0), 0.0, micro_score)
 
-    try:
-        # Read and decode image
-        image_bytes = await image.read()
-        
-        # Try multiple methods to read the image
-        img = None
+        # Size consistency
+        height_cv = height_std / mean_height
+        size_consistency = np.where(
+            mean_height > 0, _step_scores(height_cv, (0.35, 0.55, 0.75, 0.95), (1.0, 0.9, 0.7, 0.4, 0.1)), 0.0
+        )
+
+        # Alignment: variance of character centers
+        _, center_var = _grouped_mean_var(y + h / 2, starts, counts)
+        alignment_quality = np.where(
+            counts >= 2, _step_scores(center_var, (100, 200, 400, 800), (1.0, 0.8, 0.6, 0.3, 0.1)), 1.0
+        )
+
+        # Spacing between neighbouring boxes, for lines with at least three boxes
+        spacing_mean = np.zeros(len(line_ids))
+        spacing_var = np.zeros(len(line_ids))
+        spacing_cv = np.zeros(len(line_ids))
+        spaced = counts >= 3
+        if spaced.any():
+            gaps = x[1:] - (x[:-1] + w[:-1])
+            same_line = (line_index[1:] == line_index[:-1]) & spaced[line_index[:-1]]
+            gap_counts = counts[spaced] - 1
+            gap_starts = np.concatenate(([0], np.cumsum(gap_counts)[:-1]))
+            spacing_mean[spaced], spacing_var[spaced] = _grouped_mean_var(gaps[same_line], gap_starts, gap_counts)
+            spacing_cv = np.sqrt(spacing_var) / spacing_mean
+        spacing_scored = spaced & (spacing_mean > 0)
+        spacing_regularity = np.where(
+            spacing_scored, _step_scores(spacing_cv, (0.3, 0.5, 0.7, 0.9), (1.0, 0.8, 0.6, 0.3, 0.1)), 1.0
+        )
+
+        # Baseline stability
+        _, baseline_var = _grouped_mean_var(y + h, starts, counts)
+        baseline_cv = np.sqrt(baseline_var) / mean_height
+        baseline_stability = np.where(
+            counts > 1,
+            np.where(mean_height > 0, _step_scores(baseline_cv, (0.15, 0.25, 0.4, 0.6), (1.0, 0.9, 0.7, 0.4, 0.1)), 0.0),
+            1.0
+        )
+
+    overall_quality = (
+        size_consistency * 0.25 +
+        alignment_quality * 0.25 +
+        spacing_regularity * 0.25 +
+        baseline_stability * 0.25
+    )
+    height_variance = height_std ** 2
+    width_variance = width_std ** 2
+    baseline_variance = np.where(counts > 1, baseline_var, 0.0)
+    spacing_variance = np.where(spaced, spacing_var, 0.0)
+
+    # Lines sitting on a decision boundary take the scalar path
+    recheck = (
+        ((mean_height > 0) & _near_threshold(height_cv, (0.35, 0.55, 0.75, 0.95))) |
+        ((counts >= 2) & _near_threshold(center_var, (100, 200, 400, 800))) |
+        (spacing_scored & _near_threshold(spacing_cv, (0.3, 0.5, 0.7, 0.9))) |
+        ((counts > 1) & (mean_height > 0) & _near_threshold(baseline_cv, (0.15, 0.25, 0.4, 0.6))) |
+        _near_rounding_tie(height_variance, 2) | _near_rounding_tie(width_variance, 2) |
+        _near_rounding_tie(baseline_variance, 2) | _near_rounding_tie(spacing_variance, 2)
+    )
+
+    results = []
+    scores = np.empty((len(LINE_SCORE_KEYS), len(line_ids)))
+    for i, line_num in enumerate(line_ids):
+        if recheck[i]:
+            rows = box_array[starts[i]:starts[i] + counts[i]]
+            result = analyze_handwriting_characteristics(
+                [(int(r["x"]), int(r["y"]), int(r["w"]), int(r["h"])) for r in rows]
+            )
+        else:
+            result = {
+                "micrography_score": round(float(micro_score[i]), 3),
+                "size_consistency": round(float(size_consistency[i]), 3),
+                "alignment_quality": round(float(alignment_quality[i]), 3),
+                "spacing_regularity": round(float(spacing_regularity[i]), 3),
+                "baseline_stability": round(float(baseline_stability[i]), 3),
+                "character_count": int(counts[i]),
+                "avg_height": round(float(mean_height[i]), 2),
+                "avg_width": round(float(mean_width[i]), 2),
+                "height_variance": round(float(height_variance[i]), 2),
+                "width_variance": round(float(width_variance[i]), 2),
+                "baseline_variance": round(float(baseline_variance[i]), 2),
+                "spacing_variance": round(float(spacing_variance[i]), 2),
+                "overall_quality_score": round(float(overall_quality[i]), 3),
+                "canvas_size_analysis": "optimal_size"
+            }
+        result["line_number"] = int(line_num)
+        results.append(result)
+        for k, key in enumerate(LINE_SCORE_KEYS):
+            scores[k, i] = result[key]
+
+    return results, {key: float(value) for key, value in zip(LINE_SCORE_KEYS, scores.mean(axis=1))}
+
+
+def decode_image(image_bytes: bytes) -> np.ndarray:
+    """Decode an upload to a BGR array, trying OpenCV first and PIL second."""
+    # Try multiple methods to read the image
+    img = None
+    with metrics.stage("handwriting", "decode"):
         try:
             # Method 1: OpenCV
             nparr = np.frombuffer(image_bytes, np.uint8)
             img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
         except:
             pass
-            
+    
         if img is None:
             try:
                 # Method 2: PIL + conversion
@@ -427,175 +1146,570 @@ async def analyze_handwriting(image: UploadFile = File(...)):
                 img = cv2.cvtColor(np.array(pil_img), cv2.COLOR_RGB2BGR)
             except:
                 pass
-        
-        if img is None:
-            raise ValueError("Could not decode image. Please check the file format.")
+    
+    if img is None:
+        raise ValueError("Could not decode image. Please check the file format.")
+    return img
 
-        logger.info(f"Image loaded successfully. Shape: {img.shape}")
-        
-        # Enhanced preprocessing
-        processed_img = preprocess_image(img)
-        
-        # Try multiple detection methods
-        lines = {}
-        detection_method = "none"
-        
-        # Method 1: Enhanced contour detection (primary method for handwriting)
+
+def use_tiling(shape: Tuple[int, ...], tiled: Optional[bool] = None) -> bool:
+    """Whether a page of this shape is processed in tiles (see HANDWRITING_TILED)."""
+    if tiled is not None:
+        return tiled
+    if HANDWRITING_TILED != "auto":
+        return HANDWRITING_TILED == "always"
+    height, width = shape[:2]
+    scale = analysis_scale(height, width)
+    return int(height * scale) * int(width * scale) > HANDWRITING_TILED_MIN_PIXELS
+
+
+def cache_variant(engine: str, contour_profile: str, ink_crop: bool, tiled: Optional[bool],
+                  line_segmenter: str) -> str:
+    """
+    The analysis settings part of the result cache key.
+
+    Tiling is keyed by its resolved settings, not only the query parameter,
+    so a changed HANDWRITING_TILED* setting never serves results from the
+    persistent cache tier that were computed under the old one.
+    """
+    parts = [engine if engine == "components" else f"{engine}:{contour_profile}"]
+    if ink_crop:
+        parts.append("ink_crop")
+    mode = HANDWRITING_TILED if tiled is None else ("always" if tiled else "never")
+    if mode == "never":
+        parts.append("tiled=never")
+    else:
+        parts.append(f"tiled={mode},{HANDWRITING_TILE_SIZE},{HANDWRITING_TILE_OVERLAP}")
+        if mode == "auto":
+            parts.append(f"tiled_min_pixels={HANDWRITING_TILED_MIN_PIXELS}")
+    if line_segmenter != "boxes":
+        parts.append(line_segmenter)
+    return ":".join(parts)
+
+
+_pdfium_lock = threading.Lock()
+
+
+def open_pages(image_bytes: bytes, filename: str) -> Tuple[int, Iterator[np.ndarray]]:
+    """
+    Page count and a lazy iterator over the BGR pages of an upload.
+
+    Multi-page TIFFs are decoded one frame at a time and PDFs are rasterized
+    one page at a time at HANDWRITING_PDF_DPI (needs pypdfium2), so only one
+    decoded page is alive at once. Other files are a single page. Raises
+    ValueError for unsupported or oversized documents.
+    """
+    name = (filename or "").lower()
+    if name.endswith(".pdf"):
         try:
-            logger.info("Using enhanced contour detection for handwriting")
-            boxes = get_text_contours_enhanced(processed_img)
-            lines = group_boxes_into_lines_enhanced(boxes)
-            detection_method = "enhanced_contour"
-            logger.info(f"Enhanced contour method detected {sum(len(line_boxes) for line_boxes in lines.values())} text elements")
-        except Exception as e:
-            logger.warning(f"Enhanced contour detection failed: {e}")
-        
-        # Method 2: Tesseract OCR as fallback
-        if not lines:
+            import pypdfium2 as pdfium
+        except ImportError:
+            raise ValueError("PDF input needs the pypdfium2 package")
+        # PDFium is not thread-safe, even across documents: every call holds _pdfium_lock
+        with _pdfium_lock:
+            document = pdfium.PdfDocument(image_bytes)
+            page_count = len(document)
+            if not 1 <= page_count <= HANDWRITING_MAX_PAGES:
+                document.close()
+                check_page_count(page_count)
+
+        def pdf_pages():
             try:
-                logger.info("Using Tesseract OCR as fallback")
-                data = pytesseract.image_to_data(
-                    processed_img, 
-                    lang="tur",  # Türkçe dil desteği
-                    output_type=pytesseract.Output.DICT,
-                    config='--psm 6'
-                )
-                
-                # Group by line number
-                for i, text in enumerate(data["text"]):
-                    if text.strip() == "" or data["conf"][i] < 10:
-                        continue
-                        
-                    line_num = data["line_num"][i]
-                    x, y, w, h = data["left"][i], data["top"][i], data["width"][i], data["height"][i]
-                    
-                    if w < 5 or h < 5:
-                        continue
-                        
-                    if line_num not in lines:
-                        lines[line_num] = []
-                    lines[line_num].append((x, y, w, h))
-                
-                detection_method = "tesseract"
-                logger.info(f"Tesseract detected {len([t for t in data['text'] if t.strip()])} text elements")
-                
-            except Exception as tesseract_error:
-                logger.warning(f"Tesseract failed: {tesseract_error}")
-
-        if not lines:
-            return JSONResponse(content={
-                "status": "warning",
-                "message": "No handwriting or text detected. Please ensure the image contains clear handwritten text.",
-                "analysis_type": "handwriting",
-                "total_lines_detected": 0,
-                "line_analysis_results": [],
-                "debug_info": {
-                    "image_shape": list(img.shape),
-                    "preprocessing_applied": True,
-                    "detection_method": detection_method
-                }
-            })
-
-        # Analyze each line with enhanced analysis
-        analysis_results = []
-        for line_num, boxes in lines.items():
-            if not boxes:
-                continue
-            
-            line_analysis = analyze_handwriting_characteristics(boxes)
-            line_analysis["line_number"] = int(line_num)
-            analysis_results.append(line_analysis)
+                for index in range(page_count):
+                    with metrics.stage("handwriting", "decode"):
+                        with _pdfium_lock:
+                            page = document[index]
+                            try:
+                                pil_img = page.render(scale=HANDWRITING_PDF_DPI / 72).to_pil().convert("RGB")
+                            finally:
+                                page.close()
+                        yield cv2.cvtColor(np.array(pil_img), cv2.COLOR_RGB2BGR)
+            finally:
+                with _pdfium_lock:
+                    document.close()
+        pages = pdf_pages()
+    elif name.endswith((".tif", ".tiff")):
+        pil_img = Image.open(io.BytesIO(image_bytes))
+        page_count = getattr(pil_img, "n_frames", 1)
 
-        # Sort results by line number
-        analysis_results.sort(key=lambda x: x["line_number"])
-        
-        # Calculate comprehensive overall statistics
-        total_chars = sum(result["character_count"] for result in analysis_results)
-        avg_micrography = float(np.mean([result["micrography_score"] for result in analysis_results])) if analysis_results else 0.0
-        avg_quality = float(np.mean([result["overall_quality_score"] for result in analysis_results])) if analysis_results else 0.0
-        avg_size_consistency = float(np.mean([result["size_consistency"] for result in analysis_results])) if analysis_results else 0.0
-        avg_alignment = float(np.mean([result["alignment_quality"] for result in analysis_results])) if analysis_results else 0.0
-        avg_spacing = float(np.mean([result["spacing_regularity"] for result in analysis_results])) if analysis_results else 0.0
-        avg_baseline = float(np.mean([result["baseline_stability"] for result in analysis_results])) if analysis_results else 0.0
-        
-        # New severity levels based on median-based micrography detection
-        micrography_severity = "none"
-        if avg_micrography > 0.60:  # More than 65% characters are anomalous
-            micrography_severity = "severe"
-        elif avg_micrography > 0.4:  # More than 40% characters are anomalous
-            micrography_severity = "moderate"
-        elif avg_micrography > 0.15:  # More than 15% characters are anomalous
-            micrography_severity = "mild"
-        
-        # Much more flexible quality assessment for natural handwriting
-        overall_handwriting_quality = "excellent"
-        if avg_quality < 0.25:  # Much lower threshold for poor
-            overall_handwriting_quality = "poor"
-        elif avg_quality < 0.45:  # Lower threshold for fair
-            overall_handwriting_quality = "fair"
-        elif avg_quality < 0.65:  # Lower threshold for good
-            overall_handwriting_quality = "good"
-
-        return JSONResponse(content={
-            "status": "success",
-            "analysis_type": "universal_text",
-            "total_lines_detected": len(analysis_results),
-            "total_characters_detected": int(total_chars),
-            "overall_micrography_score": round(avg_micrography, 3),
-            "micrography_severity": micrography_severity,
-            "overall_quality_score": round(avg_quality, 3),
-            "overall_handwriting_quality": overall_handwriting_quality,
-            "size_consistency_score": round(avg_size_consistency, 3),
-            "alignment_quality_score": round(avg_alignment, 3),
-            "spacing_regularity_score": round(avg_spacing, 3),
-            "baseline_stability_score": round(avg_baseline, 3),
-            "interpretation": {
-                "micrography_detected": bool(avg_micrography > 0.1),
-                "good_size_consistency": bool(avg_size_consistency > 0.6),  # Universal threshold
-                "good_alignment": bool(avg_alignment > 0.6),  # Universal threshold
-                "regular_spacing": bool(avg_spacing > 0.5),  # Universal threshold
-                "stable_baseline": bool(avg_baseline > 0.6),  # Universal threshold
-                "overall_quality_good": bool(avg_quality > 0.6)  # Universal threshold
-            },
-            "universal_text_notes": {
-                "optimized_for_all_fonts": True,
-                "supports_multiple_languages": "Supports any language and font type",
-                "natural_variation_expected": "Natural variations expected in any font type",
-                "baseline_flexibility": "Baseline flexibility for all font types"
-            },
-            "line_analysis_results": analysis_results,
-            "debug_info": {
-                "image_shape": list(img.shape),
-                "preprocessing_applied": True,
-                "detection_method": detection_method,
-                "font_optimization": "universal",
-                "canvas_size_analysis": {
-                    "original_size": f"{img.shape[1]}x{img.shape[0]}",
-                    "target_size": "1200x800",
-                    "resize_applied": "yes" if img.shape[0] != 800 or img.shape[1] != 1200 else "no"
-                }
+        def tiff_pages():
+            for index in range(page_count):
+                with metrics.stage("handwriting", "decode"):
+                    pil_img.seek(index)
+                    yield cv2.cvtColor(np.array(pil_img.convert("RGB")), cv2.COLOR_RGB2BGR)
+        pages = tiff_pages()
+    else:
+        page_count = 1
+        pages = (decode_image(image_bytes) for _ in range(1))
+
+    check_page_count(page_count)
+    return page_count, pages
+
+
+def check_page_count(page_count: int):
+    if page_count < 1:
+        raise ValueError("The document has no pages")
+    if page_count > HANDWRITING_MAX_PAGES:
+        raise ValueError(f"At most {HANDWRITING_MAX_PAGES} pages are accepted, got {page_count}")
+
+
+def analyze_image(img: np.ndarray, engine: str, contour_profile: str, ink_crop: bool = False,
+                  tiled: Optional[bool] = None, line_segmenter: str = "boxes") -> Dict[str, Any]:
+    """
+    Run detection, line grouping and scoring on a decoded image.
+
+    This is the CPU-heavy part of /analyze_handwriting. It runs in a worker
+    process and receives `img` through shared memory, so it must not touch
+    the result cache or keep a reference to `img` after returning.
+    """
+    lines, debug_info = detect_lines(img, engine, contour_profile, ink_crop, tiled, line_segmenter)
+    return build_handwriting_report(lines, img.shape, debug_info)
+
+
+def detect_lines(img: np.ndarray, engine: str, contour_profile: str, ink_crop: bool = False,
+                 tiled: Optional[bool] = None,
+                 line_segmenter: str = "boxes") -> Tuple[Dict[int, List[Tuple[int, int, int, int]]], Dict[str, Any]]:
+    """
+    Find the text boxes of one page and group them into lines.
+
+    Returns the lines and the debug_info describing how they were found.
+    Tiled pages (see use_tiling) are binarized tile by tile and skip ink
+    cropping. `line_segmenter` picks the grouping (see
+    HANDWRITING_LINE_SEGMENTERS); the projection profile comes from the same
+    binarized page or tiles the boxes were found on.
+    """
+    logger.info(f"Image loaded successfully. Shape: {img.shape}")
+    tiled = use_tiling(img.shape, tiled)
+    ink_crop = ink_crop and not tiled
+    
+    # Enhanced preprocessing (optionally only around the ink, or per tile during detection)
+    regions = None
+    processed_img = None
+    tiles = None
+    profile = None
+    bands = None
+    with metrics.stage("handwriting", "preprocess"):
+        if tiled:
+            gray = to_analysis_gray(img)
+        elif ink_crop:
+            processed_img, regions = preprocess_image_cropped(img)
+        else:
+            processed_img = preprocess_image(img)
+    ink_crop_info = {
+        "enabled": ink_crop,
+        "regions": len(regions) if regions is not None else None,
+        "coverage": round(sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in regions) / processed_img.size, 3)
+        if regions is not None else None,
+    }
+    
+    # Try multiple detection methods
+    lines = {}
+    detection_method = "none"
+    
+    # Method 1: Enhanced contour detection or connected components (primary method for handwriting)
+    try:
+        logger.info(f"Using {engine} engine for handwriting")
+        with metrics.stage("handwriting", engine):
+            if tiled:
+                if line_segmenter == "projection":
+                    profile = np.zeros(gray.shape[0], dtype=np.int64)
+                boxes, tiles = detect_text_boxes_tiled(gray, engine, contour_profile, profile=profile)
+            else:
+                boxes = detect_text_boxes(processed_img, engine, contour_profile, regions)
+        with metrics.stage("handwriting", "line_grouping"):
+            if line_segmenter == "projection":
+                bands = find_line_bands(profile if tiled else ink_profile(processed_img))
+                lines = group_boxes_by_bands(boxes, bands)
+            else:
+                lines = group_boxes_into_lines_enhanced(boxes)
+        detection_method = "enhanced_contour" if engine == "contours" else "connected_components"
+        logger.info(f"{engine} engine detected {sum(len(line_boxes) for line_boxes in lines.values())} text elements")
+    except Exception as e:
+        logger.warning(f"{engine} text detection failed: {e}")
+    
+    # Method 2: Tesseract OCR as fallback
+    if not lines:
+        try:
+            logger.info("Using Tesseract OCR as fallback")
+            metrics.count("handwriting", "tesseract_fallback")
+            with metrics.stage("handwriting", "ocr_fallback"):
+                if processed_img is None:
+                    # Tiled pages only binarize the whole page on this rare path
+                    processed_img = binarize_gray(gray)
+                # Persistent Tesseract pool (Turkish data loaded once, --psm 6)
+                data = ocr_engine.image_to_data(processed_img)
+    
+            # Group by line number
+            for i, text in enumerate(data["text"]):
+                if text.strip() == "" or data["conf"][i] < 10:
+                    continue
+    
+                line_num = data["line_num"][i]
+                x, y, w, h = data["left"][i], data["top"][i], data["width"][i], data["height"][i]
+    
+                if w < 5 or h < 5:
+                    continue
+    
+                if line_num not in lines:
+                    lines[line_num] = []
+                lines[line_num].append((x, y, w, h))
+    
+            detection_method = "tesseract"
+            logger.info(f"Tesseract detected {len([t for t in data['text'] if t.strip()])} text elements")
+    
+        except Exception as tesseract_error:
+            logger.warning(f"Tesseract failed: {tesseract_error}")
+    
+    metrics.count("handwriting", f"detection_{detection_method}")
+    return lines, {
+        "image_shape": list(img.shape),
+        "preprocessing_applied": True,
+        "detection_method": detection_method,
+        "engine": engine,
+        "contour_profile": contour_profile if engine == "contours" else None,
+        "ink_crop": ink_crop_info,
+        "tiled": {"enabled": tiled, "tiles": tiles},
+        "line_segmenter": {"name": line_segmenter, "bands": len(bands) if bands is not None else None},
+    }
+
+
+def build_handwriting_report(lines: Dict[int, List[Tuple[int, int, int, int]]],
+                             image_shape: Tuple[int, ...], debug_info: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Score the grouped boxes and build the /analyze_handwriting response.
+
+    Shared by the image and stroke inputs; `debug_info` describes how the
+    boxes were found and is returned as is.
+    """
+    if not lines:
+        content = {
+            "status": "warning",
+            "message": "No handwriting or text detected. Please ensure the image contains clear handwritten text.",
+            "analysis_type": "handwriting",
+            "total_lines_detected": 0,
+            "line_analysis_results": [],
+            "debug_info": debug_info
+        }
+        return content
+    
+    # Analyze all lines at once (results come back sorted by line number)
+    with metrics.stage("handwriting", "line_analysis"):
+        box_array = lines_to_box_array(lines)
+        analysis_results, averages = analyze_line_boxes(box_array)
+    
+    # Calculate comprehensive overall statistics
+    total_chars = len(box_array)
+    avg_micrography = averages["micrography_score"]
+    avg_quality = averages["overall_quality_score"]
+    avg_size_consistency = averages["size_consistency"]
+    avg_alignment = averages["alignment_quality"]
+    avg_spacing = averages["spacing_regularity"]
+    avg_baseline = averages["baseline_stability"]
+    
+    # New severity levels based on median-based micrography detection
+    micrography_severity = "none"
+    if avg_micrography > 0.60:  # More than 65% characters are anomalous
+        micrography_severity = "severe"
+    elif avg_micrography > 0.4:  # More than 40% characters are anomalous
+        micrography_severity = "moderate"
+    elif avg_micrography > 0.15:  # More than 15% characters are anomalous
+        micrography_severity = "mild"
+    
+    # Much more flexible quality assessment for natural handwriting
+    overall_handwriting_quality = "excellent"
+    if avg_quality < 0.25:  # Much lower threshold for poor
+        overall_handwriting_quality = "poor"
+    elif avg_quality < 0.45:  # Lower threshold for fair
+        overall_handwriting_quality = "fair"
+    elif avg_quality < 0.65:  # Lower threshold for good
+        overall_handwriting_quality = "good"
+    
+    content = {
+        "status": "success",
+        "analysis_type": "universal_text",
+        "total_lines_detected": len(analysis_results),
+        "total_characters_detected": int(total_chars),
+        "overall_micrography_score": round(avg_micrography, 3),
+        "micrography_severity": micrography_severity,
+        "overall_quality_score": round(avg_quality, 3),
+        "overall_handwriting_quality": overall_handwriting_quality,
+        "size_consistency_score": round(avg_size_consistency, 3),
+        "alignment_quality_score": round(avg_alignment, 3),
+        "spacing_regularity_score": round(avg_spacing, 3),
+        "baseline_stability_score": round(avg_baseline, 3),
+        "interpretation": {
+            "micrography_detected": bool(avg_micrography > 0.1),
+            "good_size_consistency": bool(avg_size_consistency > 0.6),  # Universal threshold
+            "good_alignment": bool(avg_alignment > 0.6),  # Universal threshold
+            "regular_spacing": bool(avg_spacing > 0.5),  # Universal threshold
+            "stable_baseline": bool(avg_baseline > 0.6),  # Universal threshold
+            "overall_quality_good": bool(avg_quality > 0.6)  # Universal threshold
+        },
+        "universal_text_notes": {
+            "optimized_for_all_fonts": True,
+            "supports_multiple_languages": "Supports any language and font type",
+            "natural_variation_expected": "Natural variations expected in any font type",
+            "baseline_flexibility": "Baseline flexibility for all font types"
+        },
+        "line_analysis_results": analysis_results,
+        "debug_info": {
+            **debug_info,
+            "font_optimization": "universal",
+            "canvas_size_analysis": {
+                "original_size": f"{image_shape[1]}x{image_shape[0]}",
+                "target_size": "1200x800",
+                "resize_applied": "yes" if image_shape[0] != 800 or image_shape[1] != 1200 else "no"
             }
+        }
+    }
+    return content
+
+
+def analyze_strokes(body: bytes, content_type: str) -> Dict[str, Any]:
+    """
+    Handwriting report computed from stroke geometry (see strokes.py).
+
+    Glyph boxes come straight from the strokes, scaled like a page of the
+    same size would be in preprocess_image. There is no rasterizing,
+    filtering or contour pass, so this is cheap enough to run on a thread.
+    """
+    drawing = strokes.parse_strokes(body, content_type)
+    image_shape = (int(round(drawing.height)), int(round(drawing.width)), 3)
+
+    with metrics.stage("handwriting", "stroke_boxes"):
+        boxes = strokes.stroke_boxes(drawing, analysis_scale(image_shape[0], image_shape[1]))
+    with metrics.stage("handwriting", "line_grouping"):
+        lines = group_boxes_into_lines_enhanced(boxes)
+    detection_method = "strokes" if lines else "none"
+    metrics.count("handwriting", f"detection_{detection_method}")
+
+    return build_handwriting_report(lines, image_shape, {
+        "image_shape": list(image_shape),
+        "preprocessing_applied": False,
+        "detection_method": detection_method,
+        "stroke_count": drawing.stroke_count,
+        "point_count": int(len(drawing.points)),
+        "drawing_duration_ms": round(drawing.duration_ms(), 1),
+    })
+
+
+async def run_analysis(img: np.ndarray, engine: str, contour_profile: str, ink_crop: bool,
+                       tiled: Optional[bool] = None, line_segmenter: str = "boxes") -> Dict[str, Any]:
+    """Run analyze_image in the process pool, or on a thread when the pool is disabled."""
+    args = (engine, contour_profile, ink_crop, tiled, line_segmenter)
+    if analysis_pool is None:
+        return await run_in_threadpool(analyze_image, img, *args)
+    return await analysis_pool.run_with_array(analyze_image, img, *args)
+
+
+async def run_detection(img: np.ndarray, engine: str, contour_profile: str, ink_crop: bool,
+                        tiled: Optional[bool] = None, line_segmenter: str = "boxes"):
+    """Run detect_lines in the process pool, or on a thread when the pool is disabled."""
+    args = (engine, contour_profile, ink_crop, tiled, line_segmenter)
+    if analysis_pool is None:
+        return await run_in_threadpool(detect_lines, img, *args)
+    return await analysis_pool.run_with_array(detect_lines, img, *args)
+
+
+PAGE_SUMMARY_KEYS = ("status", "total_lines_detected", "total_characters_detected", "overall_micrography_score",
+                     "micrography_severity", "overall_quality_score", "overall_handwriting_quality")
+
+
+async def analyze_pages(pages: Iterator[np.ndarray], page_count: int, engine: str, contour_profile: str,
+                        ink_crop: bool, tiled: Optional[bool] = None,
+                        line_segmenter: str = "boxes") -> Dict[str, Any]:
+    """
+    Analyze a multi-page document one page at a time.
+
+    The top-level scores cover the lines of every page (line numbers run on
+    across pages and each line result names its page); "pages" holds the
+    per-page summaries and how each page was processed.
+    """
+    all_lines = {}
+    line_pages = []
+    page_summaries = []
+    methods = set()
+    first_shape = None
+    for number in range(1, page_count + 1):
+        img = await run_in_threadpool(next, pages)
+        shape = img.shape
+        first_shape = first_shape or shape
+        lines, debug_info = await run_detection(img, engine, contour_profile, ink_crop, tiled, line_segmenter)
+        del img
+
+        page_report = await run_in_threadpool(build_handwriting_report, lines, shape, debug_info)
+        page_summaries.append({
+            "page": number,
+            **{key: page_report[key] for key in PAGE_SUMMARY_KEYS if key in page_report},
+            "debug_info": debug_info,
         })
+        methods.add(debug_info["detection_method"])
+        for line_num in sorted(lines):
+            all_lines[len(all_lines)] = lines[line_num]
+            line_pages.append(number)
+
+    methods.discard("none")
+    content = await run_in_threadpool(build_handwriting_report, all_lines, first_shape, {
+        "image_shape": list(first_shape),
+        "preprocessing_applied": True,
+        "detection_method": ",".join(sorted(methods)) or "none",
+        "engine": engine,
+        "contour_profile": contour_profile if engine == "contours" else None,
+        "line_segmenter": {"name": line_segmenter},
+        "page_count": page_count,
+    })
+    for result in content["line_analysis_results"]:
+        result["page"] = line_pages[result["line_number"]]
+    content["pages"] = page_summaries
+    return content
+
+
+@router.post("/analyze_handwriting")
+async def analyze_handwriting(
+    image: UploadFile = File(...),
+    contour_profile: Optional[str] = Query(None, description="Contour pass profile: thorough, balanced or fast"),
+    engine: Optional[str] = Query(None, description="Text detection engine: contours or components"),
+    ink_crop: Optional[bool] = Query(None, description="Filter and detect only around the ink regions"),
+    tiled: Optional[bool] = Query(None, description="Process the page in tiles (default: only large pages)"),
+    line_segmenter: Optional[str] = Query(None, description="Line grouping: boxes or projection")
+):
+    """
+    Enhanced handwriting analysis with comprehensive reporting.
+
+    Multi-page TIFF and PDF uploads are analyzed page by page and reported
+    together (see analyze_pages).
+    """
+    # Validate file type
+    if not image.filename.lower().endswith(HANDWRITING_EXTENSIONS):
+        raise HTTPException(
+            status_code=400, 
+            detail="Only PNG, JPG, JPEG, TIFF and PDF files are accepted"
+        )
+    engine = engine or HANDWRITING_ENGINE
+    if engine not in HANDWRITING_ENGINES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown engine. Use one of: {', '.join(HANDWRITING_ENGINES)}"
+        )
+    line_segmenter = line_segmenter or HANDWRITING_LINE_SEGMENTER
+    if line_segmenter not in HANDWRITING_LINE_SEGMENTERS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown line_segmenter. Use one of: {', '.join(HANDWRITING_LINE_SEGMENTERS)}"
+        )
+    ink_crop = HANDWRITING_INK_CROP if ink_crop is None else ink_crop
+    contour_profile = contour_profile or HANDWRITING_CONTOUR_PROFILE
+    if contour_profile not in CONTOUR_PROFILES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown contour_profile. Use one of: {', '.join(CONTOUR_PROFILES)}"
+        )
+
+    try:
+        # Read and decode image
+        image_bytes = await image.read()
+
+        # Identical uploads reuse the previous analysis
+        cache_key = result_cache.make_key(
+            "handwriting", ALGORITHM_VERSION, image_bytes,
+            cache_variant(engine, contour_profile, ink_crop, tiled, line_segmenter)
+        )
+        cached = await result_cache.get_async(cache_key)
+        if cached is not None:
+            logger.info("Returning cached handwriting analysis")
+            return JSONResponse(content=cached)
+
+        try:
+            page_count, pages = await run_in_threadpool(open_pages, image_bytes, image.filename)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        # The CPU-heavy part runs in the worker pool so the event loop stays responsive
+        if page_count == 1:
+            img = await run_in_threadpool(next, pages)
+            content = await run_analysis(img, engine, contour_profile, ink_crop, tiled, line_segmenter)
+        else:
+            content = await analyze_pages(pages, page_count, engine, contour_profile, ink_crop, tiled,
+                                          line_segmenter)
+
+        # Do not pin a transient detector failure in the cache
+        if content["debug_info"]["detection_method"] != "none":
+            result_cache.put(cache_key, content)
+        return JSONResponse(content=content)
 
+    except worker_pool.PoolFullError as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Handwriting analysis is at capacity, please retry later",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except worker_pool.JobTimeoutError:
+        raise HTTPException(
+            status_code=504,
+            detail=f"Handwriting analysis did not finish within {analysis_pool.timeout_s:g} seconds"
+        )
+    except BrokenProcessPool:
+        raise HTTPException(
+            status_code=503,
+            detail="Handwriting worker restarted, please retry",
+            headers={"Retry-After": "1"}
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Handwriting analysis error: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Server error: {str(e)}")
 
 
+@router.post("/analyze_handwriting_strokes")
+async def analyze_handwriting_strokes(request: Request):
+    """
+    Handwriting analysis from stroke data (JSON or binary, see strokes.py)
+    instead of a PNG of the canvas.
+    """
+    try:
+        body = await request.body()
+        cache_key = result_cache.make_key("handwriting", ALGORITHM_VERSION, body, "strokes")
+        cached = await result_cache.get_async(cache_key)
+        if cached is not None:
+            logger.info("Returning cached handwriting analysis")
+            return JSONResponse(content=cached)
+
+        try:
+            content = await run_in_threadpool(analyze_strokes, body, request.headers.get("content-type", ""))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid stroke data: {str(e)}")
+
+        if content["debug_info"]["detection_method"] != "none":
+            result_cache.put(cache_key, content)
+        return JSONResponse(content=content)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Handwriting stroke analysis error: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Server error: {str(e)}")
+
+
 @router.get("/health_handwriting")
 async def health_check_handwriting():
     """Health check endpoint for the handwriting analysis service."""
-    try:
-        # Test if Tesseract is accessible
-        test_img = np.ones((100, 100), dtype=np.uint8) * 255
-        cv2.putText(test_img, "TEST", (10, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, 0, 2)
-        _ = pytesseract.image_to_string(test_img)
-        tesseract_status = "healthy"
-    except:
-        tesseract_status = "unavailable"
-    
+    # OCR runs where the analysis runs. With the pool, this is the status the last
+    # worker sent back with a result; no job is submitted and nothing is loaded here.
+    if analysis_pool is None:
+        ocr_status = ocr_engine.status()
+    elif analysis_pool.worker_status is not None:
+        ocr_status = {**analysis_pool.worker_status, "scope": "last reporting analysis worker"}
+    else:
+        ocr_status = {"state": "workers_not_started"}
+    tesseract_status = {ocr_engine.READY: "healthy", ocr_engine.FAILED: "unavailable"}.get(
+        ocr_status["state"], "not_loaded"
+    )
+
     return {
         "status": "healthy",
         "tesseract_status": tesseract_status,
+        "ocr_engine": ocr_status,
+        "worker_pool": analysis_pool.stats() if analysis_pool is not None else None,
         "opencv_version": cv2.__version__
     }
\ No newline at end of file
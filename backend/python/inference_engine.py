@@ -0,0 +1,320 @@
+import os
+os.environ['TF_ENABLE_ONEDNN_OPTS'] = '0'
+
+import asyncio
+import hashlib
+import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, Sequence
+
+import numpy as np
+
+import metrics
+from batching import MicroBatcher
+from config import env_int, env_bool, env_float, env_str
+from drawing_preprocessing import write_model_input, dequantize_output
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CPU_COUNT = os.cpu_count() or 1
+
+# Varsayılan havuz boyutu: çekirdeklerin yarısı (en az 1, en fazla 4 interpreter)
+DEFAULT_POOL_SIZE = min(4, max(1, CPU_COUNT // 2))
+
+
+class InterpreterPool:
+    """
+    A fixed-size pool of TFLite interpreters for a single model.
+
+    Each interpreter is used by at most one thread at a time; invocations run
+    on a dedicated thread pool so async handlers never block the event loop.
+    """
+
+    def __init__(self, name: str, model_path: str, pool_size: int, num_threads: int):
+        self.name = name
+        self.model_path = model_path
+        self.pool_size = max(1, pool_size)
+        self.num_threads = max(1, num_threads)
+        self.input_details = None
+        self.output_details = None
+        self.model_version = None
+        self.batcher: Optional[MicroBatcher] = None
+        self.supports_batching = True
+        self._interpreters = []
+        self._batch_sizes = {}
+        self._idle = queue.Queue()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_loaded(self) -> bool:
+        return bool(self._interpreters)
+
+    @property
+    def executor(self) -> Optional[ThreadPoolExecutor]:
+        return self._executor
+
+    def load(self):
+        """Create and allocate every interpreter in the pool."""
+        with self._lock:
+            if self.is_loaded:
+                return
+            if not os.path.exists(self.model_path):
+                raise FileNotFoundError(f"Model dosyası bulunamadı: {self.model_path}")
+
+            # TensorFlow yalnızca ilk model yüklenirken içe aktarılır
+            import tensorflow as tf
+
+            interpreters = []
+            for _ in range(self.pool_size):
+                interpreter = tf.lite.Interpreter(
+                    model_path=self.model_path,
+                    num_threads=self.num_threads
+                )
+                interpreter.allocate_tensors()
+                interpreters.append(interpreter)
+
+            # Sonuç önbelleği anahtarları için model dosyasının özeti
+            digest = hashlib.sha256()
+            with open(self.model_path, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(chunk)
+            self.model_version = digest.hexdigest()[:16]
+
+            self.input_details = interpreters[0].get_input_details()
+            self.output_details = interpreters[0].get_output_details()
+            for interpreter in interpreters:
+                self._batch_sizes[id(interpreter)] = int(self.input_details[0]["shape"][0])
+                self._idle.put(interpreter)
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.pool_size,
+                thread_name_prefix=f"tflite-{self.name}"
+            )
+            self._interpreters = interpreters
+            logger.info(
+                f"[{self.name}] {self.pool_size} interpreter yüklendi "
+                f"(interpreter başına {self.num_threads} thread)"
+            )
+
+    def warm_up(self):
+        """Run one dummy inference on every interpreter in the pool."""
+        if not self.is_loaded:
+            raise RuntimeError(f"[{self.name}] modeli yüklenmedi")
+        _, height, width, channels = [int(d) for d in self.input_details[0]["shape"]]
+        blank = np.full((height, width, channels), 255, dtype=np.uint8)
+        for _ in range(self.pool_size):
+            # FIFO kuyruk sayesinde her interpreter bir kez alınıp geri konur
+            interpreter = self._idle.get()
+            try:
+                if self._ensure_batch_size(interpreter, 1):
+                    self._invoke_images(interpreter, [blank])
+            finally:
+                self._idle.put(interpreter)
+
+    @contextmanager
+    def acquire(self, timeout: Optional[float] = None):
+        """Check out an idle interpreter, returning it to the pool afterwards."""
+        if not self.is_loaded:
+            raise RuntimeError(f"[{self.name}] modeli yüklenmedi")
+        try:
+            with metrics.stage(self.name, "pool_wait"):
+                interpreter = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"[{self.name}] boşta interpreter bulunamadı")
+        try:
+            yield interpreter
+        finally:
+            self._idle.put(interpreter)
+
+    def _ensure_batch_size(self, interpreter, batch_size: int) -> bool:
+        """Resize the interpreter's input to `batch_size`; False if the model has a fixed batch."""
+        if self._batch_sizes.get(id(interpreter)) == batch_size:
+            return True
+        if not self.supports_batching:
+            # Bayrak havuzun tamamı için; daha önce büyütülmüş interpreter'lar tekli çıkarımdan
+            # önce orijinal boyuta dönmeli, yoksa her çağrı batch kadar satır döndürür
+            self._restore_batch_size(interpreter)
+            return False
+        input_index = self.input_details[0]["index"]
+        try:
+            shape = [batch_size] + [int(d) for d in self.input_details[0]["shape"][1:]]
+            interpreter.resize_tensor_input(input_index, shape, strict=False)
+            interpreter.allocate_tensors()
+        except Exception as e:
+            logger.warning(f"[{self.name}] Giriş batch boyutu değiştirilemedi, tekli çıkarıma dönülüyor: {e}")
+            self.supports_batching = False
+            self._restore_batch_size(interpreter, force=True)
+            return False
+        self._batch_sizes[id(interpreter)] = batch_size
+        return True
+
+    def _restore_batch_size(self, interpreter, force: bool = False):
+        """Resize the interpreter back to the model's original input shape."""
+        original = int(self.input_details[0]["shape"][0])
+        if not force and self._batch_sizes.get(id(interpreter), original) == original:
+            return
+        interpreter.resize_tensor_input(self.input_details[0]["index"], self.input_details[0]["shape"], strict=False)
+        interpreter.allocate_tensors()
+        self._batch_sizes[id(interpreter)] = original
+
+    def _read_output(self, interpreter) -> np.ndarray:
+        output = interpreter.get_tensor(self.output_details[0]["index"])
+        return dequantize_output(output, self.output_details[0]["quantization"])
+
+    def _invoke(self, interpreter, input_tensor: np.ndarray) -> np.ndarray:
+        with metrics.stage(self.name, "input_write"):
+            interpreter.set_tensor(self.input_details[0]["index"], input_tensor)
+        with metrics.stage(self.name, "invoke"):
+            interpreter.invoke()
+        return self._read_output(interpreter)
+
+    def _invoke_images(self, interpreter, images: Sequence[np.ndarray]) -> np.ndarray:
+        # Görüntüler doğrudan interpreter'ın giriş tamponuna yazılır (ara kopya yok).
+        # tensor() görünümü invoke() öncesinde bırakılmalıdır.
+        with metrics.stage(self.name, "input_write"):
+            input_view = interpreter.tensor(self.input_details[0]["index"])()
+            quantization = self.input_details[0]["quantization"]
+            for i, image in enumerate(images):
+                write_model_input(image, input_view[i], quantization)
+            del input_view
+        with metrics.stage(self.name, "invoke"):
+            interpreter.invoke()
+        return self._read_output(interpreter)
+
+    def predict(self, input_tensor: np.ndarray) -> np.ndarray:
+        """
+        Run a blocking inference and return a copy of the first (dequantized) output tensor.
+
+        The leading dimension of `input_tensor` is the batch size; the
+        interpreter input is resized when it differs from the last call.
+        """
+        batch_size = input_tensor.shape[0]
+        with self.acquire() as interpreter:
+            if self._ensure_batch_size(interpreter, batch_size):
+                return self._invoke(interpreter, input_tensor)
+            # Sabit batch boyutlu model: örnekleri tek tek çalıştır
+            outputs = [self._invoke(interpreter, input_tensor[i:i + 1]) for i in range(batch_size)]
+            return np.concatenate(outputs, axis=0)
+
+    def predict_images(self, images: Sequence[np.ndarray]) -> np.ndarray:
+        """
+        Run a blocking inference on (H, W, C) uint8 images at model resolution.
+
+        Each image is normalized straight into the interpreter's input tensor,
+        so no float copy of the batch is built on the Python side.
+        """
+        with self.acquire() as interpreter:
+            if self._ensure_batch_size(interpreter, len(images)):
+                return self._invoke_images(interpreter, images)
+            outputs = [self._invoke_images(interpreter, [image]) for image in images]
+            return np.concatenate(outputs, axis=0)
+
+    async def predict_async(self, input_tensor: np.ndarray) -> np.ndarray:
+        """Run a tensor inference on the pool's worker threads without blocking the event loop."""
+        if not self.is_loaded:
+            raise RuntimeError(f"[{self.name}] modeli yüklenmedi")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.predict, input_tensor)
+
+    async def predict_images_async(self, images: Sequence[np.ndarray]) -> np.ndarray:
+        """Run predict_images() on the pool's worker threads as a single batch."""
+        if not self.is_loaded:
+            raise RuntimeError(f"[{self.name}] modeli yüklenmedi")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.predict_images, list(images))
+
+    async def predict_image_async(self, image: np.ndarray) -> np.ndarray:
+        """
+        Predict a single image, returning a batch-1 shaped output.
+
+        When micro-batching is enabled the request is queued and merged with
+        concurrent requests into a single invoke.
+        """
+        if self.batcher is not None:
+            if not self.is_loaded:
+                raise RuntimeError(f"[{self.name}] modeli yüklenmedi")
+            return await self.batcher.submit(image)
+        return await self.predict_images_async([image])
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "model_path": self.model_path,
+            "model_version": self.model_version,
+            "input_dtype": str(np.dtype(self.input_details[0]["dtype"])) if self.input_details else None,
+            "input_quantization": list(self.input_details[0]["quantization"]) if self.input_details else None,
+            "loaded": self.is_loaded,
+            "pool_size": self.pool_size,
+            "num_threads": self.num_threads,
+            "idle_interpreters": self._idle.qsize(),
+            "batching": self.batcher.stats() if self.batcher is not None else None,
+        }
+
+
+_pools: Dict[str, InterpreterPool] = {}
+
+MODEL_VARIANTS = ("float32", "float16", "int8")
+
+
+def variant_model_path(name: str, base_path: str) -> str:
+    """
+    Path of the configured model variant for `name`.
+
+    DRAWING_MODEL_VARIANT (or <NAME>_MODEL_VARIANT) selects float32 (the
+    base file), float16 or int8; quantized variants are expected next to the
+    base model as <base>_float16.tflite / <base>_int8.tflite.
+    """
+    variant = env_str(f"{name.upper()}_MODEL_VARIANT", env_str("DRAWING_MODEL_VARIANT", "float32")).lower()
+    if variant not in MODEL_VARIANTS:
+        logger.warning(f"[{name}] Bilinmeyen model varyantı '{variant}', float32 kullanılıyor")
+        variant = "float32"
+    if variant == "float32":
+        return base_path
+    root, ext = os.path.splitext(base_path)
+    return f"{root}_{variant}{ext}"
+
+
+def register_model(name: str, model_path: str,
+                   pool_size: Optional[int] = None,
+                   num_threads: Optional[int] = None) -> InterpreterPool:
+    """
+    Register a model under a name and return its (not yet loaded) pool.
+
+    Pool size and per-interpreter thread count can be set globally with
+    INFERENCE_POOL_SIZE / INFERENCE_NUM_THREADS or per model with
+    <NAME>_POOL_SIZE / <NAME>_NUM_THREADS (e.g. SPIRAL_POOL_SIZE).
+
+    Micro-batching is off by default; enable it with INFERENCE_BATCHING=1
+    (or <NAME>_BATCHING=1) and tune INFERENCE_BATCH_WINDOW_MS and
+    INFERENCE_MAX_BATCH_SIZE (or their <NAME>_ variants).
+    """
+    if name in _pools:
+        return _pools[name]
+
+    prefix = name.upper()
+    if pool_size is None:
+        pool_size = env_int(f"{prefix}_POOL_SIZE", env_int("INFERENCE_POOL_SIZE", DEFAULT_POOL_SIZE))
+    if num_threads is None:
+        default_threads = max(1, CPU_COUNT // max(1, pool_size))
+        num_threads = env_int(f"{prefix}_NUM_THREADS", env_int("INFERENCE_NUM_THREADS", default_threads))
+
+    pool = InterpreterPool(name, model_path, pool_size, num_threads)
+    if env_bool(f"{prefix}_BATCHING", env_bool("INFERENCE_BATCHING", False)):
+        pool.batcher = MicroBatcher(
+            pool,
+            max_batch_size=env_int(f"{prefix}_MAX_BATCH_SIZE", env_int("INFERENCE_MAX_BATCH_SIZE", 8)),
+            window_ms=env_float(f"{prefix}_BATCH_WINDOW_MS", env_float("INFERENCE_BATCH_WINDOW_MS", 5.0)),
+        )
+    _pools[name] = pool
+    return pool
+
+
+def get_pool(name: str) -> InterpreterPool:
+    return _pools[name]
+
+
+def pool_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: pool.stats() for name, pool in _pools.items()}
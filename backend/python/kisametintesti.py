@@ -1,91 +1,230 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
-import whisper
-import os
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+import asyncio
+import io
+import json
 import subprocess
+import time
+import wave
+from typing import Any, Dict, List, Optional
 from Levenshtein import distance as levenshtein_distance
-import tempfile
 import logging
 
+import asr_backends
+import metrics
+import model_registry
+import speech_stream
+import worker_pool
+from config import env_float, env_int, env_str
+
 router = APIRouter()
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-model = whisper.load_model("tiny")
-logger.info("Whisper modeli yüklendi: tiny")
+# ASR_BACKEND / ASR_MODEL ile seçilir (openai-whisper ya da int8 CTranslate2, bkz. asr_backends)
+asr = asr_backends.create_backend()
+
+# Whisper'ın beklediği örnekleme hızı; 256 örnekten (16 ms) kısa kayıtlar reddedilir
+SAMPLE_RATE = 16000
+MIN_AUDIO_SAMPLES = 256
+
+# Transkripsiyon ayrı işçi süreçlerinde çalışır, her süreç kendi Whisper modelini açılışta yükler.
+# Kuyruk doluysa 503 + Retry-After, süre aşılırsa 504 döner. WHISPER_POOL_WORKERS=0 modeli
+# bu süreçte tutar ve transkripsiyonu bir thread'de çalıştırır.
+WHISPER_POOL_WORKERS = max(0, env_int("WHISPER_POOL_WORKERS", 1))
+WHISPER_POOL_QUEUE = max(0, env_int("WHISPER_POOL_QUEUE", 4))
+WHISPER_JOB_TIMEOUT_S = env_float("WHISPER_JOB_TIMEOUT_S", 120.0)
+
+
+# Çözme modu: "tiered" önce greedy çözer ve yalnızca güveni düşük kayıtları beam search ile
+# yeniden çözer; "beam" her kaydı doğrudan beam search ile çözer
+WHISPER_DECODING_MODES = ("tiered", "beam")
+WHISPER_DECODING = env_str("WHISPER_DECODING", "tiered")
+if WHISPER_DECODING not in WHISPER_DECODING_MODES:
+    logger.warning(f"Bilinmeyen WHISPER_DECODING '{WHISPER_DECODING}', 'tiered' kullanılıyor")
+    WHISPER_DECODING = "tiered"
+WHISPER_BEAM_SIZE = max(1, env_int("WHISPER_BEAM_SIZE", 5))
+# Yükseltme eşikleri (Whisper'ın kendi sıcaklık geri düşüşündeki varsayılanlar): herhangi bir
+# segmentte ortalama log olasılık altında, sıkıştırma oranı ya da konuşma yok olasılığı üstündeyse
+WHISPER_ESCALATE_LOGPROB = env_float("WHISPER_ESCALATE_LOGPROB", -1.0)
+WHISPER_ESCALATE_COMPRESSION = env_float("WHISPER_ESCALATE_COMPRESSION", 2.4)
+WHISPER_ESCALATE_NO_SPEECH = env_float("WHISPER_ESCALATE_NO_SPEECH", 0.6)
+
+# Akışlı okuma testi: açık segment en fazla bu aralıkla (greedy) yeniden çözülüp ara sonuç gönderilir
+STREAM_PARTIAL_INTERVAL_S = env_float("STREAM_PARTIAL_INTERVAL_S", 1.0)
+# Ara sonuç yalnızca açık segmentin son STREAM_PARTIAL_WINDOW_S saniyesini çözer (işçi süresini sınırlar)
+STREAM_PARTIAL_WINDOW_S = env_float("STREAM_PARTIAL_WINDOW_S", 10.0)
+# Kesinleşen segment için kuyruk doluyken yeniden deneme süresi; aşılırsa oturum hatayla kapanır
+STREAM_SEGMENT_RETRY_S = env_float("STREAM_SEGMENT_RETRY_S", 10.0)
+
+# Her katmanda ortak çözme ayarları
+DECODE_OPTIONS = {
+    "language": "tr",
+    "fp16": False,
+    "temperature": 0.0,
+    "initial_prompt": "Bu bir Türkçe konuşmadır.",
+    "suppress_tokens": [],
+    "without_timestamps": True,
+}
+
+
+class TranscriptionError(Exception):
+    """Whisper could not transcribe the recording (picklable, so it crosses the worker boundary)."""
+
 
-def convert_audio(input_path: str) -> str:
-    """Ses dosyasını uygun formata dönüştür"""
-    output_path = os.path.join(tempfile.gettempdir(), os.path.basename(input_path) + "_converted.wav")
-    
+def load_whisper_model():
+    """Konuşma modelini yükle (ilk kullanımda ya da arka plan ısınmasında çağrılır)"""
+    asr.load()
+    logger.info(f"Konuşma modeli yüklendi: {asr.info()}")
+
+
+def warm_up_whisper_model():
+    """Bir saniyelik sessizlik üzerinde kısa bir transkripsiyon çalıştır"""
+    asr.transcribe(np.zeros(SAMPLE_RATE, dtype=np.float32), language="tr", fp16=False, temperature=0.0)
+
+
+def init_whisper_worker():
+    """İşçi süreci başlangıcı: modeli bir kez yükle ve ısıt"""
+    load_whisper_model()
+    warm_up_whisper_model()
+
+
+whisper_pool = worker_pool.register_pool(
+    "text", WHISPER_POOL_WORKERS, WHISPER_POOL_QUEUE, WHISPER_JOB_TIMEOUT_S, initializer=init_whisper_worker
+) if WHISPER_POOL_WORKERS > 0 else None
+
+if whisper_pool is None:
+    model_registry.register("whisper", load_whisper_model, warmup=warm_up_whisper_model)
+else:
+    # Model işçi süreçlerinde; tüm işçiler modeli yükleyip ısıttığında "hazır" sayılır
+    model_registry.register("whisper", whisper_pool.warm_up)
+
+def _decode_wav_pcm16(data: bytes) -> Optional[np.ndarray]:
+    """16 kHz mono 16-bit PCM WAV'ı (uygulamanın kaydettiği biçim) ffmpeg'siz çöz; başka biçimlerde None"""
     try:
-        logger.info(f"FFmpeg ile dönüşüm başlıyor: {input_path} -> {output_path}")
+        with wave.open(io.BytesIO(data), "rb") as wav:
+            if (wav.getnchannels(), wav.getsampwidth(), wav.getframerate()) != (1, 2, SAMPLE_RATE):
+                return None
+            frames = wav.readframes(wav.getnframes())
+    except (wave.Error, EOFError):
+        return None
+    if not frames:
+        # Başlığında veri boyutu yazmayan kayıtları ffmpeg okusun
+        return None
+    return np.frombuffer(frames, "<i2").astype(np.float32) / 32768.0
+
+
+def decode_audio(data: bytes) -> np.ndarray:
+    """
+    Yüklenen sesi diske yazmadan 16 kHz mono float32 diziye çöz.
+
+    16 kHz mono PCM WAV doğrudan okunur; diğer biçimler tek bir ffmpeg
+    sürecinden stdin/stdout üzerinden geçer. Sonuç Whisper'ın load_audio
+    çıktısıyla aynıdır, model dosyayı yeniden okumaz.
+    """
+    audio = _decode_wav_pcm16(data)
+    if audio is not None:
+        metrics.count("text", "decode_wav_direct")
+        return audio
+
+    try:
+        logger.info(f"FFmpeg ile çözme başlıyor ({len(data)} bytes)")
         result = subprocess.run([
             "ffmpeg",
-            "-y",
-            "-i", input_path,
+            "-i", "pipe:0",
+            "-f", "s16le",
             "-ac", "1",
-            "-ar", "16000",
+            "-ar", str(SAMPLE_RATE),
             "-acodec", "pcm_s16le",
-            output_path
-        ], check=True, capture_output=True, timeout=30)
-        logger.info(f"FFmpeg dönüşüm tamamlandı: {output_path}, çıkış kodu: {result.returncode}")
-        return output_path
+            "-loglevel", "error",
+            "pipe:1"
+        ], input=data, check=True, capture_output=True, timeout=30)
+        metrics.count("text", "decode_ffmpeg")
+        return np.frombuffer(result.stdout, "<i2").astype(np.float32) / 32768.0
     except subprocess.CalledProcessError as e:
         logger.error(f"FFmpeg hata verdi: {e.stderr.decode()}")
         raise HTTPException(400, f"Ses işleme hatası: {e.stderr.decode()}")
     except Exception as e:
-        logger.error(f"Ses dönüşüm hatası: {str(e)}")
+        logger.error(f"Ses çözme hatası: {str(e)}")
         raise HTTPException(400, f"Ses işleme hatası: {str(e)}")
 
-def transcribe_audio(audio_path: str) -> str:
-    """Kısa ses transkripsiyonu için optimize edilmiş fonksiyon"""
+def _decode(audio: np.ndarray, tier: str, word_timestamps: bool) -> Dict[str, Any]:
+    """Tek bir Whisper çözümü: "greedy" ya da "beam" (WHISPER_BEAM_SIZE)"""
+    beam_size = WHISPER_BEAM_SIZE if tier == "beam" else None
+    with metrics.stage("text", f"whisper_{tier}"):
+        return asr.transcribe(audio, beam_size, word_timestamps, **DECODE_OPTIONS)
+
+
+def escalation_reasons(result: Dict[str, Any]) -> List[str]:
+    """Greedy sonucunun beam search'e yükseltilme nedenleri (boş liste: sonuç yeterince güvenilir)"""
+    reasons = set()
+    if not result["text"].strip():
+        reasons.add("empty")
+    for segment in result.get("segments", []):
+        if segment["avg_logprob"] < WHISPER_ESCALATE_LOGPROB:
+            reasons.add("avg_logprob")
+        if segment["compression_ratio"] > WHISPER_ESCALATE_COMPRESSION:
+            reasons.add("compression_ratio")
+        if segment["no_speech_prob"] > WHISPER_ESCALATE_NO_SPEECH:
+            reasons.add("no_speech_prob")
+    return sorted(reasons)
+
+
+def transcribe_audio(audio: np.ndarray, word_timestamps: bool = False,
+                     greedy_only: bool = False) -> Dict[str, Any]:
+    """
+    Kısa ses transkripsiyonu (16 kHz mono float32 giriş).
+
+    "tiered" modda önce greedy çözülür; segmentlerden biri güven eşiklerini
+    aşarsa ya da metin boşsa kayıt beam search ile yeniden çözülür. Sonuç
+    metni, kullanılan katmanı ve yükseltme nedenlerini döndürür; kelime
+    zamanları yalnızca istenirse hizalanır. greedy_only yalnızca greedy
+    çözer (akıştaki ara sonuçlar için), yükseltme yapılmaz.
+    """
     try:
-        file_size = os.path.getsize(audio_path)
-        logger.info(f"Ses dosyası boyutu: {file_size} bytes")
-        if file_size < 512:
-            raise ValueError("Ses dosyası çok küçük")
-            
+        logger.info(f"Ses uzunluğu: {len(audio) / SAMPLE_RATE:.2f} sn")
+        if len(audio) < MIN_AUDIO_SAMPLES:
+            raise ValueError("Ses kaydı çok kısa")
+
         logger.info("Transkripsiyon başlıyor...")
-        result = model.transcribe(
-            audio_path,
-            language="tr",
-            fp16=False,
-            temperature=0.0,
-            best_of=5,
-            beam_size=5,
-            word_timestamps=True,
-            initial_prompt="Bu bir Türkçe konuşmadır.",
-            suppress_tokens=[],
-            without_timestamps=True
-        )
-        
-        text = result["text"].strip()
-        logger.info(f"İlk transkripsiyon sonucu: '{text}'")
-        
-        if not text:
-            logger.info("Fallback transkripsiyon deneniyor...")
-            result = model.transcribe(
-                audio_path,
-                language="tr",
-                fp16=False,
-                temperature=0.0,
-                best_of=5,
-                beam_size=5,
-                word_timestamps=True,
-                initial_prompt="Bu bir Türkçe konuşmadır.",
-                suppress_tokens=[],
-                without_timestamps=True
-            )
-            text = result["text"].strip()
-            logger.info(f"Fallback transkripsiyon sonucu: '{text}'")
-        
-        return text
+        tier = "greedy" if WHISPER_DECODING == "tiered" or greedy_only else "beam"
+        result = _decode(audio, tier, word_timestamps)
+        reasons = escalation_reasons(result) if tier == "greedy" and not greedy_only else []
+        logger.info(f"{tier} transkripsiyon sonucu: '{result['text'].strip()}'")
+
+        if reasons:
+            logger.info(f"Beam search'e yükseltiliyor: {', '.join(reasons)}")
+            metrics.count("text", "whisper_escalated")
+            tier = "beam"
+            result = _decode(audio, tier, word_timestamps)
+            logger.info(f"beam transkripsiyon sonucu: '{result['text'].strip()}'")
+        metrics.count("text", f"whisper_tier_{tier}")
+
+        transcription = {"text": result["text"].strip(), "tier": tier, "escalation_reasons": reasons}
+        if word_timestamps:
+            transcription["words"] = [
+                {"word": word["word"].strip(), "start": float(word["start"]), "end": float(word["end"]),
+                 "probability": round(float(word["probability"]), 3)}
+                for segment in result.get("segments", [])
+                for word in segment.get("words", [])
+            ]
+        return transcription
         
     except Exception as e:
         logger.error(f"Transkripsiyon hatası: {str(e)}")
-        raise HTTPException(500, f"Transkripsiyon başarısız: {str(e)}")
+        raise TranscriptionError(f"Transkripsiyon başarısız: {str(e)}")
+
+
+async def run_transcription(audio: np.ndarray, word_timestamps: bool = False,
+                            greedy_only: bool = False) -> Dict[str, Any]:
+    """transcribe_audio'yu işçi havuzunda (havuz kapalıysa bir thread'de) çalıştır; ses paylaşımlı bellekle geçer"""
+    if whisper_pool is None:
+        return await run_in_threadpool(transcribe_audio, audio, word_timestamps, greedy_only)
+    return await whisper_pool.run_with_array(transcribe_audio, audio, word_timestamps, greedy_only)
 
 def calculate_similarity(text1: str, text2: str) -> float:
     """Metinler arasındaki benzerlik oranını hesapla"""
@@ -97,46 +236,287 @@ def calculate_similarity(text1: str, text2: str) -> float:
 @router.post("/record_and_analyze")
 async def analyze_audio(
     audio: UploadFile = File(...),
-    reference_text: str = Form(...)
+    reference_text: str = Form(...),
+    word_timestamps: bool = Form(False)
 ):
-    temp_files = []
     try:
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
-            content = await audio.read()
-            tmp.write(content)
-            original_path = tmp.name
-            temp_files.append(original_path)
-            logger.info(f"Orijinal dosya: {original_path} ({len(content)} bytes)")
+        if not await model_registry.ensure_loaded_async("whisper"):
+            raise HTTPException(500, "Whisper modeli yüklenemedi")
+
+        content = await audio.read()
+        logger.info(f"Yüklenen ses: {audio.filename} ({len(content)} bytes)")
         
-        wav_path = convert_audio(original_path)
-        temp_files.append(wav_path)
-        logger.info(f"Dönüştürülen dosya: {wav_path}")
+        # Geçici dosya yok: yükleme bellekte 16 kHz mono float32 diziye çözülür
+        with metrics.stage("text", "decode"):
+            samples = await run_in_threadpool(decode_audio, content)
+        del content
         
-        transcribed_text = transcribe_audio(wav_path)
-        logger.info(f"Transkripsiyon: '{transcribed_text}'")
+        # Transkripsiyon olay döngüsünü bloklamaz; diğer uç noktalar beklemeden çalışır
+        with metrics.stage("text", "whisper"):
+            transcription = await run_transcription(samples, word_timestamps)
+        transcribed_text = transcription["text"]
+        logger.info(f"Transkripsiyon ({transcription['tier']}): '{transcribed_text}'")
         
         if not transcribed_text:
             raise HTTPException(400, "Transkripsiyon boş sonuç verdi")
         
-        similarity = calculate_similarity(transcribed_text, reference_text)
+        with metrics.stage("text", "similarity"):
+            similarity = calculate_similarity(transcribed_text, reference_text)
         basari = "Başarılı" if similarity >= 80 else "Başarısız"
         
-        return {
+        response = {
             "benzerlik_orani": similarity,
             "transcribed_text": transcribed_text,
             "reference_text": reference_text,
-            "basari": basari
+            "basari": basari,
+            "decoding": {
+                "backend": asr.name,
+                "mode": WHISPER_DECODING,
+                "tier": transcription["tier"],
+                "escalation_reasons": transcription["escalation_reasons"]
+            }
         }
+        if word_timestamps:
+            response["words"] = transcription["words"]
+        return response
+    except worker_pool.PoolFullError as e:
+        raise HTTPException(503, "Konuşma analizi şu anda yoğun, lütfen daha sonra tekrar deneyin",
+                            headers={"Retry-After": str(e.retry_after)})
+    except worker_pool.JobTimeoutError:
+        raise HTTPException(504, f"Transkripsiyon {whisper_pool.timeout_s:g} saniyede tamamlanmadı")
+    except BrokenProcessPool:
+        raise HTTPException(503, "Konuşma işçisi yeniden başlatıldı, lütfen tekrar deneyin",
+                            headers={"Retry-After": "1"})
+    except TranscriptionError as e:
+        raise HTTPException(500, str(e))
     except HTTPException as he:
         raise he
     except Exception as e:
         logger.error(f"Hata: {str(e)}")
         raise HTTPException(500, f"Sunucu hatası: {str(e)}")
-    finally:
-        for path in temp_files:
+
+
+class StreamProtocolError(Exception):
+    """The client broke the /stream_reading message protocol."""
+
+
+class _ReadingSession:
+    """
+    Transcription side of one /stream_reading connection.
+
+    `run` is a background task: every closed VAD segment is transcribed once
+    with the configured decoding and appended to the committed text, and
+    the last STREAM_PARTIAL_WINDOW_S of the open segment is decoded greedily
+    at most every STREAM_PARTIAL_INTERVAL_S for a partial transcript.
+    Partials are skipped while every Whisper worker is busy, so they never
+    queue ahead of uploads or of this session's own segments. After `end`
+    only the last segment is left to decode.
+    """
+
+    def __init__(self, websocket: WebSocket, stream: speech_stream.ReadingStream):
+        self.websocket = websocket
+        self.stream = stream
+        self.committed: List[str] = []
+        self.tiers: List[str] = []
+        self.reasons = set()
+        self.wake = asyncio.Event()
+        self.ended = False
+        self.last_partial_samples = 0
+
+    def committed_text(self) -> str:
+        return " ".join(self.committed)
+
+    async def _commit(self, segment: np.ndarray):
+        if len(segment) < MIN_AUDIO_SAMPLES:
+            # Zorunlu bölmeden sonra kalan birkaç örneklik kuyruk: çözülecek konuşma yok
+            metrics.count("text", "stream_segment_too_short")
+            return
+        # Kesinleşen segment atlanamaz; kuyruk doluysa STREAM_SEGMENT_RETRY_S boyunca yeniden denenir
+        deadline = time.monotonic() + STREAM_SEGMENT_RETRY_S
+        while True:
+            try:
+                with metrics.stage("text", "stream_segment"):
+                    transcription = await run_transcription(segment)
+                break
+            except worker_pool.PoolFullError:
+                if time.monotonic() >= deadline:
+                    raise
+                metrics.count("text", "stream_segment_retry")
+                await asyncio.sleep(0.2)
+        if transcription["text"]:
+            self.committed.append(transcription["text"])
+        self.tiers.append(transcription["tier"])
+        self.reasons.update(transcription["escalation_reasons"])
+        self.last_partial_samples = 0
+
+    async def _partial(self, segment: np.ndarray):
+        if whisper_pool is not None and whisper_pool.pending >= whisper_pool.max_workers:
+            # Boş işçi yok: ara sonuç kuyruğa girip diğer işleri geciktirmesin
+            metrics.count("text", "stream_partial_skipped")
+            return
+        window = int(STREAM_PARTIAL_WINDOW_S * speech_stream.SAMPLE_RATE)
+        try:
+            transcription = await run_transcription(segment[-window:], greedy_only=True)
+        except worker_pool.PoolFullError:
+            # Ara sonuç bir sonraki tura kalır
+            metrics.count("text", "stream_partial_skipped")
+            return
+        self.last_partial_samples = len(segment)
+        metrics.count("text", "stream_partial")
+        committed = self.committed_text()
+        await self.websocket.send_json({
+            "type": "partial",
+            "text": f"{committed} {transcription['text']}".strip(),
+            "committed": committed,
+            "audio_seconds": round(self.stream.seconds, 2),
+        })
+
+    async def run(self):
+        partial_samples = int(STREAM_PARTIAL_INTERVAL_S * speech_stream.SAMPLE_RATE)
+        while True:
+            try:
+                await asyncio.wait_for(self.wake.wait(), STREAM_PARTIAL_INTERVAL_S)
+            except asyncio.TimeoutError:
+                pass
+            self.wake.clear()
+
+            for segment in self.stream.pop_closed():
+                await self._commit(segment)
+            if self.ended:
+                return
+
+            segment = self.stream.open_segment()
+            if (segment is not None and len(segment) >= MIN_AUDIO_SAMPLES
+                    and len(segment) - self.last_partial_samples >= partial_samples):
+                await self._partial(segment)
+
+
+async def _receive_start(websocket: WebSocket) -> str:
+    """İlk mesaj: {"reference_text": ..., "sample_rate": 16000, "format": "pcm_s16le"}"""
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000))
+    try:
+        start = json.loads(message.get("text") or "")
+    except ValueError:
+        raise StreamProtocolError("İlk mesaj JSON olmalı")
+    if not isinstance(start, dict) or not str(start.get("reference_text", "")).strip():
+        raise StreamProtocolError("reference_text gerekli")
+    if start.get("sample_rate", SAMPLE_RATE) != SAMPLE_RATE or start.get("format", "pcm_s16le") != "pcm_s16le":
+        raise StreamProtocolError(f"Yalnızca {SAMPLE_RATE} Hz mono pcm_s16le ses akışı desteklenir")
+    return str(start["reference_text"])
+
+
+@router.websocket("/stream_reading")
+async def stream_reading(websocket: WebSocket):
+    """
+    Akışlı okuma testi.
+
+    İstemci önce başlangıç mesajını (JSON), sonra okuma sürerken 16 kHz
+    mono PCM16 ses parçalarını ikili mesajlar olarak, en sonda da
+    {"type": "end"} gönderir. Sunucu {"type": "ready"}, okuma sırasında
+    {"type": "partial"} ara sonuçları ve sonunda /record_and_analyze
+    yanıtıyla aynı alanları taşıyan {"type": "final"} gönderir; hata
+    durumunda {"type": "error", "detail"} gönderip bağlantıyı kapatır.
+    """
+    await websocket.accept()
+    task = None
+    try:
+        reference_text = await _receive_start(websocket)
+        if not await model_registry.ensure_loaded_async("whisper"):
+            await websocket.send_json({"type": "error", "detail": "Whisper modeli yüklenemedi"})
+            await websocket.close(1011)
+            return
+
+        stream = speech_stream.ReadingStream()
+        session = _ReadingSession(websocket, stream)
+        task = asyncio.create_task(session.run())
+        metrics.count("text", "stream_session")
+        await websocket.send_json({"type": "ready"})
+
+        while True:
+            message = await websocket.receive()
+            if task.done():
+                # Transkripsiyon görevi hata verdiyse burada yükselir
+                task.result()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            if message.get("bytes") is not None:
+                try:
+                    stream.feed(message["bytes"])
+                except ValueError as e:
+                    raise StreamProtocolError(str(e))
+                if stream.closed:
+                    session.wake.set()
+                continue
             try:
-                if os.path.exists(path):
-                    os.unlink(path)
-                    logger.info(f"Geçici dosya silindi: {path}")
-            except Exception as e:
-                logger.error(f"Geçici dosya silme hatası: {str(e)}")
\ No newline at end of file
+                control = json.loads(message.get("text") or "")
+            except ValueError:
+                raise StreamProtocolError("Kontrol mesajı JSON olmalı")
+            if isinstance(control, dict) and control.get("type") == "end":
+                break
+
+        # Son parçadan sonra yalnızca açık kalan son segment çözülür
+        end_started = time.perf_counter()
+        stream.finish()
+        session.ended = True
+        session.wake.set()
+        await task
+        transcribed_text = session.committed_text()
+        logger.info(f"Akış transkripsiyonu ({stream.seconds:.2f} sn, {len(session.tiers)} segment): "
+                    f"'{transcribed_text}'")
+
+        if not transcribed_text:
+            await websocket.send_json({"type": "error", "detail": "Transkripsiyon boş sonuç verdi"})
+            await websocket.close(1000)
+            return
+
+        with metrics.stage("text", "similarity"):
+            similarity = calculate_similarity(transcribed_text, reference_text)
+        await websocket.send_json({
+            "type": "final",
+            "benzerlik_orani": similarity,
+            "transcribed_text": transcribed_text,
+            "reference_text": reference_text,
+            "basari": "Başarılı" if similarity >= 80 else "Başarısız",
+            "audio_seconds": round(stream.seconds, 2),
+            "decoding": {
+                "backend": asr.name,
+                "mode": WHISPER_DECODING,
+                "tier": "beam" if "beam" in session.tiers else "greedy",
+                "escalation_reasons": sorted(session.reasons),
+                "segments": len(session.tiers)
+            }
+        })
+        metrics.observe_stage("text", "stream_final", time.perf_counter() - end_started)
+        await websocket.close(1000)
+    except WebSocketDisconnect:
+        logger.info("Akışlı okuma bağlantısı istemci tarafından kapatıldı")
+        metrics.count("text", "stream_disconnected")
+    except StreamProtocolError as e:
+        await _close_with_error(websocket, str(e), 1008)
+    except worker_pool.PoolFullError:
+        await _close_with_error(websocket, "Konuşma analizi şu anda yoğun, lütfen daha sonra tekrar deneyin", 1013)
+    except worker_pool.JobTimeoutError:
+        await _close_with_error(websocket, f"Transkripsiyon {whisper_pool.timeout_s:g} saniyede tamamlanmadı", 1011)
+    except BrokenProcessPool:
+        await _close_with_error(websocket, "Konuşma işçisi yeniden başlatıldı, lütfen tekrar deneyin", 1013)
+    except TranscriptionError as e:
+        await _close_with_error(websocket, str(e), 1011)
+    except Exception as e:
+        logger.error(f"Akış hatası: {str(e)}")
+        await _close_with_error(websocket, f"Sunucu hatası: {str(e)}", 1011)
+    finally:
+        if task is not None and not task.done():
+            task.cancel()
+
+
+async def _close_with_error(websocket: WebSocket, detail: str, code: int):
+    logger.error(f"Akışlı okuma hatası: {detail}")
+    metrics.count("text", "stream_error")
+    try:
+        await websocket.send_json({"type": "error", "detail": detail})
+        await websocket.close(code)
+    except (RuntimeError, WebSocketDisconnect):
+        # İstemci zaten ayrılmış
+        pass
@@ -0,0 +1,228 @@
+import bisect
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from config import env_bool
+
+# Ölçümler varsayılan olarak açıktır; kayıt başına maliyet bir kilit ve bir bisect'tir
+METRICS_ENABLED = env_bool("METRICS_ENABLED", True)
+
+# Saniye cinsinden histogram sınırları (1 ms - 60 s)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+PREFIX = "neurograph"
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram in the Prometheus layout."""
+
+    __slots__ = ("buckets", "counts", "total", "count")
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """
+    In-process store for stage timings, request timings and event counters.
+
+    Everything is kept in plain dicts behind a single lock and rendered in
+    the Prometheus text exposition format on demand.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._help: Dict[str, str] = {}
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, str, Labels, float]]]] = []
+
+    def observe(self, name: str, labels: Labels, seconds: float, help_text: str = ""):
+        with self._lock:
+            series = self._histograms.get(name)
+            if series is None:
+                series = self._histograms[name] = {}
+                self._help[name] = help_text
+            histogram = series.get(labels)
+            if histogram is None:
+                histogram = series[labels] = Histogram()
+            histogram.observe(seconds)
+
+    def inc(self, name: str, labels: Labels, amount: float = 1.0, help_text: str = ""):
+        with self._lock:
+            series = self._counters.get(name)
+            if series is None:
+                series = self._counters[name] = {}
+                self._help[name] = help_text
+            series[labels] = series.get(labels, 0.0) + amount
+
+    def add_collector(self, collector: Callable[[], Iterable[Tuple[str, str, str, Labels, float]]]):
+        """Register a callable yielding (name, type, help, labels, value) samples at scrape time."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._histograms.items()):
+                full_name = f"{PREFIX}_{name}"
+                lines.append(f"# HELP {full_name} {self._help.get(name, '')}")
+                lines.append(f"# TYPE {full_name} histogram")
+                for labels, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f"{full_name}_bucket{_format_labels(labels + (('le', repr(bound)),))} {cumulative}")
+                    lines.append(f"{full_name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {histogram.count}")
+                    lines.append(f"{full_name}_sum{_format_labels(labels)} {histogram.total:.6f}")
+                    lines.append(f"{full_name}_count{_format_labels(labels)} {histogram.count}")
+            for name, series in sorted(self._counters.items()):
+                full_name = f"{PREFIX}_{name}"
+                lines.append(f"# HELP {full_name} {self._help.get(name, '')}")
+                lines.append(f"# TYPE {full_name} counter")
+                for labels, value in sorted(series.items()):
+                    lines.append(f"{full_name}{_format_labels(labels)} {value:g}")
+            collectors = list(self._collectors)
+
+        # Toplayıcılar kilit dışında çalışır (kendi kilitlerini alabilirler)
+        declared = set()
+        for collector in collectors:
+            for name, metric_type, help_text, labels, value in collector():
+                full_name = f"{PREFIX}_{name}"
+                if full_name not in declared:
+                    declared.add(full_name)
+                    lines.append(f"# HELP {full_name} {help_text}")
+                    lines.append(f"# TYPE {full_name} {metric_type}")
+                lines.append(f"{full_name}{_format_labels(labels)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def drain(self):
+        """Return and clear everything recorded so far (used inside worker processes)."""
+        with self._lock:
+            snapshot = (self._histograms, self._counters, dict(self._help))
+            self._histograms, self._counters = {}, {}
+        return snapshot
+
+    def merge(self, snapshot):
+        """Add a snapshot taken by drain() in another process to this registry."""
+        histograms, counters, help_texts = snapshot
+        with self._lock:
+            for name, text in help_texts.items():
+                self._help.setdefault(name, text)
+            for name, series in histograms.items():
+                target = self._histograms.setdefault(name, {})
+                for labels, histogram in series.items():
+                    existing = target.get(labels)
+                    if existing is None:
+                        target[labels] = histogram
+                        continue
+                    existing.counts = [a + b for a, b in zip(existing.counts, histogram.counts)]
+                    existing.total += histogram.total
+                    existing.count += histogram.count
+            for name, series in counters.items():
+                target = self._counters.setdefault(name, {})
+                for labels, value in series.items():
+                    target[labels] = target.get(labels, 0.0) + value
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels) + "}"
+
+
+class _StageTimer:
+    __slots__ = ("router", "stage", "start")
+
+    def __init__(self, router: str, stage: str):
+        self.router = router
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        observe_stage(self.router, self.stage, time.perf_counter() - self.start)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_registry = MetricsRegistry()
+_NULL_TIMER = _NullTimer()
+
+
+def stage(router: str, stage_name: str):
+    """Context manager timing one processing stage of a router, e.g. stage("spiral", "invoke")."""
+    if not METRICS_ENABLED:
+        return _NULL_TIMER
+    return _StageTimer(router, stage_name)
+
+
+def observe_stage(router: str, stage_name: str, seconds: float):
+    if METRICS_ENABLED:
+        _registry.observe("stage_duration_seconds", (("router", router), ("stage", stage_name)), seconds,
+                          "Time spent in each processing stage.")
+
+
+def observe_request(route: str, method: str, status: int, seconds: float):
+    if METRICS_ENABLED:
+        _registry.observe("http_request_duration_seconds", (("route", route), ("method", method)), seconds,
+                          "End-to-end HTTP request latency.")
+        _registry.inc("http_requests_total", (("route", route), ("method", method), ("status", str(status))),
+                      help_text="HTTP requests by route and status code.")
+
+
+def count(router: str, event: str, amount: float = 1.0):
+    """Increment an event counter, e.g. count("handwriting", "tesseract_fallback")."""
+    if METRICS_ENABLED:
+        _registry.inc("events_total", (("router", router), ("event", event)), amount,
+                      "Events by router (cache hits, fallbacks, errors).")
+
+
+def add_collector(collector):
+    _registry.add_collector(collector)
+
+
+def render() -> str:
+    return _registry.render()
+
+
+def reset():
+    _registry.reset()
+
+
+def drain():
+    return _registry.drain()
+
+
+def merge(snapshot):
+    _registry.merge(snapshot)
@@ -0,0 +1,142 @@
+import logging
+import threading
+import time
+from typing import Callable, Dict, Any, Optional, List
+
+from fastapi.concurrency import run_in_threadpool
+
+from config import env_float
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+NOT_LOADED = "not_loaded"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+# Yüklenemeyen model bu süre boyunca yeniden denenmez (her istekte yeniden yükleme/süreç başlatma olmasın)
+MODEL_RETRY_COOLDOWN_S = env_float("MODEL_RETRY_COOLDOWN_S", 30.0)
+
+
+class ModelEntry:
+    """
+    A lazily loaded model.
+
+    `loader` is called on first use (or by the background warm-up); the
+    optional `warmup` callable runs a dummy inference right after loading so
+    the first real request does not pay for lazy allocations. After a failed
+    load the entry stays FAILED for MODEL_RETRY_COOLDOWN_S before the next
+    request tries again.
+    """
+
+    def __init__(self, name: str, loader: Callable[[], None], warmup: Optional[Callable[[], None]] = None):
+        self.name = name
+        self.loader = loader
+        self.warmup = warmup
+        self.state = NOT_LOADED
+        self.error = None
+        self.load_time_s = None
+        self.warmup_time_s = None
+        self.loaded_at = None
+        self.failed_at = None
+        self._lock = threading.Lock()
+
+    def in_cooldown(self) -> bool:
+        return self.state == FAILED and time.monotonic() - self.failed_at < MODEL_RETRY_COOLDOWN_S
+
+    def ensure_loaded(self) -> bool:
+        """Load (and warm up) the model if needed; returns False if loading failed."""
+        if self.state == READY:
+            return True
+        if self.in_cooldown():
+            return False
+        with self._lock:
+            if self.state == READY:
+                return True
+            if self.in_cooldown():
+                # Kilidi bekleyen istekler az önce başarısız olan yüklemeyi tekrarlamaz
+                return False
+            self.state = LOADING
+            self.error = None
+            try:
+                start = time.perf_counter()
+                self.loader()
+                self.load_time_s = round(time.perf_counter() - start, 3)
+                if self.warmup is not None:
+                    start = time.perf_counter()
+                    self.warmup()
+                    self.warmup_time_s = round(time.perf_counter() - start, 3)
+            except Exception as e:
+                self.state = FAILED
+                self.failed_at = time.monotonic()
+                self.error = str(e)
+                logger.error(f"[{self.name}] Model yüklenemedi: {e}")
+                return False
+            self.state = READY
+            self.loaded_at = time.time()
+            logger.info(
+                f"[{self.name}] Model hazır (yükleme {self.load_time_s}s, "
+                f"ısınma {self.warmup_time_s if self.warmup_time_s is not None else '-'}s)"
+            )
+            return True
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "load_time_s": self.load_time_s,
+            "warmup_time_s": self.warmup_time_s,
+            "loaded_at": self.loaded_at,
+            "error": self.error,
+            "retry_in_s": (round(max(0.0, self.failed_at + MODEL_RETRY_COOLDOWN_S - time.monotonic()), 1)
+                           if self.state == FAILED else None),
+        }
+
+
+_models: Dict[str, ModelEntry] = {}
+
+
+def register(name: str, loader: Callable[[], None], warmup: Optional[Callable[[], None]] = None) -> ModelEntry:
+    """Register a model without loading it."""
+    if name not in _models:
+        _models[name] = ModelEntry(name, loader, warmup)
+    return _models[name]
+
+
+def ensure_loaded(name: str) -> bool:
+    return _models[name].ensure_loaded()
+
+
+async def ensure_loaded_async(name: str) -> bool:
+    """ensure_loaded() without blocking the event loop while a model loads."""
+    entry = _models[name]
+    if entry.state == READY:
+        return True
+    if entry.in_cooldown():
+        return False
+    return await run_in_threadpool(entry.ensure_loaded)
+
+
+def is_ready(name: str) -> bool:
+    return _models[name].state == READY
+
+
+def status() -> Dict[str, Dict[str, Any]]:
+    return {name: entry.status() for name, entry in _models.items()}
+
+
+def all_ready() -> bool:
+    return all(entry.state == READY for entry in _models.values())
+
+
+def start_background_warmup(names: Optional[List[str]] = None) -> threading.Thread:
+    """Load and warm up models one after another on a background thread."""
+    selected = [_models[name] for name in (names or list(_models))]
+
+    def run():
+        for entry in selected:
+            entry.ensure_loaded()
+
+    thread = threading.Thread(target=run, name="model-warmup", daemon=True)
+    thread.start()
+    return thread
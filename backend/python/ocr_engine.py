@@ -0,0 +1,233 @@
+"""
+Persistent Tesseract OCR engine.
+
+pytesseract starts a new `tesseract` process for every call, and that
+process reloads the language data each time. This module keeps a small pool
+of tesserocr `PyTessBaseAPI` instances instead. Each instance loads the
+language data once, and images are passed to it in memory. If tesserocr is
+not installed (it needs the libtesseract headers at install time), the engine
+falls back to pytesseract so OCR keeps working, without the speed-up.
+
+The engine is created on first use. Its health is cached, so health checks
+can report it without running OCR.
+"""
+import logging
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, List
+
+import numpy as np
+from PIL import Image
+
+from config import env_int, env_str
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+OCR_BACKENDS = ("auto", "tesserocr", "pytesseract")
+OCR_BACKEND = env_str("OCR_BACKEND", "auto")
+if OCR_BACKEND not in OCR_BACKENDS:
+    logger.warning(f"Unknown OCR_BACKEND '{OCR_BACKEND}', using 'auto'")
+    OCR_BACKEND = "auto"
+OCR_LANG = env_str("OCR_LANG", "tur")
+# Each PyTessBaseAPI keeps its own copy of the language model (tens of MB)
+OCR_POOL_SIZE = max(1, env_int("OCR_POOL_SIZE", 1))
+# Only used by the pytesseract fallback
+TESSERACT_CMD = env_str("TESSERACT_CMD", r"C:\Program Files\Tesseract-OCR\tesseract.exe")
+
+# The column order of Tesseract's TSV output (pytesseract.image_to_data)
+TSV_COLUMNS = ("level", "page_num", "block_num", "par_num", "line_num", "word_num",
+               "left", "top", "width", "height", "conf", "text")
+
+NOT_LOADED = "not_loaded"
+READY = "ready"
+FAILED = "failed"
+
+
+def parse_tsv(tsv: str, header: bool = False) -> Dict[str, List[Any]]:
+    """Turn Tesseract TSV output into the dict pytesseract.Output.DICT returns."""
+    data = {column: [] for column in TSV_COLUMNS}
+    rows = tsv.splitlines()
+    if header:
+        rows = rows[1:]
+    for row in rows:
+        fields = row.split("\t")
+        if len(fields) < len(TSV_COLUMNS) - 1:
+            continue
+        # Rows above word level have no text column
+        if len(fields) == len(TSV_COLUMNS) - 1:
+            fields.append("")
+        for column, value in zip(TSV_COLUMNS, fields):
+            if column == "text":
+                data[column].append(value)
+            elif column == "conf":
+                data[column].append(float(value))
+            else:
+                data[column].append(int(value))
+    return data
+
+
+class OcrEngine:
+    """
+    A fixed-size pool of Tesseract API instances for one language.
+
+    Each instance is used by at most one thread at a time. Calls wait for a
+    free instance, like InterpreterPool does for the TFLite interpreters.
+    """
+
+    def __init__(self, lang: str, pool_size: int, backend: str = "auto"):
+        self.lang = lang
+        self.pool_size = max(1, pool_size)
+        self.requested_backend = backend
+        self.backend = None
+        self.state = NOT_LOADED
+        self.error = None
+        self.version = None
+        self.load_time_s = None
+        self.calls = 0
+        self.failures = 0
+        self.total_ms = 0.0
+        self.last_success_at = None
+        self.last_error_at = None
+        self._apis = []
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.state == READY
+
+    def load(self) -> bool:
+        """Create the pool once; returns False if no OCR backend is usable."""
+        if self.state != NOT_LOADED:
+            return self.state == READY
+        with self._lock:
+            if self.state != NOT_LOADED:
+                return self.state == READY
+            start = time.perf_counter()
+            try:
+                if self.requested_backend in ("auto", "tesserocr"):
+                    try:
+                        self._load_tesserocr()
+                    except ImportError:
+                        if self.requested_backend == "tesserocr":
+                            raise
+                        logger.warning("tesserocr is not installed, OCR falls back to pytesseract "
+                                       "(one tesseract process per call)")
+                        self._load_pytesseract()
+                else:
+                    self._load_pytesseract()
+            except Exception as e:
+                self.state = FAILED
+                self.error = str(e)
+                self.last_error_at = time.time()
+                logger.error(f"OCR engine could not be loaded: {e}")
+                return False
+            self.load_time_s = round(time.perf_counter() - start, 3)
+            self.state = READY
+            logger.info(f"OCR engine ready: backend={self.backend}, lang={self.lang}, "
+                        f"pool_size={len(self._apis) or 1}, version={self.version}")
+            return True
+
+    def _load_tesserocr(self):
+        import tesserocr
+
+        apis = []
+        try:
+            for _ in range(self.pool_size):
+                apis.append(tesserocr.PyTessBaseAPI(lang=self.lang, psm=tesserocr.PSM.SINGLE_BLOCK))
+        except Exception:
+            for api in apis:
+                api.End()
+            raise
+        self._apis = apis
+        for api in apis:
+            self._idle.put(api)
+        self.backend = "tesserocr"
+        self.version = tesserocr.tesseract_version().splitlines()[0]
+
+    def _load_pytesseract(self):
+        import pytesseract
+
+        pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
+        # Checked once here; health checks read the cached result
+        self.version = str(pytesseract.get_tesseract_version())
+        if self.lang not in pytesseract.get_languages():
+            raise RuntimeError(f"Tesseract language data '{self.lang}' is not installed")
+        self.backend = "pytesseract"
+
+    @contextmanager
+    def _acquire(self):
+        api = self._idle.get()
+        try:
+            yield api
+        finally:
+            self._idle.put(api)
+
+    def image_to_data(self, img: np.ndarray) -> Dict[str, List[Any]]:
+        """
+        Recognize one image as a single block of text (--psm 6).
+
+        Returns the same dict as pytesseract.image_to_data(..., output_type=Output.DICT).
+        """
+        if not self.load():
+            raise RuntimeError(f"OCR engine unavailable: {self.error}")
+        start = time.perf_counter()
+        try:
+            if self.backend == "tesserocr":
+                with self._acquire() as api:
+                    try:
+                        api.SetImage(Image.fromarray(img))
+                        tsv = api.GetTSVText(0) or ""
+                    finally:
+                        api.Clear()
+                data = parse_tsv(tsv)
+            else:
+                import pytesseract
+                data = pytesseract.image_to_data(img, lang=self.lang, output_type=pytesseract.Output.DICT,
+                                                 config="--psm 6")
+        except Exception:
+            self.failures += 1
+            self.last_error_at = time.time()
+            raise
+        self.calls += 1
+        self.total_ms += (time.perf_counter() - start) * 1000.0
+        self.last_success_at = time.time()
+        return data
+
+    def status(self) -> Dict[str, Any]:
+        """Cached engine state; never runs OCR."""
+        return {
+            "state": self.state,
+            "backend": self.backend,
+            "requested_backend": self.requested_backend,
+            "lang": self.lang,
+            "version": self.version,
+            "error": self.error,
+            "pool_size": len(self._apis) if self.backend == "tesserocr" else None,
+            "idle": self._idle.qsize() if self.backend == "tesserocr" else None,
+            "load_time_s": self.load_time_s,
+            "calls": self.calls,
+            "failures": self.failures,
+            "avg_ms": round(self.total_ms / self.calls, 2) if self.calls else None,
+            "last_success_at": self.last_success_at,
+            "last_error_at": self.last_error_at,
+        }
+
+
+_engine = OcrEngine(OCR_LANG, OCR_POOL_SIZE, OCR_BACKEND)
+
+
+def ensure_loaded() -> bool:
+    return _engine.load()
+
+
+def image_to_data(img: np.ndarray) -> Dict[str, List[Any]]:
+    return _engine.image_to_data(img)
+
+
+def status() -> Dict[str, Any]:
+    return _engine.status()
+
@@ -0,0 +1,231 @@
+import glob
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+import metrics
+from config import env_bool, env_float, env_int, env_str
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+RESULT_CACHE_ENABLED = env_bool("RESULT_CACHE_ENABLED", True)
+RESULT_CACHE_MAX_BYTES = env_int("RESULT_CACHE_MAX_BYTES", 64 * 1024 * 1024)
+RESULT_CACHE_TTL_S = env_float("RESULT_CACHE_TTL_S", 24 * 3600.0)
+# Boş bırakılırsa disk katmanı kapalıdır
+RESULT_CACHE_DIR = env_str("RESULT_CACHE_DIR", "")
+RESULT_CACHE_DISK_MAX_FILES = env_int("RESULT_CACHE_DISK_MAX_FILES", 10000)
+
+
+class ResultCache:
+    """
+    LRU cache of JSON analysis results keyed by content hash.
+
+    Entries are stored as UTF-8 encoded JSON so the byte budget is exact and
+    callers always get a fresh copy. An optional on-disk tier (one JSON file
+    per key) survives restarts and is trimmed to `disk_max_files`. Disk
+    writes run on a background thread; async handlers read the disk tier
+    through `get_async`, so file I/O never runs on the event loop.
+    """
+
+    def __init__(self, max_bytes: int, ttl_s: float, disk_dir: str = "", disk_max_files: int = 10000):
+        self.max_bytes = max(0, max_bytes)
+        self.ttl_s = ttl_s
+        self.disk_dir = disk_dir
+        self.disk_max_files = max(1, disk_max_files)
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._disk_writes = 0
+        self._disk_executor = None
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            # Tek thread: yazma sırası korunur, budama yazmalarla yarışmaz
+            self._disk_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="result-cache-disk")
+
+    @staticmethod
+    def make_key(namespace: str, version: str, data: bytes, params: str = "") -> str:
+        """Hash of the uploaded bytes plus the model/algorithm version and options."""
+        digest = hashlib.sha256()
+        for part in (namespace, version, params):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        digest.update(data)
+        return f"{namespace}-{digest.hexdigest()}"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        value = self.get_memory(key)
+        if value is not None:
+            return value
+        return self.get_disk(key)
+
+    def get_memory(self, key: str) -> Optional[Dict[str, Any]]:
+        """Memory tier only; a miss here is not counted until get_disk also misses."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, payload = entry
+            if expires_at > now:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return json.loads(payload)
+            self._remove(key)
+        return None
+
+    def get_disk(self, key: str) -> Optional[Dict[str, Any]]:
+        """Disk tier lookup (blocking file I/O); a hit is promoted to memory."""
+        now = time.time()
+        payload = self._disk_get(key, now)
+        with self._lock:
+            if payload is None:
+                self._misses += 1
+                return None
+            self._disk_hits += 1
+            self._insert(key, payload, now + self.ttl_s)
+        return json.loads(payload)
+
+    def put(self, key: str, value: Dict[str, Any]):
+        payload = json.dumps(value, ensure_ascii=False).encode("utf-8")
+        if len(payload) > self.max_bytes:
+            return
+        expires_at = time.time() + self.ttl_s
+        with self._lock:
+            self._insert(key, payload, expires_at)
+        if self._disk_executor is not None:
+            self._disk_executor.submit(self._disk_put, key, payload, expires_at)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._disk_hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_s": self.ttl_s,
+                "hits": self._hits,
+                "disk_hits": self._disk_hits,
+                "misses": self._misses,
+                "hit_ratio": round((self._hits + self._disk_hits) / lookups, 4) if lookups else 0.0,
+                "evictions": self._evictions,
+                "disk_dir": self.disk_dir or None,
+            }
+
+    def _insert(self, key: str, payload: bytes, expires_at: float):
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (expires_at, payload)
+        self._bytes += len(payload)
+        while self._bytes > self.max_bytes and self._entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self._evictions += 1
+
+    def _remove(self, key: str):
+        _, payload = self._entries.pop(key)
+        self._bytes -= len(payload)
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _disk_get(self, key: str, now: float) -> Optional[bytes]:
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                record = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        if record.get("expires_at", 0) <= now:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            return None
+        return record["payload"].encode("utf-8")
+
+    def _disk_put(self, key: str, payload: bytes, expires_at: float):
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"expires_at": expires_at, "payload": payload.decode("utf-8")}, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Sonuç önbelleği diske yazılamadı: {e}")
+            return
+        with self._lock:
+            self._disk_writes += 1
+            should_prune = self._disk_writes % 100 == 0
+        if should_prune:
+            self._prune_disk()
+
+    def _prune_disk(self):
+        files = []
+        for path in glob.glob(os.path.join(self.disk_dir, "*.json")):
+            try:
+                files.append((os.path.getmtime(path), path))
+            except FileNotFoundError:
+                continue
+        files.sort()
+        for _, path in files[:max(0, len(files) - self.disk_max_files)]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+_cache = ResultCache(
+    max_bytes=RESULT_CACHE_MAX_BYTES,
+    ttl_s=RESULT_CACHE_TTL_S,
+    disk_dir=RESULT_CACHE_DIR,
+    disk_max_files=RESULT_CACHE_DISK_MAX_FILES,
+) if RESULT_CACHE_ENABLED else None
+
+
+def make_key(namespace: str, version: str, data: bytes, params: str = "") -> str:
+    return ResultCache.make_key(namespace, version, data, params)
+
+
+def get(key: str) -> Optional[Dict[str, Any]]:
+    if _cache is None:
+        return None
+    value = _cache.get(key)
+    # Anahtarın ön eki router adıdır (bkz. make_key)
+    metrics.count(key.split("-", 1)[0], "cache_miss" if value is None else "cache_hit")
+    return value
+
+
+async def get_async(key: str) -> Optional[Dict[str, Any]]:
+    """get() for async handlers: the disk tier is read on a thread, not on the event loop."""
+    if _cache is None:
+        return None
+    value = _cache.get_memory(key)
+    if value is None:
+        # Disk katmanı yoksa get_disk yalnızca ıskayı sayar
+        value = await run_in_threadpool(_cache.get_disk, key) if _cache.disk_dir else _cache.get_disk(key)
+    metrics.count(key.split("-", 1)[0], "cache_miss" if value is None else "cache_hit")
+    return value
+
+
+def put(key: str, value: Dict[str, Any]):
+    if _cache is not None:
+        _cache.put(key, value)
+
+
+def stats() -> Dict[str, Any]:
+    return _cache.stats() if _cache is not None else {"enabled": False}
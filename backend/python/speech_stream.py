@@ -0,0 +1,129 @@
+"""
+Voice activity detection and segmentation for the streaming reading test.
+
+The /text/stream_reading WebSocket feeds raw 16 kHz mono PCM16 chunks into
+a ReadingStream while the patient reads. An energy-based VAD marks every
+30 ms frame as speech or silence. The noise floor adapts to the room, so
+quiet microphones and background hum both work. Speech separated by
+STREAM_VAD_SILENCE_MS of silence is cut into segments:
+
+  * a closed segment will not change any more; it is transcribed once,
+    with the full tiered decoding, and its text is committed;
+  * the open segment (speech still going on) is transcribed greedily now
+    and then for partial transcripts.
+
+When the stream ends only the last segment is left to decode, which is
+why the final result arrives shortly after the last chunk.
+"""
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from config import env_float, env_int
+
+SAMPLE_RATE = 16000
+VAD_FRAME_MS = 30
+VAD_FRAME = SAMPLE_RATE * VAD_FRAME_MS // 1000
+
+# Bir segmenti kapatan sessizlik süresi
+STREAM_VAD_SILENCE_MS = env_int("STREAM_VAD_SILENCE_MS", 600)
+# Konuşma sayılmak için mutlak alt sınır (dBFS) ve gürültü tabanının üstündeki pay (dB)
+STREAM_VAD_THRESHOLD_DB = env_float("STREAM_VAD_THRESHOLD_DB", -45.0)
+STREAM_VAD_NOISE_MARGIN_DB = env_float("STREAM_VAD_NOISE_MARGIN_DB", 10.0)
+# Segmentin başına ve sonuna eklenen bağlam (kelime başlarını kesmemek için)
+STREAM_VAD_PAD_MS = 200
+# Whisper 30 sn'lik pencerelerle çalışır; daha uzun konuşma bu noktada bölünür
+STREAM_MAX_SEGMENT_S = env_float("STREAM_MAX_SEGMENT_S", 25.0)
+# Bir oturumda kabul edilen en uzun ses
+STREAM_MAX_SECONDS = env_float("STREAM_MAX_SECONDS", 120.0)
+
+
+class ReadingStream:
+    """
+    Audio buffer plus VAD state for one streaming session.
+
+    `feed` appends PCM16 bytes and runs the VAD over the new whole frames;
+    closed segments are collected as (start, end) sample ranges until
+    `pop_closed` takes them. `finish` closes whatever speech is still open.
+    """
+
+    def __init__(self):
+        self.audio = np.zeros(int(STREAM_MAX_SECONDS * SAMPLE_RATE), dtype=np.float32)
+        self.length = 0
+        self.vad_position = 0
+        self.noise_db = STREAM_VAD_THRESHOLD_DB - STREAM_VAD_NOISE_MARGIN_DB
+        self.speech_start: Optional[int] = None
+        self.last_speech_end = 0
+        self.silent_frames = 0
+        self.closed: List[Tuple[int, int]] = []
+        self.speech_frames = 0
+        self._odd_byte = b""
+
+    @property
+    def seconds(self) -> float:
+        return self.length / SAMPLE_RATE
+
+    def feed(self, chunk: bytes):
+        """Append little-endian PCM16 samples; raises ValueError past STREAM_MAX_SECONDS."""
+        chunk = self._odd_byte + chunk
+        self._odd_byte = chunk[len(chunk) - len(chunk) % 2:]
+        samples = np.frombuffer(chunk[:len(chunk) - len(self._odd_byte)], "<i2")
+        if self.length + len(samples) > len(self.audio):
+            raise ValueError(f"Ses akışı en fazla {STREAM_MAX_SECONDS:g} saniye olabilir")
+        self.audio[self.length:self.length + len(samples)] = samples / np.float32(32768.0)
+        self.length += len(samples)
+        self._run_vad()
+
+    def _run_vad(self):
+        count = (self.length - self.vad_position) // VAD_FRAME
+        if count == 0:
+            return
+        frames = self.audio[self.vad_position:self.vad_position + count * VAD_FRAME].reshape(count, VAD_FRAME)
+        levels_db = 10.0 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+        silence_frames = max(1, STREAM_VAD_SILENCE_MS // VAD_FRAME_MS)
+        pad = STREAM_VAD_PAD_MS * SAMPLE_RATE // 1000
+        max_segment = int(STREAM_MAX_SEGMENT_S * SAMPLE_RATE)
+
+        for level in levels_db.tolist():
+            frame_start = self.vad_position
+            self.vad_position += VAD_FRAME
+            if level > max(STREAM_VAD_THRESHOLD_DB, self.noise_db + STREAM_VAD_NOISE_MARGIN_DB):
+                self.speech_frames += 1
+                self.silent_frames = 0
+                self.last_speech_end = self.vad_position
+                if self.speech_start is None:
+                    self.speech_start = max(0, frame_start - pad)
+                elif self.vad_position - self.speech_start >= max_segment:
+                    self._close(self.vad_position)
+                    self.speech_start = self.vad_position
+                continue
+
+            # Gürültü tabanı yalnızca sessiz çerçevelerden, yavaşça izlenir
+            self.noise_db = 0.95 * self.noise_db + 0.05 * level
+            if self.speech_start is not None:
+                self.silent_frames += 1
+                if self.silent_frames >= silence_frames:
+                    self._close(min(self.vad_position, self.last_speech_end + pad))
+
+    def _close(self, end: int):
+        if end > self.speech_start:
+            self.closed.append((self.speech_start, end))
+        self.speech_start = None
+        self.silent_frames = 0
+
+    def pop_closed(self) -> List[np.ndarray]:
+        """Closed segments since the last call, as float32 arrays."""
+        segments = [self.audio[start:end].copy() for start, end in self.closed]
+        self.closed = []
+        return segments
+
+    def open_segment(self) -> Optional[np.ndarray]:
+        """Speech that is still going on (None between segments)."""
+        if self.speech_start is None:
+            return None
+        return self.audio[self.speech_start:self.length].copy()
+
+    def finish(self):
+        """Close the open segment at the end of the buffer."""
+        if self.speech_start is not None:
+            self._close(self.length)
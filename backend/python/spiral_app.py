@@ -1,14 +1,17 @@
 import os
-os.environ['TF_ENABLE_ONEDNN_OPTS'] = '0'
 
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi import APIRouter, UploadFile, File, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
 import numpy as np
-from PIL import Image
-import tensorflow as tf
-import io
 import logging
-import datetime
+
+import debug_capture
+import inference_engine
+import model_registry
+import result_cache
+import strokes
+from drawing_preprocessing import load_resized_rgb
 
 router = APIRouter()
 
@@ -16,24 +19,27 @@ router = APIRouter()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-MODEL_PATH = os.path.join(
+# DRAWING_MODEL_VARIANT / SPIRAL_MODEL_VARIANT ile float16 veya int8 varyantı seçilebilir
+MODEL_PATH = inference_engine.variant_model_path("spiral", os.path.join(
     os.path.dirname(__file__),
     "models",
     "spiral_test_model_densenet121.tflite"
-)
+))
 
 print(f"Looking for model at: {MODEL_PATH}")
 print(f"Model exists: {os.path.exists(MODEL_PATH)}")
 
+# Interpreter havuzu (paylaşılan çıkarım motoru)
+engine = inference_engine.register_model("spiral", MODEL_PATH)
+
 # Global değişkenler
-interpreter = None
 input_details = None
 output_details = None
 MODEL_INPUT_HEIGHT, MODEL_INPUT_WIDTH, MODEL_INPUT_CHANNELS, MODEL_INPUT_DTYPE = None, None, None, None
 
 
 def load_model():
-    global interpreter, input_details, output_details, \
+    global input_details, output_details, \
            MODEL_INPUT_HEIGHT, MODEL_INPUT_WIDTH, MODEL_INPUT_CHANNELS, MODEL_INPUT_DTYPE
 
     try:
@@ -43,12 +49,14 @@ def load_model():
             logger.error(f"Files in current directory: {os.listdir('.')}")
             raise FileNotFoundError(f"Model dosyası bulunamadı: {MODEL_PATH}")
 
-        interpreter = tf.lite.Interpreter(model_path=MODEL_PATH)
-        interpreter.allocate_tensors()
-        logger.info("TFLite modeli başarıyla yüklendi ve tensorler ayrıldı.")
+        engine.load()
+        logger.info(
+            f"TFLite modeli başarıyla yüklendi ve tensorler ayrıldı "
+            f"({engine.pool_size} interpreter, interpreter başına {engine.num_threads} thread)."
+        )
 
-        input_details = interpreter.get_input_details()
-        output_details = interpreter.get_output_details()
+        input_details = engine.input_details
+        output_details = engine.output_details
         logger.info(f"Model giriş detayları: {input_details}")
         logger.info(f"Model çıkış detayları: {output_details}")
 
@@ -64,62 +72,34 @@ def load_model():
 
     except Exception as e:
         logger.error(f"TFLite modeli yüklenirken hata oluştu: {e}")
-        interpreter = None
+        raise
 
-load_model()
+# Model ilk istekte ya da uygulama açılışındaki arka plan ısınmasında yüklenir
+model_registry.register("spiral", load_model, warmup=engine.warm_up)
 
 def preprocess_image_for_model(image_bytes: bytes) -> np.ndarray:
-    if interpreter is None:
+    """
+    Görüntüyü model çözünürlüğünde (H, W, 3) uint8 diziye dönüştür.
+
+    Normalizasyon, çıkarım sırasında doğrudan interpreter'ın giriş tamponuna
+    yapılır (bkz. inference_engine.InterpreterPool.predict_images).
+    """
+    if not engine.is_loaded:
         raise ValueError("ML modeli yüklenmediği için ön işleme yapılamıyor.")
     if None in (MODEL_INPUT_HEIGHT, MODEL_INPUT_WIDTH, MODEL_INPUT_CHANNELS, MODEL_INPUT_DTYPE):
         raise ValueError("Model detayları alınamadığı için ön işleme yapılamıyor.")
+    if MODEL_INPUT_DTYPE not in (np.float32, np.uint8, np.int8):
+        raise ValueError(f"Bilinmeyen dtype: {MODEL_INPUT_DTYPE}")
 
     try:
-        # 1. Baytları Image nesnesine çevir
-        img_pil = Image.open(io.BytesIO(image_bytes))
-        logger.info(f"Yüklenen görüntünün orijinal modu: {img_pil.mode}")
-
-        # RGBA -> RGB dönüştür
-        if img_pil.mode == 'RGBA':
-            background = Image.new("RGB", img_pil.size, (255, 255, 255))
-            background.paste(img_pil, mask=img_pil.split()[3])
-            img_pil = background
-        elif img_pil.mode != 'RGB':
-            img_pil = img_pil.convert('RGB')
-
-        # 2. Yeniden boyutlandır
-        img_pil = img_pil.resize(
-            (MODEL_INPUT_WIDTH, MODEL_INPUT_HEIGHT),
-            Image.Resampling.LANCZOS
-        )
-
-        # Debug için kaydet
-        debug_dir = "debug_preprocessed_images"
-        os.makedirs(debug_dir, exist_ok=True)
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-        debug_path = os.path.join(debug_dir, f"preprocessed_{timestamp}.png")
-        img_pil.save(debug_path)
-        logger.info(f"Ön işlenmiş görüntü kaydedildi: {debug_path}")
-
-        # 3. NumPy array'e çevir
-        img_array = np.array(img_pil, dtype=np.float32)
-
-        # 4. dtype'e göre normalize et
-        if MODEL_INPUT_DTYPE == np.float32:
-            img_array = img_array / 255.0
-        elif MODEL_INPUT_DTYPE == np.uint8:
-            img_array = img_array.astype(np.uint8)
-        else:
-            raise ValueError(f"Bilinmeyen dtype: {MODEL_INPUT_DTYPE}")
+        # Çöz, RGBA ise beyaz zemine birleştir ve model boyutuna getir
+        img_array = load_resized_rgb(image_bytes, MODEL_INPUT_WIDTH, MODEL_INPUT_HEIGHT, router="spiral")
 
-        # 5. Batch boyutu ekle
-        img_array = np.expand_dims(img_array, axis=0)
-
-        logger.info(
-            f"Input tensor -> shape: {img_array.shape}, dtype: {img_array.dtype}, "
-            f"min: {img_array.min():.4f}, max: {img_array.max():.4f}"
-        )
+        # Debug için örnekle (varsayılan kapalı; PNG yazımı arka planda yapılır)
+        if debug_capture.should_capture():
+            debug_capture.capture("spiral", img_array)
 
+        logger.info(f"Ön işlenmiş görüntü -> shape: {img_array.shape}, model dtype: {MODEL_INPUT_DTYPE}")
         return img_array
 
     except Exception as e:
@@ -127,10 +107,49 @@ def preprocess_image_for_model(image_bytes: bytes) -> np.ndarray:
         raise HTTPException(400, f"Görüntü işleme hatası: {str(e)}")
 
 
+def preprocess_strokes_for_model(body: bytes, content_type: str) -> np.ndarray:
+    """
+    Çizgi verisini doğrudan model çözünürlüğünde (H, W, 3) uint8 diziye çiz.
+
+    PNG kodlama, yükleme ve çözme adımları atlanır (bkz. strokes.py).
+    """
+    if not engine.is_loaded:
+        raise ValueError("ML modeli yüklenmediği için ön işleme yapılamıyor.")
+    if None in (MODEL_INPUT_HEIGHT, MODEL_INPUT_WIDTH):
+        raise ValueError("Model detayları alınamadığı için ön işleme yapılamıyor.")
+
+    try:
+        drawing = strokes.parse_strokes(body, content_type)
+    except ValueError as e:
+        raise HTTPException(400, f"Geçersiz çizgi verisi: {str(e)}")
+
+    img_array = strokes.render(drawing, MODEL_INPUT_WIDTH, MODEL_INPUT_HEIGHT, router="spiral")
+    if debug_capture.should_capture():
+        debug_capture.capture("spiral", img_array)
+    logger.info(f"{drawing.stroke_count} çizgi ({len(drawing.points)} nokta) {img_array.shape} boyutunda çizildi")
+    return img_array
+
+
+def build_prediction_result(output_data: np.ndarray) -> dict:
+    """Model çıktısını titreme analizi yanıtına dönüştür"""
+    control_prob = float(output_data[0])
+    patient_prob = float(output_data[1])
+
+    return {
+        "control_probability": control_prob,
+        "patients_probability": patient_prob,
+        "prediction_text_summary": (
+            f"🩺 Titreme Algılandı — Güven: {patient_prob:.2f}"
+            if patient_prob > control_prob
+            else f"✅ Temiz Yazım — Güven: {control_prob:.2f}"
+        )
+    }
+
+
 @router.post("/predict_tremor")
 async def predict_tremor(image: UploadFile = File(...)):
     """Titreme analizi endpoint'i"""
-    if interpreter is None:
+    if not await model_registry.ensure_loaded_async("spiral"):
         raise HTTPException(500, detail="ML modeli yüklenemedi - model dosyası bulunamadı veya yüklenemedi")
 
     if not image.filename.lower().endswith(".png"):
@@ -140,41 +159,70 @@ async def predict_tremor(image: UploadFile = File(...)):
         image_bytes = await image.read()
         logger.info(f"Received image: {len(image_bytes)} bytes, filename: {image.filename}")
 
+        # Aynı görüntü ve model sürümü için önceki sonucu kullan
+        cache_key = result_cache.make_key("spiral", engine.model_version, image_bytes)
+        cached = await result_cache.get_async(cache_key)
+        if cached is not None:
+            logger.info("Sonuç önbellekten döndürüldü")
+            return JSONResponse(content=cached)
+
         # Görüntüyü hazırla
-        processed_tensor = preprocess_image_for_model(image_bytes)
+        processed_image = await run_in_threadpool(preprocess_image_for_model, image_bytes)
 
-        # Model tahmini
-        interpreter.set_tensor(input_details[0]["index"], processed_tensor)
-        interpreter.invoke()
-        output_data = interpreter.get_tensor(output_details[0]["index"])[0]
+        # Model tahmini (interpreter havuzunda, event loop dışında)
+        output_data = (await engine.predict_image_async(processed_image))[0]
 
         logger.info(f"Raw model output: {output_data}, shape: {output_data.shape}")
 
-        control_prob = float(output_data[0])
-        patient_prob = float(output_data[1])
-
-        return JSONResponse(content={
-            "control_probability": control_prob,
-            "patients_probability": patient_prob,
-            "prediction_text_summary": (
-                f"🩺 Titreme Algılandı — Güven: {patient_prob:.2f}"
-                if patient_prob > control_prob
-                else f"✅ Temiz Yazım — Güven: {control_prob:.2f}"
-            )
-        })
+        result = build_prediction_result(output_data)
+        result_cache.put(cache_key, result)
+        return JSONResponse(content=result)
 
     except Exception as e:
         logger.error(f"Tahmin hatası: {str(e)}")
         raise HTTPException(500, detail=f"Sunucu hatası: {str(e)}")
 
 
+@router.post("/predict_tremor_strokes")
+async def predict_tremor_strokes(request: Request):
+    """Titreme analizi, PNG yerine çizgi verisiyle (JSON ya da ikili, bkz. strokes.py)"""
+    if not await model_registry.ensure_loaded_async("spiral"):
+        raise HTTPException(500, detail="ML modeli yüklenemedi - model dosyası bulunamadı veya yüklenemedi")
+
+    try:
+        body = await request.body()
+        content_type = request.headers.get("content-type", "")
+
+        # Aynı çizgi verisi ve model sürümü için önceki sonucu kullan
+        cache_key = result_cache.make_key("spiral", engine.model_version, body, f"strokes:{strokes.STROKE_RENDER_SUPERSAMPLE}")
+        cached = await result_cache.get_async(cache_key)
+        if cached is not None:
+            logger.info("Sonuç önbellekten döndürüldü")
+            return JSONResponse(content=cached)
+
+        processed_image = await run_in_threadpool(preprocess_strokes_for_model, body, content_type)
+        output_data = (await engine.predict_image_async(processed_image))[0]
+
+        result = build_prediction_result(output_data)
+        result_cache.put(cache_key, result)
+        return JSONResponse(content=result)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Çizgi verisiyle tahmin hatası: {str(e)}")
+        raise HTTPException(500, detail=f"Sunucu hatası: {str(e)}")
+
+
 # Health check endpoint to verify model status
 @router.get("/health")
 async def health_check():
     """Backend ve model durumunu kontrol et"""
     return JSONResponse(content={
-        "status": "healthy" if interpreter is not None else "model_not_loaded",
-        "model_loaded": interpreter is not None,
+        "status": "healthy" if engine.is_loaded else "model_not_loaded",
+        "model_loaded": engine.is_loaded,
         "model_path": MODEL_PATH,
-        "model_exists": os.path.exists(MODEL_PATH)
+        "model_exists": os.path.exists(MODEL_PATH),
+        "load_state": model_registry.status()["spiral"],
+        "interpreter_pool": engine.stats()
     })
\ No newline at end of file
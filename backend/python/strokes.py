@@ -0,0 +1,286 @@
+"""
+Vector stroke input for the drawing and handwriting tests.
+
+The frontend records every stroke as a list of points before it rasterizes
+the canvas to PNG. The *_strokes endpoints take those points directly, so
+there is no PNG to encode, upload and decode. Two encodings are accepted.
+
+JSON (Content-Type: application/json):
+
+    {"width": 400, "height": 400,
+     "strokes": [{"width": 3.0, "color": 4278190080, "points": [[x, y, t], ...]}]}
+
+`width`/`height` are the canvas size in the same units as the points. `t` is
+milliseconds since the drawing started and may be left out ([x, y]).
+`color` is a Flutter ARGB integer or "#RRGGBB" (default black). The stroke
+`width` defaults to 3.0, the canvas pen width.
+
+Binary (Content-Type: application/octet-stream), little-endian:
+
+    b"NGS1", float32 canvas width, float32 canvas height, uint32 stroke count
+    per stroke: float32 pen width, uint32 ARGB color, uint32 point count,
+                point count x (float32 x, float32 y, float32 t)
+"""
+import json
+from typing import List, Tuple
+
+import cv2
+import numpy as np
+
+import metrics
+from config import env_int
+
+MAGIC = b"NGS1"
+DEFAULT_PEN_WIDTH = 3.0
+DEFAULT_COLOR = 0xFF000000
+
+# Kötüye kullanıma karşı sınırlar
+STROKES_MAX_POINTS = env_int("STROKES_MAX_POINTS", 200000)
+STROKES_MAX_STROKES = env_int("STROKES_MAX_STROKES", 20000)
+MAX_CANVAS_SIDE = 10000
+# Kalem kalınlığı en fazla tuvalin kısa kenarının bu oranı olabilir
+MAX_PEN_WIDTH_RATIO = 0.25
+# Noktalar tuvalin dışına en fazla tuval boyutu kadar taşabilir (kenardan taşan çizgiler)
+MAX_POINT_OVERHANG_RATIO = 1.0
+
+# Model çözünürlüğünün bu katında çizilip INTER_AREA ile küçültülür (PNG + LANCZOS yoluna yakın kenar yumuşatma)
+STROKE_RENDER_SUPERSAMPLE = max(1, env_int("STROKE_RENDER_SUPERSAMPLE", 4))
+
+_HEADER = np.dtype([("magic", "S4"), ("width", "<f4"), ("height", "<f4"), ("strokes", "<u4")])
+_STROKE_HEADER = np.dtype([("pen_width", "<f4"), ("color", "<u4"), ("points", "<u4")])
+_POINT = np.dtype([("x", "<f4"), ("y", "<f4"), ("t", "<f4")])
+
+
+class StrokeDrawing:
+    """
+    A parsed drawing: every point in one (N, 3) float32 array of x, y, t.
+
+    Stroke i owns points[offsets[i]:offsets[i + 1]] and was drawn with
+    pen_widths[i] in colors[i] (ARGB).
+    """
+
+    __slots__ = ("width", "height", "points", "offsets", "pen_widths", "colors")
+
+    def __init__(self, width: float, height: float, points: np.ndarray, offsets: np.ndarray,
+                 pen_widths: np.ndarray, colors: np.ndarray):
+        self.width = width
+        self.height = height
+        self.points = points
+        self.offsets = offsets
+        self.pen_widths = pen_widths
+        self.colors = colors
+
+    @property
+    def stroke_count(self) -> int:
+        return len(self.pen_widths)
+
+    def stroke(self, i: int) -> np.ndarray:
+        return self.points[self.offsets[i]:self.offsets[i + 1]]
+
+    def duration_ms(self) -> float:
+        """Time from the first to the last point (0 when no timestamps were sent)."""
+        if not len(self.points):
+            return 0.0
+        t = self.points[:, 2]
+        return float(t.max() - t.min())
+
+
+def _parse_color(value) -> int:
+    if value is None:
+        return DEFAULT_COLOR
+    if isinstance(value, str):
+        value = value.lstrip("#")
+        if len(value) == 6:
+            value = "FF" + value
+        return int(value, 16) & 0xFFFFFFFF
+    return int(value) & 0xFFFFFFFF
+
+
+def _parse_json(body: bytes) -> StrokeDrawing:
+    data = json.loads(body)
+    strokes = data.get("strokes")
+    if not isinstance(strokes, list):
+        raise ValueError("'strokes' listesi gerekli")
+    if len(strokes) > STROKES_MAX_STROKES:
+        raise ValueError(f"En fazla {STROKES_MAX_STROKES} çizgi gönderilebilir")
+
+    arrays, pen_widths, colors = [], [], []
+    for stroke in strokes:
+        points = np.asarray(stroke.get("points", []), dtype=np.float32)
+        if points.size == 0:
+            continue
+        if points.ndim != 2 or points.shape[1] not in (2, 3):
+            raise ValueError("Noktalar [x, y] ya da [x, y, t] olmalı")
+        if points.shape[1] == 2:
+            points = np.hstack([points, np.zeros((len(points), 1), np.float32)])
+        arrays.append(points)
+        pen_widths.append(float(stroke.get("width", DEFAULT_PEN_WIDTH)))
+        colors.append(_parse_color(stroke.get("color")))
+
+    points = np.concatenate(arrays) if arrays else np.zeros((0, 3), np.float32)
+    offsets = np.zeros(len(arrays) + 1, dtype=np.int64)
+    np.cumsum([len(a) for a in arrays], out=offsets[1:])
+    return StrokeDrawing(float(data.get("width", 0)), float(data.get("height", 0)), points, offsets,
+                         np.asarray(pen_widths, np.float32), np.asarray(colors, np.uint32))
+
+
+def _parse_binary(body: bytes) -> StrokeDrawing:
+    if len(body) < _HEADER.itemsize:
+        raise ValueError("Çizgi verisi çok kısa")
+    header = np.frombuffer(body, _HEADER, count=1)[0]
+    if header["magic"] != MAGIC:
+        raise ValueError("Geçersiz çizgi verisi (NGS1 başlığı yok)")
+    stroke_count = int(header["strokes"])
+    if stroke_count > STROKES_MAX_STROKES:
+        raise ValueError(f"En fazla {STROKES_MAX_STROKES} çizgi gönderilebilir")
+
+    offset = _HEADER.itemsize
+    arrays, pen_widths, colors = [], [], []
+    for _ in range(stroke_count):
+        if offset + _STROKE_HEADER.itemsize > len(body):
+            raise ValueError("Çizgi verisi eksik")
+        stroke = np.frombuffer(body, _STROKE_HEADER, count=1, offset=offset)[0]
+        offset += _STROKE_HEADER.itemsize
+        count = int(stroke["points"])
+        if offset + count * _POINT.itemsize > len(body):
+            raise ValueError("Çizgi verisi eksik")
+        points = np.frombuffer(body, _POINT, count=count, offset=offset)
+        offset += count * _POINT.itemsize
+        if count == 0:
+            continue
+        arrays.append(points.view(np.float32).reshape(count, 3))
+        pen_widths.append(float(stroke["pen_width"]))
+        colors.append(int(stroke["color"]))
+
+    points = np.concatenate(arrays) if arrays else np.zeros((0, 3), np.float32)
+    offsets = np.zeros(len(arrays) + 1, dtype=np.int64)
+    np.cumsum([len(a) for a in arrays], out=offsets[1:])
+    return StrokeDrawing(float(header["width"]), float(header["height"]), points, offsets,
+                         np.asarray(pen_widths, np.float32), np.asarray(colors, np.uint32))
+
+
+def parse_strokes(body: bytes, content_type: str) -> StrokeDrawing:
+    """Parse a JSON or binary stroke upload; raises ValueError on bad input."""
+    if (content_type or "").split(";")[0].strip().lower() == "application/octet-stream":
+        drawing = _parse_binary(body)
+    else:
+        try:
+            drawing = _parse_json(body)
+        except (json.JSONDecodeError, UnicodeDecodeError, AttributeError, TypeError) as e:
+            raise ValueError(f"Geçersiz çizgi JSON'u: {e}")
+
+    if not (0 < drawing.width <= MAX_CANVAS_SIDE and 0 < drawing.height <= MAX_CANVAS_SIDE):
+        raise ValueError("Tuval boyutu (width, height) 0 ile 10000 arasında olmalı")
+    if len(drawing.points) > STROKES_MAX_POINTS:
+        raise ValueError(f"En fazla {STROKES_MAX_POINTS} nokta gönderilebilir")
+    if not np.isfinite(drawing.points).all() or not np.isfinite(drawing.pen_widths).all():
+        raise ValueError("Çizgi verisinde geçersiz sayı var")
+
+    max_pen_width = MAX_PEN_WIDTH_RATIO * min(drawing.width, drawing.height)
+    if len(drawing.pen_widths) and not ((drawing.pen_widths >= 0) & (drawing.pen_widths <= max_pen_width)).all():
+        raise ValueError(f"Kalem kalınlığı 0 ile {max_pen_width:g} arasında olmalı")
+    if len(drawing.points):
+        # Tuvalin çok dışındaki koordinatlar int32'ye dönüşürken taşar ve anlamsız çizim üretir
+        low = np.min(drawing.points[:, :2], axis=0)
+        high = np.max(drawing.points[:, :2], axis=0)
+        overhang = MAX_POINT_OVERHANG_RATIO * np.array([drawing.width, drawing.height])
+        if (low < -overhang).any() or (high > np.array([drawing.width, drawing.height]) + overhang).any():
+            raise ValueError("Çizgi noktaları tuvalin çok dışında")
+    return drawing
+
+
+def render(drawing: StrokeDrawing, width: int, height: int, router: str = "drawing") -> np.ndarray:
+    """
+    Render the strokes straight to an (height, width, 3) uint8 RGB model input.
+
+    The canvas is stretched to the model size the same way the PNG path
+    resizes the uploaded image. Strokes are drawn with round caps on white
+    at STROKE_RENDER_SUPERSAMPLE times the model resolution, then area-downsampled.
+    """
+    with metrics.stage(router, "stroke_render"):
+        factor = STROKE_RENDER_SUPERSAMPLE
+        big_width, big_height = width * factor, height * factor
+        scale_x = big_width / drawing.width
+        scale_y = big_height / drawing.height
+        pen_scale = (scale_x + scale_y) / 2.0
+        canvas = np.full((big_height, big_width, 3), 255, dtype=np.uint8)
+
+        # cv2 koordinatları için 4 bit alt piksel hassasiyeti
+        shift = 4
+        xy = drawing.points[:, :2] * np.float32((scale_x * (1 << shift), scale_y * (1 << shift)))
+        xy = np.round(xy).astype(np.int32)
+        for i in range(drawing.stroke_count):
+            argb = int(drawing.colors[i])
+            color = ((argb >> 16) & 0xFF, (argb >> 8) & 0xFF, argb & 0xFF)
+            thickness = max(1, int(round(float(drawing.pen_widths[i]) * pen_scale)))
+            stroke = xy[drawing.offsets[i]:drawing.offsets[i + 1]]
+            if len(stroke) == 1:
+                cv2.circle(canvas, tuple(int(v) for v in stroke[0]), (thickness << shift) // 2,
+                           color, -1, cv2.LINE_AA, shift)
+            else:
+                cv2.polylines(canvas, [stroke], False, color, thickness, cv2.LINE_AA, shift)
+
+        if factor > 1:
+            canvas = cv2.resize(canvas, (width, height), interpolation=cv2.INTER_AREA)
+        return canvas
+
+
+def stroke_boxes(drawing: StrokeDrawing, scale: float = 1.0) -> List[Tuple[int, int, int, int]]:
+    """
+    Glyph boxes straight from the stroke geometry, in canvas units times `scale`.
+
+    Each stroke's bounding box is widened by half the pen width (the ink it
+    leaves). Strokes whose boxes overlap are merged, the way touching
+    strokes form one blob on the rasterized page. The same size and
+    aspect-ratio limits as the raster detectors are applied. Boxes come back
+    in the order of their first stroke.
+    """
+    count = drawing.stroke_count
+    if count == 0:
+        return []
+    starts = drawing.offsets[:-1]
+    xy = drawing.points[:, :2].astype(np.float64) * scale
+    half_pen = drawing.pen_widths.astype(np.float64) * scale / 2.0
+    x0 = np.minimum.reduceat(xy[:, 0], starts) - half_pen
+    y0 = np.minimum.reduceat(xy[:, 1], starts) - half_pen
+    x1 = np.maximum.reduceat(xy[:, 0], starts) + half_pen
+    y1 = np.maximum.reduceat(xy[:, 1], starts) + half_pen
+
+    # Kesişen kutuları birleştir (union-find); x'e göre sıralı tarama ile
+    parent = list(range(count))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    order = np.argsort(x0, kind="stable")
+    active = []
+    for i in order.tolist():
+        active = [j for j in active if x1[j] > x0[i]]
+        for j in active:
+            if y0[i] < y1[j] and y0[j] < y1[i]:
+                root_i, root_j = find(i), find(j)
+                if root_i != root_j:
+                    parent[max(root_i, root_j)] = min(root_i, root_j)
+        active.append(i)
+
+    groups = {}
+    for i in range(count):
+        root = find(i)
+        if root in groups:
+            g = groups[root]
+            g[0], g[1] = min(g[0], x0[i]), min(g[1], y0[i])
+            g[2], g[3] = max(g[2], x1[i]), max(g[3], y1[i])
+        else:
+            groups[root] = [x0[i], y0[i], x1[i], y1[i]]
+
+    boxes = []
+    for gx0, gy0, gx1, gy1 in groups.values():
+        x, y = int(np.floor(gx0)), int(np.floor(gy0))
+        w, h = int(np.ceil(gx1)) - x, int(np.ceil(gy1)) - y
+        aspect_ratio = w / h if h > 0 else 0
+        if w * h >= 5 and 0.01 <= aspect_ratio <= 100:
+            boxes.append((x, y, w, h))
+    return boxes
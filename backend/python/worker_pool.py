@@ -0,0 +1,369 @@
+"""
+Bounded process pools for CPU-bound request work.
+
+Handlers await `WorkerPool.run(...)`, which runs the job in a separate
+process so the event loop stays free. Each pool has a fixed number of
+worker processes and a limit on queued jobs. Jobs past that limit fail
+immediately with PoolFullError, which handlers turn into a 503 with a
+Retry-After header. A job that runs past its timeout raises JobTimeoutError.
+The timeout counts from the moment a worker picks the job up, not from
+submission, so time spent waiting in the queue never counts against it.
+The workers are then killed and replaced, because a running job cannot be
+cancelled any other way. A pool whose workers died (or whose initializer
+failed) is replaced as well, so the next job starts fresh workers.
+
+Large numpy arrays (decoded images) are passed through
+multiprocessing.shared_memory rather than pickled: `run_with_array` copies
+the array into a shared block once, and the worker maps it without another
+copy.
+
+Stage timings and counters that jobs record in the worker's metrics
+registry are sent back with the result and merged into the parent's, so
+/metrics still shows them. A pool can also name a `status_fn`: the worker
+calls it after every job and the parent keeps the latest snapshot in
+`worker_status`, so health checks can report worker-side state without
+submitting a job.
+"""
+import asyncio
+import itertools
+import logging
+import math
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+import metrics
+from config import env_str
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# "spawn" her platformda aynı davranır ve TF/OpenCV thread'lerini fork etmez
+START_METHOD = env_str("WORKER_POOL_START_METHOD", "spawn")
+
+
+class PoolFullError(Exception):
+    """Every worker is busy and the queue is at its limit."""
+
+    def __init__(self, pool: str, retry_after: int):
+        super().__init__(f"[{pool}] iş kuyruğu dolu")
+        self.retry_after = retry_after
+
+
+class JobTimeoutError(Exception):
+    """A job ran longer than the pool's timeout; its workers were replaced."""
+
+
+# İşçi sürecinde: işin başladığını ebeveyne bildiren kuyruk (zaman aşımı bu andan sayılır)
+_started_queue = None
+# İşçi sürecinde: her işin sonucuyla geri gönderilen durum özeti
+_status_fn = None
+
+
+def _init_worker(started_queue, status_fn: Optional[Callable], initializer: Optional[Callable], initargs: Tuple):
+    global _started_queue, _status_fn
+    _started_queue = started_queue
+    _status_fn = status_fn
+    if initializer is not None:
+        initializer(*initargs)
+
+
+def _worker_status() -> Any:
+    return _status_fn() if _status_fn is not None else None
+
+
+def _run_job(job_id: int, fn: Callable, args: Tuple) -> Tuple[Any, Any, float, Any]:
+    """Worker-side wrapper: report the start, run the job and ship its metrics, run time and status back."""
+    if _started_queue is not None:
+        _started_queue.put(job_id)
+    metrics.drain()
+    start = time.perf_counter()
+    try:
+        result = fn(*args)
+    except Exception:
+        metrics.drain()
+        raise
+    return result, metrics.drain(), time.perf_counter() - start, _worker_status()
+
+
+def _run_on_shared_array(fn: Callable, name: str, shape: Tuple[int, ...], dtype: str, args: Tuple) -> Any:
+    """Worker-side: map the shared block as an array, call fn(array, *args), then detach."""
+    shm = shared_memory.SharedMemory(name=name)
+    array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+    try:
+        return fn(array, *args)
+    finally:
+        del array
+        try:
+            shm.close()
+        except BufferError:
+            # Bir hata izi hâlâ diziye referans tutuyor; eşleme GC ile serbest kalır
+            pass
+
+
+class WorkerPool:
+    """
+    A fixed-size process pool with a bounded queue and per-job timeouts.
+
+    `max_workers` jobs run at once and up to `max_queue` more wait; anything
+    beyond that is rejected instead of piling up behind a slow upload.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: int, timeout_s: float,
+                 initializer: Optional[Callable] = None, initargs: Tuple = (),
+                 status_fn: Optional[Callable] = None):
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self.timeout_s = timeout_s
+        self.initializer = initializer
+        self.initargs = initargs
+        self.status_fn = status_fn
+        self.worker_status = None
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.restarts = 0
+        self.total_job_s = 0.0
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._started_queue = None
+        self._started: Dict[int, float] = {}
+        self._job_ids = itertools.count()
+        self._lock = threading.Lock()
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.max_queue
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                context = multiprocessing.get_context(START_METHOD)
+                self._started_queue = context.Queue()
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=context,
+                    initializer=_init_worker,
+                    initargs=(self._started_queue, self.status_fn, self.initializer, self.initargs),
+                )
+            return self._executor
+
+    def _submit(self, executor: ProcessPoolExecutor, fn: Callable, *args):
+        """executor.submit that replaces an executor which is already broken."""
+        try:
+            return executor.submit(fn, *args)
+        except BrokenProcessPool:
+            self._replace_executor(executor, "işçi havuzu bozuk (başlatma başarısız olmuş olabilir)")
+            raise
+
+    def _collect_started(self):
+        """Record the start time of every job the workers reported since the last call."""
+        started_queue = self._started_queue
+        while started_queue is not None:
+            try:
+                job_id = started_queue.get_nowait()
+            except (queue.Empty, OSError, ValueError):
+                return
+            self._started[job_id] = time.monotonic()
+
+    async def _wait(self, job_id: int, future, timeout_s: float):
+        """Await `future`; the timeout runs from the job's reported start, not from submission."""
+        wrapped = asyncio.wrap_future(future)
+        try:
+            return await self._wait_wrapped(job_id, future, wrapped, timeout_s)
+        except asyncio.CancelledError:
+            # Bekleyen istemci gitti: kuyruktaki iş iptal edilir; çalışan iş bitince yuvasını bırakır
+            future.cancel()
+            wrapped.add_done_callback(lambda f: f.cancelled() or f.exception())
+            raise
+
+    async def _wait_wrapped(self, job_id: int, future, wrapped, timeout_s: float):
+        while True:
+            self._collect_started()
+            started = self._started.get(job_id)
+            if started is None:
+                # Henüz kuyrukta: başlangıç bildirimi kısa aralıklarla yoklanır
+                wait_s = 0.1
+            else:
+                wait_s = started + timeout_s - time.monotonic()
+                if wait_s <= 0:
+                    # Sonlandırılan işin hatası sessizce tüketilir
+                    wrapped.add_done_callback(lambda f: f.cancelled() or f.exception())
+                    raise asyncio.TimeoutError
+            done, _ = await asyncio.wait({wrapped}, timeout=wait_s)
+            if done:
+                if future.cancelled():
+                    # Havuz başka bir işin zaman aşımıyla değiştirildi; bu iş hiç çalışmadı
+                    raise BrokenProcessPool(f"[{self.name}] işçi havuzu yeniden başlatıldı")
+                return wrapped.result()
+
+    def _replace_executor(self, executor: ProcessPoolExecutor, reason: str):
+        """Kill the workers of `executor` so the next job starts a fresh pool."""
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+            self._started_queue = None
+            self.restarts += 1
+        logger.warning(f"[{self.name}] işçi süreçleri yeniden başlatılıyor: {reason}")
+        # ProcessPoolExecutor çalışan bir işi iptal edemez; süreçleri doğrudan sonlandır
+        for process in list((executor._processes or {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely free, from the average job time."""
+        average = self.total_job_s / self.completed if self.completed else 1.0
+        waves = max(1, self.pending - self.max_workers + 1) / self.max_workers
+        return int(min(60, max(1, math.ceil(average * waves))))
+
+    async def run(self, fn: Callable, *args, timeout_s: Optional[float] = None) -> Any:
+        """Run fn(*args) in a worker process. fn and args must be picklable."""
+        return await self._run(fn, args, timeout_s)
+
+    async def _run(self, fn: Callable, args: Tuple, timeout_s: Optional[float],
+                   on_done: Optional[Callable[[], None]] = None) -> Any:
+        """
+        Submit one job and await it.
+
+        The queue slot (and `on_done`) is released when the job's future
+        finishes, not when the caller stops waiting: a cancelled caller
+        cancels a queued job, but a job already running keeps its slot
+        until it ends, so the workers + queue bound stays exact.
+        """
+        with self._lock:
+            rejected = self.pending >= self.capacity
+            if rejected:
+                self.rejected += 1
+            else:
+                self.pending += 1
+        if rejected:
+            metrics.count(self.name, "pool_rejected")
+            if on_done is not None:
+                on_done()
+            raise PoolFullError(self.name, self.retry_after())
+        timeout_s = self.timeout_s if timeout_s is None else timeout_s
+        start = time.perf_counter()
+        job_id = next(self._job_ids)
+
+        def release(_future=None):
+            self._started.pop(job_id, None)
+            with self._lock:
+                self.pending -= 1
+            if on_done is not None:
+                on_done()
+
+        try:
+            executor = self._get_executor()
+            future = self._submit(executor, _run_job, job_id, fn, args)
+        except BaseException:
+            release()
+            raise
+        future.add_done_callback(release)
+        try:
+            result, snapshot, run_s, status = await self._wait(job_id, future, timeout_s)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            metrics.count(self.name, "pool_timeout")
+            self._replace_executor(executor, f"iş {timeout_s:g} sn sınırını aştı")
+            raise JobTimeoutError(f"[{self.name}] iş {timeout_s:g} saniyede tamamlanmadı")
+        except BrokenProcessPool:
+            self._replace_executor(executor, "işçi süreci beklenmedik şekilde sonlandı")
+            raise
+        metrics.merge(snapshot)
+        if status is not None:
+            self.worker_status = status
+        self.completed += 1
+        self.total_job_s += run_s
+        metrics.observe_stage(self.name, "worker_queue", time.perf_counter() - start - run_s)
+        metrics.observe_stage(self.name, "worker_job", run_s)
+        return result
+
+    async def run_with_array(self, fn: Callable, array: np.ndarray, *args, timeout_s: Optional[float] = None) -> Any:
+        """Run fn(array, *args) in a worker, handing `array` over through shared memory."""
+        array = np.ascontiguousarray(array)
+        shm = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+
+        def free_block():
+            shm.close()
+            shm.unlink()
+
+        try:
+            np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+        except BaseException:
+            free_block()
+            raise
+        # Blok, iş bitene kadar yaşar (bekleyen iptal edilse bile kuyruktaki iş onu açabilir)
+        return await self._run(_run_on_shared_array, (fn, shm.name, array.shape, array.dtype.str, args),
+                               timeout_s, on_done=free_block)
+
+    def warm_up(self):
+        """Start every worker process now instead of on the first request."""
+        executor = self._get_executor()
+        futures = [self._submit(executor, _worker_status) for _ in range(self.max_workers)]
+        try:
+            for future in futures:
+                status = future.result()
+                if status is not None:
+                    self.worker_status = status
+        except BrokenProcessPool:
+            # Başlatıcı hata verdi; bir sonraki deneme yeni süreçlerle başlar
+            self._replace_executor(executor, "işçi süreçleri başlatılamadı")
+            raise
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "timeout_s": self.timeout_s,
+            "started": self._executor is not None,
+            "pending": self.pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "restarts": self.restarts,
+            "avg_job_ms": round(self.total_job_s / self.completed * 1000.0, 2) if self.completed else None,
+        }
+
+
+_pools: Dict[str, WorkerPool] = {}
+
+
+def register_pool(name: str, max_workers: int, max_queue: int, timeout_s: float,
+                  initializer: Optional[Callable] = None, initargs: Tuple = (),
+                  status_fn: Optional[Callable] = None) -> WorkerPool:
+    """Create (or return the existing) pool called `name`; processes start on first use."""
+    if name not in _pools:
+        _pools[name] = WorkerPool(name, max_workers, max_queue, timeout_s, initializer, initargs, status_fn)
+    return _pools[name]
+
+
+def pool_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: pool.stats() for name, pool in _pools.items()}
+
+
+def warm_up_all():
+    for name, pool in list(_pools.items()):
+        try:
+            pool.warm_up()
+        except Exception as e:
+            logger.error(f"[{name}] işçi süreçleri başlatılamadı: {e}")
+
+
+def shutdown_all():
+    for pool in _pools.values():
+        pool.shutdown()